@@ -0,0 +1,627 @@
+#!/usr/bin/env python3
+"""
+Compiles a client config, the gauges it references and every file they use (SVGs,
+PNGs, fonts) into one bundle file the client can memory-map instead of opening
+hundreds of small files.
+
+    python3 tools/bundle-config/main.py client/src/default-client.json client.bundle --root .
+    python3 tools/bundle-config/main.py client.bundle --info
+
+The config and gauges are validated against the client's models (read from
+client/src/shared/models so they never get out of date) the same way the client
+reads them: keys are case-insensitive and unknown keys are errors.
+
+Gauges referenced by path are inlined into "gauges" and referenced by name. Every
+file path is replaced by the key of the file in the bundle (its path relative to the
+root with forward slashes), so a client resolves them all against the bundle.
+
+Layout (little endian):
+
+    header  8s   magic "OSGBND1\\0"
+            u32  version (1)
+            u32  entry count
+            u64  offset of the data
+            u64  size of the bundle
+    index   entry count times, sorted by name (binary searchable):
+            u64  offset of the content
+            u64  length of the content
+            u32  offset of the name in the name table
+            u32  length of the name
+            16s  first 16 bytes of the SHA-256 of the content
+    names   UTF-8 names one after another
+    data    contents, each starting at a multiple of 16 bytes (the same content is
+            stored once)
+
+The compiled config is the entry named "client.json".
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import shared.config  # noqa: E402
+import shared.files  # noqa: E402
+from shared.config import LoadJsonWithComments, get_key  # noqa: E402
+from shared.files import write_if_changed  # noqa: E402
+
+MAGIC = b"OSGBND1\0"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQQ")
+INDEX_ENTRY = struct.Struct("<QQII16s")
+ALIGNMENT = 16
+CONFIG_KEY = "client.json"
+DEFAULT_MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "client", "src", "shared", "models")
+
+# converters of the client which accept something other than what the C# type says
+CONVERTER_KINDS = {
+    "FlexibleVector2Converter": "vector",
+    "FlexibleDimensionConverter": "dimension",
+    "ColorDefConverter": "color",
+    "StringOrStringListConverter": "strings",
+    "SimVarConfigConverter": "var",
+    "JsonStringEnumConverter": "string",
+}
+
+PRIMITIVE_KINDS = {
+    "string": "string", "bool": "bool", "int": "int", "long": "int",
+    "double": "number", "float": "number", "object": "any",
+}
+
+CLASS_RE = re.compile(r"^public\s+class\s+(\w+)(?:\s*:\s*(\w+))?")
+PROPERTY_RE = re.compile(r"^public\s+(required\s+)?([\w<>?,\s]+?)\s+(\w+)\s*\{\s*get;")
+CONVERTER_RE = re.compile(r"\[JsonConverter\(typeof\((\w+)\)\)\]")
+ENUM_RE = re.compile(r"^public\s+enum\s+(\w+)")
+
+
+_tool_version = None
+
+
+class BundleError(Exception):
+    pass
+
+
+def GetToolVersion():
+    # hash of this script and the shared modules it uses so a changed compiler
+    # rebuilds bundles built by the old one
+    global _tool_version
+    if _tool_version is None:
+        digest = hashlib.sha256()
+        for path in (__file__, shared.config.__file__, shared.files.__file__):
+            with open(os.path.abspath(path), "rb") as f:
+                digest.update(f.read())
+        _tool_version = digest.hexdigest()[:16]
+    return _tool_version
+
+
+# --- schema -----------------------------------------------------------------
+
+def schema_files(models_dir):
+    """The .cs files of the client's models, sorted."""
+    return sorted(os.path.abspath(os.path.join(root, name))
+                  for root, _, names in os.walk(models_dir)
+                  for name in names if name.endswith(".cs"))
+
+
+def LoadSchema(models_dir):
+    """Reads the public properties of the classes in the client's models into
+    {class name: {"base": name, "props": {lower case name: (name, kind, required)}}}.
+    A kind is a primitive ("string", "number"...), a converter kind, a class name,
+    "list:<kind>" and ends with "?" if it can be null. Enums are strings."""
+    classes = {}
+    enums = set()
+
+    for path in schema_files(models_dir):
+        with open(path, encoding="utf-8") as f:
+            lines = [line.strip() for line in f]
+
+        current = None
+        converter = None
+        ignored = False
+        for line in lines:
+            if line.startswith("//"):
+                continue
+            match = ENUM_RE.match(line)
+            if match:
+                enums.add(match.group(1))
+                continue
+            match = CLASS_RE.match(line)
+            if match:
+                current = classes.setdefault(match.group(1), {"base": match.group(2), "props": {}})
+                converter = None
+                ignored = False
+                continue
+            if line.startswith("[JsonIgnore"):
+                ignored = True
+                continue
+            match = CONVERTER_RE.search(line)
+            if match:
+                converter = match.group(1)
+                continue
+            match = PROPERTY_RE.match(line)
+            if current is not None and match:
+                required, type_name, prop = match.groups()
+                if not ignored:
+                    kind = CONVERTER_KINDS.get(converter) or type_name.replace(" ", "")
+                    current["props"][prop.lower()] = (prop, kind, bool(required))
+                converter = None
+                ignored = False
+            elif line.startswith("public "):
+                # a field or method ends whatever attributes came before it
+                converter = None
+                ignored = False
+
+    for cls in classes.values():
+        for key, (prop, kind, required) in list(cls["props"].items()):
+            cls["props"][key] = (prop, resolve_kind(kind, classes, enums), required)
+
+    return classes
+
+
+def resolve_kind(type_name, classes, enums):
+    nullable = type_name.endswith("?")
+    type_name = type_name.rstrip("?")
+    if type_name.startswith("List<") and type_name.endswith(">"):
+        kind = "list:" + resolve_kind(type_name[5:-1], classes, enums)
+    elif type_name in PRIMITIVE_KINDS:
+        kind = PRIMITIVE_KINDS[type_name]
+    elif type_name in enums:
+        kind = "string"
+    elif type_name in classes or type_name in CONVERTER_KINDS.values():
+        kind = type_name
+    else:
+        kind = "any"
+    return kind + "?" if nullable else kind
+
+
+def class_props(schema, name):
+    props = {}
+    while name in schema:
+        props = {**schema[name]["props"], **props}
+        name = schema[name]["base"]
+    return props
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def Validate(value, kind, schema, where, errors):
+    """Appends an error for every value which the client would not be able to read."""
+    if kind.endswith("?"):
+        if value is None:
+            return
+        kind = kind[:-1]
+
+    def error(message):
+        errors.append(f"{where}: {message}")
+
+    if kind == "any":
+        return
+    if kind.startswith("list:"):
+        if not isinstance(value, list):
+            return error("expected a list")
+        for i, item in enumerate(value):
+            Validate(item, kind[5:], schema, f"{where}[{i}]", errors)
+    elif kind == "string":
+        if not isinstance(value, str):
+            error("expected a string")
+    elif kind == "bool":
+        if not isinstance(value, bool):
+            error("expected true or false")
+    elif kind == "int":
+        if not is_number(value) or value != int(value):
+            error("expected a whole number")
+    elif kind == "number":
+        if not is_number(value):
+            error("expected a number")
+    elif kind == "vector":
+        if not isinstance(value, list) or len(value) != 2 or not all(is_number(v) or isinstance(v, str) for v in value):
+            error("expected [x, y] with numbers or strings like \"50%\"")
+    elif kind == "dimension":
+        if not (is_number(value) or isinstance(value, str) or value is None):
+            error("expected a number or a string like \"50%\"")
+    elif kind == "color":
+        if isinstance(value, list):
+            if len(value) not in (3, 4) or not all(is_number(v) for v in value):
+                error("a color array must have 3 (RGB) or 4 (RGBA) numbers")
+        elif not isinstance(value, str):
+            error("expected a color string or [r, g, b(, a)]")
+    elif kind == "strings":
+        if not (isinstance(value, str) or isinstance(value, list) and all(isinstance(v, str) for v in value)):
+            error("expected a string or a list of strings")
+    elif kind == "var":
+        if not isinstance(value, list) or len(value) < 2 or not all(isinstance(v, str) and v for v in value[:2]):
+            error("expected [name, unit]")
+    elif kind in schema:
+        ValidateObject(value, kind, schema, where, errors)
+
+
+def ValidateObject(value, class_name, schema, where, errors):
+    if not isinstance(value, dict):
+        errors.append(f"{where}: expected an object")
+        return
+
+    props = class_props(schema, class_name)
+    for key, item in value.items():
+        if key.lower() not in props:
+            errors.append(f"{where}: unknown key '{key}' (available: {', '.join(p[0][0].lower() + p[0][1:] for p in props.values())})")
+            continue
+        prop, kind, _ = props[key.lower()]
+        Validate(item, kind, schema, f"{where}.{key}", errors)
+
+    present = {key.lower() for key in value}
+    for key, (prop, _, required) in props.items():
+        if required and key not in present:
+            errors.append(f"{where}: missing '{prop[0].lower() + prop[1:]}'")
+
+
+# --- resolving ----------------------------------------------------------------
+
+def set_key(obj, name, value):
+    for key in obj:
+        if key.lower() == name.lower():
+            obj[key] = value
+            return
+    obj[name] = value
+
+
+def pop_key(obj, name):
+    for key in list(obj):
+        if key.lower() == name.lower():
+            return obj.pop(key)
+    return None
+
+
+class Compiler:
+    """Resolves a config into its compiled form and the files it needs."""
+
+    def __init__(self, root, schema):
+        self.root = os.path.abspath(root)
+        self.schema = schema
+        self.files = {}  # key -> absolute path
+        self.inputs = set()
+        self.errors = []
+        self.gauges_by_path = {}
+
+    def AssetKey(self, path, where):
+        path = os.path.normpath(path)
+        if not os.path.isfile(path):
+            self.errors.append(f"{where}: file not found: {path}")
+            return None
+        relative = os.path.relpath(path, self.root)
+        if relative.startswith(".."):
+            # outside the root: keep the name but make it unique
+            digest = hashlib.sha256(path.encode("utf-8")).hexdigest()[:8]
+            relative = os.path.join("external", digest, os.path.basename(path))
+        key = relative.replace(os.sep, "/")
+        self.files[key] = path
+        self.inputs.add(path)
+        return key
+
+    def LoadJson(self, path, where):
+        self.inputs.add(os.path.abspath(path))
+        try:
+            return LoadJsonWithComments(path)
+        except (OSError, ValueError) as e:
+            self.errors.append(f"{where}: could not read {path}: {e}")
+            return None
+
+    def InlineAssets(self, gauge, base_dir, where):
+        """Replaces the file paths of a gauge by bundle keys. base_dir is the directory
+        the client resolves them against."""
+        clip = get_key(gauge, "clip")
+        if isinstance(clip, dict) and isinstance(get_key(clip, "image"), str):
+            key = self.AssetKey(os.path.join(base_dir, get_key(clip, "image")), f"{where}.clip")
+            if key:
+                set_key(clip, "image", key)
+
+        for i, layer in enumerate(get_key(gauge, "layers") or []):
+            if not isinstance(layer, dict):
+                continue
+            layer_where = f"{where}.layers[{i}]"
+
+            if isinstance(get_key(layer, "image"), str):
+                key = self.AssetKey(os.path.join(base_dir, get_key(layer, "image")), layer_where)
+                if key:
+                    set_key(layer, "image", key)
+
+            transform = get_key(layer, "transform")
+            path_config = get_key(transform, "path") if isinstance(transform, dict) else None
+            if isinstance(path_config, dict) and isinstance(get_key(path_config, "image"), str):
+                key = self.AssetKey(os.path.join(base_dir, get_key(path_config, "image")), f"{layer_where}.transform.path")
+                if key:
+                    set_key(path_config, "image", key)
+
+            text = get_key(layer, "text")
+            if isinstance(text, dict):
+                if isinstance(get_key(text, "font"), str):
+                    key = self.AssetKey(os.path.join(base_dir, get_key(text, "font")), f"{layer_where}.text")
+                    if key:
+                        set_key(text, "font", key)
+                elif isinstance(get_key(text, "fontFamily"), str):
+                    # the client looks for fonts/<family>.ttf|otf next to itself
+                    for ext in (".ttf", ".otf"):
+                        font_path = os.path.join(self.root, "fonts", get_key(text, "fontFamily") + ext)
+                        if os.path.isfile(font_path):
+                            self.AssetKey(font_path, f"{layer_where}.text")
+                            break
+
+    def LoadGauge(self, path, where):
+        """Loads, validates and inlines a gauge file once. Returns the gauge or None."""
+        absolute = os.path.normpath(os.path.join(self.root, path))
+        if absolute in self.gauges_by_path:
+            return self.gauges_by_path[absolute]
+
+        gauge = self.LoadJson(absolute, where)
+        if gauge is not None:
+            ValidateObject(gauge, "Gauge", self.schema, path, self.errors)
+            if isinstance(gauge, dict):
+                self.InlineAssets(gauge, os.path.dirname(absolute), path)
+            else:
+                gauge = None
+        self.gauges_by_path[absolute] = gauge
+        return gauge
+
+    def Compile(self, config_path):
+        config = self.LoadJson(config_path, "config")
+        if config is None:
+            return None
+        ValidateObject(config, "Config", self.schema, "config", self.errors)
+        if not isinstance(config, dict):
+            return None
+
+        gauges = get_key(config, "gauges")
+        if not isinstance(gauges, list):
+            gauges = []
+            set_key(config, "gauges", gauges)
+        names = {get_key(g, "name") for g in gauges if isinstance(g, dict)}
+        name_by_path = {}
+
+        def add_gauge(gauge, path):
+            # gauges are referenced by name once inlined so names have to be unique
+            name = get_key(gauge, "name") or os.path.splitext(os.path.basename(path))[0]
+            unique, n = name, 2
+            while unique in names:
+                unique, n = f"{name} ({n})", n + 1
+            names.add(unique)
+            inlined = {key: value for key, value in gauge.items() if key.lower() != "name"}
+            gauges.append({"name": unique, **inlined})
+            return unique
+
+        # gauges in the config which only point at a file are replaced by it (like the client does)
+        for i, gauge in enumerate(list(gauges)):
+            if not isinstance(gauge, dict):
+                continue
+            path = get_key(gauge, "path")
+            if isinstance(path, str):
+                loaded = self.LoadGauge(path, f"config.gauges[{i}]")
+                if loaded is not None:
+                    gauges[i] = {**loaded, "name": get_key(loaded, "name") or get_key(gauge, "name")}
+                    for key in list(gauges[i]):
+                        if key.lower() == "path":
+                            del gauges[i][key]
+            else:
+                # gauges written inline resolve their files against the config
+                self.InlineAssets(gauge, self.root, f"config.gauges[{i}]")
+
+        for p, panel in enumerate(get_key(config, "panels") or []):
+            if not isinstance(panel, dict):
+                continue
+            for r, ref in enumerate(get_key(panel, "gauges") or []):
+                if not isinstance(ref, dict) or not isinstance(get_key(ref, "path"), str):
+                    continue
+                path = get_key(ref, "path")
+                absolute = os.path.normpath(os.path.join(self.root, path))
+                if absolute not in name_by_path:
+                    gauge = self.LoadGauge(path, f"config.panels[{p}].gauges[{r}]")
+                    if gauge is None:
+                        continue
+                    name_by_path[absolute] = add_gauge(gauge, path)
+                pop_key(ref, "path")
+                set_key(ref, "name", name_by_path[absolute])
+
+        return config
+
+
+# --- bundle -------------------------------------------------------------------
+
+def align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def PackBundle(entries):
+    """entries: {name: bytes}. Returns the bundle as bytes."""
+    names = sorted(entries)
+    name_table = bytearray()
+    name_offsets = []
+    for name in names:
+        encoded = name.encode("utf-8")
+        name_offsets.append((len(name_table), len(encoded)))
+        name_table += encoded
+
+    data_offset = align(HEADER.size + INDEX_ENTRY.size * len(names) + len(name_table))
+
+    data = bytearray()
+    stored = {}  # sha256 -> (offset, length)
+    index = bytearray()
+    for name, (name_offset, name_length) in zip(names, name_offsets):
+        content = entries[name]
+        digest = hashlib.sha256(content).digest()
+        if digest not in stored:
+            data += b"\0" * (align(len(data)) - len(data))
+            stored[digest] = (data_offset + len(data), len(content))
+            data += content
+        offset, length = stored[digest]
+        index += INDEX_ENTRY.pack(offset, length, name_offset, name_length, digest[:16])
+
+    header_size = HEADER.size + len(index) + len(name_table)
+    padding = b"\0" * (data_offset - header_size)
+    total = data_offset + len(data)
+    return HEADER.pack(MAGIC, VERSION, len(names), data_offset, total) + index + name_table + padding + data
+
+
+def ReadIndex(data):
+    """Reads the index of a bundle (bytes or an mmap). Returns [(name, offset, length, hash)]."""
+    if len(data) < HEADER.size:
+        raise BundleError("not a bundle (too short)")
+    magic, version, count, data_offset, total = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise BundleError("not a bundle (wrong magic)")
+    if version != VERSION:
+        raise BundleError(f"unsupported bundle version {version}")
+    if total != len(data):
+        raise BundleError(f"bundle is {len(data)} bytes but should be {total}")
+
+    names_start = HEADER.size + INDEX_ENTRY.size * count
+    entries = []
+    for i in range(count):
+        offset, length, name_offset, name_length, digest = INDEX_ENTRY.unpack_from(data, HEADER.size + i * INDEX_ENTRY.size)
+        name = bytes(data[names_start + name_offset:names_start + name_offset + name_length]).decode("utf-8")
+        entries.append((name, offset, length, digest))
+    return entries
+
+
+# --- incremental --------------------------------------------------------------
+
+def manifest_path(bundle_path):
+    return bundle_path + ".manifest.json"
+
+
+def file_state(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def IsUpToDate(bundle_path, options_key):
+    """True if the bundle exists, was built with the same options and version of this
+    script and none of the files it was built from (including the models) changed
+    (size and modification time) since."""
+    try:
+        with open(manifest_path(bundle_path), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("options") != options_key or not os.path.exists(bundle_path):
+            return False
+        return all(file_state(path) == state[:2] for path, state in manifest["inputs"].items())
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+
+
+def LoadManifestHashes(bundle_path):
+    try:
+        with open(manifest_path(bundle_path), encoding="utf-8") as f:
+            return json.load(f).get("inputs", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def read_file(path, old_state):
+    """Returns (content, [size, mtime, sha256])."""
+    with open(path, "rb") as f:
+        content = f.read()
+    state = file_state(path)
+    if old_state and old_state[:2] == state:
+        digest = old_state[2]
+    else:
+        digest = hashlib.sha256(content).hexdigest()
+    return content, state + [digest]
+
+
+def BuildBundle(config_path, bundle_path, root, models_dir, force=False):
+    """Returns True if the bundle was written, False if its content did not change and
+    None if no input changed so nothing was read. Raises BundleError when the config is
+    invalid."""
+    # the models are inputs too: a changed property changes what is valid, and a
+    # model file added or removed changes the list
+    models = schema_files(models_dir)
+    options_key = {
+        "config": os.path.abspath(config_path),
+        "root": os.path.abspath(root),
+        "models": models,
+        "version": GetToolVersion(),
+    }
+    if not force and IsUpToDate(bundle_path, options_key):
+        return None
+
+    schema = LoadSchema(models_dir)
+    if "Config" not in schema or "Gauge" not in schema:
+        raise BundleError(f"no client models found in {models_dir}")
+
+    compiler = Compiler(root, schema)
+    config = compiler.Compile(config_path)
+    if compiler.errors or config is None:
+        raise BundleError("\n".join(compiler.errors) or "config could not be read")
+
+    old_inputs = LoadManifestHashes(bundle_path)
+    entries = {CONFIG_KEY: json.dumps(config, ensure_ascii=False, separators=(",", ":")).encode("utf-8")}
+    inputs = {}
+    for key, path in sorted(compiler.files.items()):
+        entries[key], inputs[path] = read_file(path, old_inputs.get(path))
+    for path in (compiler.inputs | set(models)) - set(compiler.files.values()):
+        inputs[path] = file_state(path) + [None]
+
+    bundle = PackBundle(entries)
+    written = write_if_changed(bundle_path, bundle)
+
+    manifest = {
+        "options": options_key,
+        "bundle": hashlib.sha256(bundle).hexdigest(),
+        "inputs": inputs,
+    }
+    write_if_changed(manifest_path(bundle_path), (json.dumps(manifest, indent=2, sort_keys=True) + "\n").encode("utf-8"))
+
+    print(f"{'Wrote' if written else 'Unchanged'} {bundle_path}: {len(entries)} entries ({len(compiler.files)} files), {len(bundle):,} bytes")
+    return written
+
+
+def PrintInfo(bundle_path):
+    import mmap
+    with open(bundle_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        entries = ReadIndex(data)
+        stored = {offset for _, offset, _, _ in entries}
+        print(f"{bundle_path}: {len(entries)} entries, {len(stored)} stored, {len(data):,} bytes")
+        for name, offset, length, digest in entries:
+            print(f"  {offset:>10}  {length:>10,}  {digest[:4].hex()}  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compiles a client config and everything it uses into one bundle file.")
+    parser.add_argument("config", help="client config JSON file (or a bundle with --info)")
+    parser.add_argument("output", nargs="?", help="bundle file to write")
+    parser.add_argument("--root", help="directory the config's gauge paths are relative to (default: the config's directory)")
+    parser.add_argument("--models", default=DEFAULT_MODELS_DIR, help="directory of the client's C# models used to validate")
+    parser.add_argument("--force", action="store_true", help="build even if no input changed")
+    parser.add_argument("--info", action="store_true", help="print the entries of a bundle")
+    args = parser.parse_args()
+
+    if args.info:
+        try:
+            PrintInfo(args.config)
+        except (OSError, ValueError, BundleError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        return
+
+    if not args.output:
+        parser.error("the output bundle path is required")
+
+    root = args.root or os.path.dirname(os.path.abspath(args.config))
+
+    start = time.perf_counter()
+    try:
+        written = BuildBundle(args.config, args.output, root, args.models, args.force)
+    except BundleError as e:
+        print(f"Error: {args.config} is invalid:\n{e}")
+        sys.exit(1)
+
+    if written is None:
+        print(f"{args.output} is up to date")
+    print(f"Took {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Tests of the bundle compiler, run with `python3 -m unittest` in this directory."""
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import main as bundle  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+
+
+def read_entries(data):
+    return {name: data[offset:offset + length] for name, offset, length, _ in bundle.ReadIndex(data)}
+
+
+class PackTest(unittest.TestCase):
+    ENTRIES = {
+        "client.json": b'{"gauges":[]}',
+        "gauges/a/bg.svg": b"<svg/>",
+        "gauges/b/bg.svg": b"<svg/>",
+        "fonts/é.ttf": b"\0\1\2",
+        "empty": b"",
+    }
+
+    def test_round_trip(self):
+        data = bundle.PackBundle(self.ENTRIES)
+        self.assertEqual(read_entries(data), self.ENTRIES)
+        self.assertEqual([entry[0] for entry in bundle.ReadIndex(data)], sorted(self.ENTRIES))
+
+    def test_contents_are_aligned(self):
+        for _, offset, _, _ in bundle.ReadIndex(bundle.PackBundle(self.ENTRIES)):
+            self.assertEqual(offset % bundle.ALIGNMENT, 0)
+
+    def test_same_content_is_stored_once(self):
+        data = bundle.PackBundle(self.ENTRIES)
+        offsets = {name: offset for name, offset, _, _ in bundle.ReadIndex(data)}
+        self.assertEqual(offsets["gauges/a/bg.svg"], offsets["gauges/b/bg.svg"])
+        self.assertEqual(data.count(b"<svg/>"), 1)
+
+    def test_rejects_cut_off_bundle(self):
+        data = bundle.PackBundle(self.ENTRIES)
+        with self.assertRaises(bundle.BundleError):
+            bundle.ReadIndex(data[:-1])
+        with self.assertRaises(bundle.BundleError):
+            bundle.ReadIndex(b"OSGTBL1\0" + data[8:])
+
+
+class IncrementalTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.models_dir = os.path.join(directory, "models")
+        shutil.copytree(bundle.DEFAULT_MODELS_DIR, self.models_dir)
+        self.bundle_path = os.path.join(directory, "client.bundle")
+
+    def build(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return bundle.BuildBundle(os.path.join(ROOT, "client", "src", "default-client.json"),
+                                      self.bundle_path, ROOT, self.models_dir)
+
+    def test_nothing_is_read_until_an_input_changes(self):
+        self.assertTrue(self.build())
+        self.assertIsNone(self.build())
+
+    def test_changed_model_is_checked_again(self):
+        self.build()
+        model = os.path.join(self.models_dir, "Config.cs")
+        with open(model, "a", encoding="utf-8") as f:
+            f.write("\n// changed\n")
+        # read and validated again, but the bundle itself is the same
+        self.assertFalse(self.build())
+        self.assertIsNone(self.build())
+
+    def test_added_model_is_checked_again(self):
+        self.build()
+        with open(os.path.join(self.models_dir, "Extra.cs"), "w", encoding="utf-8") as f:
+            f.write("// new\n")
+        self.assertFalse(self.build())
+
+
+if __name__ == "__main__":
+    unittest.main()
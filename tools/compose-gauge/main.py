@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Flattens consecutive static layers of gauges into one pre-composited SVG (or PNG) so
+the client draws fewer layers every frame.
+
+    python3 tools/compose-gauge/main.py gauges/PA-44/rpm/gauge.json
+    python3 tools/compose-gauge/main.py client/src/default-client.json --png
+
+A layer is static if nothing about it depends on a var: no transform with a var (or
+only skipped ones), no text and no debug. Layers are drawn last to first so a run of
+static layers next to each other in the list can be drawn once into one image with the
+same position, origin, size, rotation and translation the client would use.
+"""
+import argparse
+import base64
+import copy
+import json
+import os
+import sys
+from xml.etree.ElementTree import Element, SubElement, parse, register_namespace, tostring
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "create-svg-gauge"))
+import atlas  # noqa: E402
+from shared.config import LoadJsonWithComments, get_key, resolve_gauge_path, resolve_value, resolve_vector  # noqa: E402
+from shared.files import write_if_changed  # noqa: E402
+
+SVG_NS = atlas.SVG_NS
+XLINK_NS = "http://www.w3.org/1999/xlink"
+TRANSFORMS = ("rotate", "translateX", "translateY", "path")
+COMPOSED_DIR = "composed"
+
+register_namespace("xlink", XLINK_NS)
+
+
+def format_color(value):
+    # ColorDef: a CSS color string or [r, g, b] / [r, g, b, a]
+    if isinstance(value, str):
+        return value
+    r, g, b = (int(v) for v in value[:3])
+    if len(value) == 4:
+        alpha = value[3] / 255 if value[3] > 1 else value[3]
+        return f"rgba({r},{g},{b},{alpha:g})"
+    return f"rgb({r},{g},{b})"
+
+
+def IsStaticLayer(layer):
+    if get_key(layer, "debug") or get_key(layer, "text") is not None:
+        return False
+
+    transform = get_key(layer, "transform") or {}
+    for name in TRANSFORMS:
+        config = get_key(transform, name)
+        if config and get_key(config, "var") is not None and get_key(config, "skip") is not True:
+            return False
+
+    return get_key(layer, "image") is not None or get_key(layer, "fill") is not None
+
+
+def FindStaticRuns(layers, min_run=2):
+    """Returns [(first index, last index)] of runs of static layers. Skipped layers are
+    not drawn so they do not break a run."""
+    runs = []
+    start = None
+    drawn = 0
+
+    for i, layer in enumerate(layers + [None]):
+        if layer is not None and get_key(layer, "skip") is True:
+            continue
+        if layer is not None and IsStaticLayer(layer):
+            if start is None:
+                start = i
+                drawn = 0
+            drawn += 1
+            end = i
+            continue
+        if start is not None and drawn >= min_run:
+            runs.append((start, end))
+        start = None
+
+    return runs
+
+
+def AppendImage(parent, image_path, width, height, prefix):
+    if image_path.lower().endswith(".svg"):
+        root = parse(image_path).getroot()
+        atlas.prefix_ids(root, prefix)
+        # ImageCache stretches the picture to the layer size
+        view_box = root.get("viewBox")
+        if view_box is None:
+            view_box = f"0 0 {float(root.get('width', width)):g} {float(root.get('height', height)):g}"
+        nested = SubElement(parent, f"{{{SVG_NS}}}svg", {
+            "width": f"{width:g}",
+            "height": f"{height:g}",
+            "viewBox": view_box,
+            "preserveAspectRatio": "none",
+            "overflow": "visible"
+        })
+        nested.extend(list(root))
+    else:
+        with open(image_path, "rb") as f:
+            data = base64.b64encode(f.read()).decode("ascii")
+        mime = "image/png" if image_path.lower().endswith(".png") else "image/jpeg"
+        SubElement(parent, f"{{{SVG_NS}}}image", {
+            "width": f"{width:g}",
+            "height": f"{height:g}",
+            "preserveAspectRatio": "none",
+            f"{{{XLINK_NS}}}href": f"data:{mime};base64,{data}"
+        })
+
+
+def ComposeLayers(layers, gauge_width, gauge_height, base_dir):
+    """One SVG of the gauge's size drawing the layers like GaugeRenderer.DrawGaugeLayers."""
+    svg = Element(f"{{{SVG_NS}}}svg", {
+        "width": str(gauge_width),
+        "height": str(gauge_height),
+        "viewBox": f"0 0 {gauge_width} {gauge_height}"
+    })
+
+    # the last layer is drawn first
+    for index, layer in reversed(list(enumerate(layers))):
+        if get_key(layer, "skip") is True:
+            continue
+
+        width = resolve_value(get_key(layer, "width"), gauge_width) if get_key(layer, "width") is not None else gauge_width
+        height = resolve_value(get_key(layer, "height"), gauge_height) if get_key(layer, "height") is not None else gauge_height
+        origin_x, origin_y = resolve_vector(get_key(layer, "origin"), width, height)
+        pos_x, pos_y = resolve_vector(get_key(layer, "position"), gauge_width, gauge_height)
+        rotate = get_key(layer, "rotate", 0) or 0
+        pos_x += get_key(layer, "translateX", 0) or 0
+        pos_y += get_key(layer, "translateY", 0) or 0
+
+        transform = f"translate({pos_x:g},{pos_y:g})"
+        if rotate:
+            transform += f" rotate({rotate:g})"
+        transform += f" translate({-origin_x:g},{-origin_y:g})"
+        group = SubElement(svg, f"{{{SVG_NS}}}g", {"transform": transform})
+
+        fill = get_key(layer, "fill")
+        if fill is not None:
+            SubElement(group, f"{{{SVG_NS}}}rect", {"width": f"{width:g}", "height": f"{height:g}", "fill": format_color(fill)})
+
+        image = get_key(layer, "image")
+        if image is not None:
+            AppendImage(group, os.path.normpath(os.path.join(base_dir, image)), width, height, f"layer{index}")
+
+    return svg
+
+
+def ComposeGauge(gauge, base_dir, stem, png_scale=None, min_run=2):
+    """Returns (new gauge, {relative path: file content}) or (None, {}) when there is
+    nothing to flatten."""
+    layers = get_key(gauge, "layers") or []
+    width = get_key(gauge, "width")
+    height = get_key(gauge, "height")
+    runs = FindStaticRuns(layers, min_run)
+
+    if not runs or not width or not height:
+        return None, {}
+
+    files = {}
+    new_layers = []
+    previous_end = -1
+
+    for number, (start, end) in enumerate(runs):
+        new_layers += layers[previous_end + 1:start]
+        run = layers[start:end + 1]
+        svg = ComposeLayers(run, width, height, base_dir)
+        svg_text = tostring(svg, encoding="unicode")
+
+        if png_scale:
+            rasterizer = atlas.FindRasterizer()
+            content = atlas.RASTERIZERS[rasterizer][1](svg_text, png_scale)
+            image = f"{COMPOSED_DIR}/{stem}-{number}.png"
+        else:
+            content = ('<?xml version="1.0" ?>\n' + svg_text + "\n").encode("utf-8")
+            image = f"{COMPOSED_DIR}/{stem}-{number}.svg"
+
+        files[image] = content
+        names = [get_key(layer, "name") or os.path.basename(get_key(layer, "image") or "fill") for layer in run
+                 if get_key(layer, "skip") is not True]
+        new_layers.append({"name": f"composed: {', '.join(names)}", "image": image, "width": width, "height": height})
+        # skipped layers are kept so they can still be turned back on by hand
+        new_layers += [layer for layer in run if get_key(layer, "skip") is True]
+        previous_end = end
+
+    new_layers += layers[previous_end + 1:]
+
+    new_gauge = copy.deepcopy(gauge)
+    for key in list(new_gauge):
+        if key.lower() == "layers":
+            new_gauge[key] = new_layers
+
+    return new_gauge, files
+
+
+def composed_path(path, in_place):
+    if in_place:
+        return path
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.composed{ext}"
+
+
+def write_json(path, data):
+    return write_if_changed(path, (json.dumps(data, indent=2) + "\n").encode("utf-8"))
+
+
+def ComposeGaugeFile(path, args, stats):
+    """Composes a gauge.json. Returns the path of the gauge.json to use instead or None."""
+    gauge = LoadJsonWithComments(path)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    stem = os.path.splitext(os.path.basename(path))[0]
+    new_gauge, files = ComposeGauge(gauge, base_dir, stem, args.png_scale if args.png else None, args.min_run)
+
+    before = len(get_key(gauge, "layers") or [])
+    if new_gauge is None:
+        print(f"{path}: {before} layers, nothing to flatten")
+        return None
+
+    for relative_path, content in files.items():
+        output_path = os.path.join(base_dir, relative_path)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        write_if_changed(output_path, content)
+
+    output_path = composed_path(path, args.in_place)
+    write_json(output_path, new_gauge)
+
+    after = len(get_key(new_gauge, "layers"))
+    stats["before"] += before
+    stats["after"] += after
+    print(f"{path}: {before} => {after} layers, wrote {output_path}")
+    return output_path
+
+
+def ComposeConfigFile(path, args, stats):
+    config = LoadJsonWithComments(path)
+    config_dir = os.path.dirname(os.path.abspath(path))
+    changed = False
+    composed = {}
+
+    for panel in get_key(config, "panels") or []:
+        for gauge_ref in get_key(panel, "gauges") or []:
+            gauge_path = get_key(gauge_ref, "path")
+            if not gauge_path:
+                continue
+
+            if gauge_path not in composed:
+                full_path = resolve_gauge_path(gauge_path, config_dir)
+                if full_path is None:
+                    print(f"Gauge not found: {gauge_path}")
+                    composed[gauge_path] = None
+                    continue
+                new_path = ComposeGaugeFile(full_path, args, stats)
+                composed[gauge_path] = composed_path(gauge_path, args.in_place) if new_path else None
+
+            if composed[gauge_path] and composed[gauge_path] != gauge_path:
+                for key in gauge_ref:
+                    if key.lower() == "path":
+                        gauge_ref[key] = composed[gauge_path]
+                changed = True
+
+    # gauges defined in the config itself
+    for gauge in get_key(config, "gauges") or []:
+        if get_key(gauge, "path"):
+            continue
+        name = get_key(gauge, "name") or "gauge"
+        new_gauge, files = ComposeGauge(gauge, config_dir, name, args.png_scale if args.png else None, args.min_run)
+        if new_gauge is None:
+            continue
+        for relative_path, content in files.items():
+            output_path = os.path.join(config_dir, relative_path)
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            write_if_changed(output_path, content)
+        stats["before"] += len(get_key(gauge, "layers"))
+        stats["after"] += len(get_key(new_gauge, "layers"))
+        gauge.clear()
+        gauge.update(new_gauge)
+        changed = True
+
+    if changed:
+        output_path = composed_path(path, args.in_place)
+        write_json(output_path, config)
+        print(f"Wrote {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flattens consecutive static gauge layers into one image.")
+    parser.add_argument("inputs", nargs="+", help="gauge JSON files or client configs (with panels)")
+    parser.add_argument("--png", action="store_true", help="pre-render the flattened layers as PNG instead of SVG")
+    parser.add_argument("--png-scale", type=float, default=2, help="scale of the PNGs, use your display's scaling (default: 2)")
+    parser.add_argument("--min-run", type=int, default=2, help="only flatten at least this many static layers (default: 2)")
+    parser.add_argument("--in-place", action="store_true",
+                        help="overwrite the JSON files instead of writing <name>.composed.json next to them")
+    args = parser.parse_args()
+
+    stats = {"before": 0, "after": 0}
+
+    for path in args.inputs:
+        if not os.path.exists(path):
+            print(f"Error: File not found: {path}")
+            sys.exit(1)
+
+        data = LoadJsonWithComments(path)
+        if get_key(data, "panels") is not None:
+            ComposeConfigFile(path, args, stats)
+        else:
+            ComposeGaugeFile(path, args, stats)
+
+    if stats["before"]:
+        print(f"Layers per frame: {stats['before']} => {stats['after']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Rasterizes static layers into a PNG sprite atlas per device scale factor.
+
+All layers of an output directory are packed into one SVG document (each layer is a
+nested <svg>) which is rasterized once per scale so no PNG decoding or encoding has
+to happen in Python. The rasterizer is whichever of these is available:
+
+- resvg_py (pip install resvg-py)
+- cairosvg (pip install cairosvg)
+- rsvg-convert (librsvg)
+- resvg
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from xml.etree.ElementTree import Element, SubElement, parse, register_namespace, tostring
+
+from shared.config import LoadJsonWithComments
+from shared.files import write_if_changed
+
+SVG_NS = "http://www.w3.org/2000/svg"
+ATLAS_INDEX_NAME = "atlas.json"
+# gap between sprites so filtering never samples a neighbour
+PADDING = 2
+FONTS_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "client", "src", "fonts"))
+
+register_namespace("", SVG_NS)
+
+
+def RasterizeWithResvgPy(svg_text, scale):
+    import resvg_py
+    font_dirs = [FONTS_DIR] if os.path.isdir(FONTS_DIR) else None
+    return bytes(resvg_py.svg_to_bytes(svg_string=svg_text, zoom=scale, font_dirs=font_dirs))
+
+
+def RasterizeWithCairoSvg(svg_text, scale):
+    import cairosvg
+    return cairosvg.svg2png(bytestring=svg_text.encode("utf-8"), scale=scale)
+
+
+def RasterizeWithRsvgConvert(svg_text, scale):
+    result = subprocess.run(["rsvg-convert", "--format", "png", "--zoom", str(scale)],
+                            input=svg_text.encode("utf-8"), capture_output=True, check=True)
+    return result.stdout
+
+
+def RasterizeWithResvg(svg_text, scale):
+    with tempfile.TemporaryDirectory() as tmp:
+        svg_path = os.path.join(tmp, "atlas.svg")
+        png_path = os.path.join(tmp, "atlas.png")
+        with open(svg_path, "w", encoding="utf-8") as f:
+            f.write(svg_text)
+        args = ["resvg", "--zoom", str(scale)]
+        if os.path.isdir(FONTS_DIR):
+            args += ["--use-fonts-dir", FONTS_DIR]
+        subprocess.run(args + [svg_path, png_path], capture_output=True, check=True)
+        with open(png_path, "rb") as f:
+            return f.read()
+
+
+def module_available(name):
+    try:
+        __import__(name)
+        return True
+    except (ImportError, OSError):  # cairosvg raises OSError without the cairo library
+        return False
+
+
+# name -> (is available, rasterize(svg_text, scale) -> png bytes)
+RASTERIZERS = {
+    "resvg_py": (lambda: module_available("resvg_py"), RasterizeWithResvgPy),
+    "cairosvg": (lambda: module_available("cairosvg"), RasterizeWithCairoSvg),
+    "rsvg-convert": (lambda: shutil.which("rsvg-convert") is not None, RasterizeWithRsvgConvert),
+    "resvg": (lambda: shutil.which("resvg") is not None, RasterizeWithResvg),
+}
+
+
+def FindRasterizer():
+    for name, (available, _) in RASTERIZERS.items():
+        if available():
+            return name
+    raise RuntimeError(f"No rasterizer found, install one of: {', '.join(RASTERIZERS)}")
+
+
+def GetStaticLayerNames(output_dir, layers):
+    """Layers which are never transformed. A layer's "raster" overrides this, otherwise
+    the gauge.json next to the SVGs decides: layers used without a transform are static."""
+    names = set()
+    gauge_path = os.path.join(output_dir, "gauge.json")
+    used_without_transform = set()
+
+    if os.path.exists(gauge_path):
+        gauge = LoadJsonWithComments(gauge_path)
+        for gauge_layer in gauge.get("layers", []):
+            image = gauge_layer.get("image")
+            if image and image.endswith(".svg") and not gauge_layer.get("transform"):
+                used_without_transform.add(os.path.splitext(os.path.basename(image))[0])
+
+    for layer in layers:
+        name = layer.get("name", "unnamed")
+        raster = layer.get("raster")
+        if raster is True or (raster is None and name in used_without_transform):
+            names.add(name)
+
+    return sorted(names)
+
+
+def PackShelves(sizes):
+    """Packs rects into rows ("shelves") tallest first. Returns ({name: (x, y)}, width, height)."""
+    order = sorted(sizes, key=lambda name: (-sizes[name][1], name))
+    total_area = sum((w + PADDING) * (h + PADDING) for w, h in sizes.values())
+    max_width = max(max(w for w, _ in sizes.values()) + PADDING, math.ceil(math.sqrt(total_area)))
+
+    positions = {}
+    x = y = shelf_height = atlas_width = 0
+
+    for name in order:
+        w, h = sizes[name]
+        if x > 0 and x + w + PADDING > max_width:
+            x = 0
+            y += shelf_height
+            shelf_height = 0
+        positions[name] = (x, y)
+        x += w + PADDING
+        shelf_height = max(shelf_height, h + PADDING)
+        atlas_width = max(atlas_width, x)
+
+    return positions, atlas_width, y + shelf_height
+
+
+def prefix_ids(root, prefix):
+    # every layer uses id="shadow" so make them unique once they share a document
+    ids = {el.get("id") for el in root.iter() if el.get("id")}
+    if not ids:
+        return
+
+    for el in root.iter():
+        for key, value in el.items():
+            if key == "id" and value in ids:
+                el.set(key, f"{prefix}-{value}")
+            elif "#" in value:
+                el.set(key, re.sub(r"#([\w.-]+)", lambda m: f"#{prefix}-{m.group(1)}" if m.group(1) in ids else m.group(0), value))
+
+
+def ComposeAtlasSvg(output_dir, names):
+    """Returns (svg text, {name: (x, y, width, height)}) in SVG units."""
+    roots = {}
+    sizes = {}
+
+    for name in names:
+        root = parse(os.path.join(output_dir, f"{name}.svg")).getroot()
+        prefix_ids(root, name)
+        roots[name] = root
+        sizes[name] = (math.ceil(float(root.get("width"))), math.ceil(float(root.get("height"))))
+
+    positions, width, height = PackShelves(sizes)
+
+    atlas = Element(f"{{{SVG_NS}}}svg", {"width": str(width), "height": str(height), "viewBox": f"0 0 {width} {height}"})
+    rects = {}
+
+    for name in names:
+        root = roots[name]
+        x, y = positions[name]
+        w, h = sizes[name]
+        nested = SubElement(atlas, f"{{{SVG_NS}}}svg", {
+            "x": str(x),
+            "y": str(y),
+            "width": str(w),
+            "height": str(h),
+            "viewBox": root.get("viewBox") or f"0 0 {w} {h}"
+        })
+        nested.extend(list(root))
+        rects[name] = (x, y, w, h)
+
+    return tostring(atlas, encoding="unicode"), rects
+
+
+def BuildAtlas(output_dir, names, scales, rasterizer=None):
+    """Rasterizes the named layers of an output directory into atlas@<scale>x.png files
+    and an atlas.json index. Scales whose input hash did not change are not rendered again.
+    Returns the number of scales that were rendered."""
+    index_path = os.path.join(output_dir, ATLAS_INDEX_NAME)
+
+    if not names:
+        return 0
+
+    rasterizer = rasterizer or FindRasterizer()
+    svg_text, rects = ComposeAtlasSvg(output_dir, names)
+
+    previous = {}
+    if os.path.exists(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            previous = json.load(f).get("scales", {})
+
+    index = {"rasterizer": rasterizer, "scales": {}}
+    rendered = 0
+
+    for scale in scales:
+        key = f"{scale:g}"
+        image = f"atlas@{key}x.png"
+        image_path = os.path.join(output_dir, image)
+        content_hash = hashlib.sha256(f"{rasterizer}\n{scale}\n{svg_text}".encode("utf-8")).hexdigest()
+
+        if previous.get(key, {}).get("hash") != content_hash or not os.path.exists(image_path):
+            png = RASTERIZERS[rasterizer][1](svg_text, scale)
+            write_if_changed(image_path, png)
+            rendered += 1
+
+        index["scales"][key] = {
+            "image": image,
+            "hash": content_hash,
+            "sprites": {
+                name: {"x": round(x * scale), "y": round(y * scale), "width": round(w * scale), "height": round(h * scale)}
+                for name, (x, y, w, h) in rects.items()
+            }
+        }
+
+    write_if_changed(index_path, (json.dumps(index, indent=2, sort_keys=True) + "\n").encode("utf-8"))
+    return rendered
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for create-svg-gauge.
+
+    python3 tools/create-svg-gauge/benchmark.py writer|ticks [--repeat N]
+    python3 tools/create-svg-gauge/benchmark.py suite [--output results.json] [--baseline baseline.json]
+
+The suite builds synthetic gauges of growing size (every operation type, dense tick
+scales, many layers, with and without shadows) and times every stage of a build
+separately: building the nodes, assembling the SVG, minifying it and writing it. The
+peak memory of every stage is measured in a separate run with tracemalloc so it does
+not slow down the timed runs.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from xml.dom import minidom
+from xml.etree.ElementTree import ElementTree, tostring
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import main as gauge  # noqa: E402
+
+# keep the builders quiet
+gauge.SetLogLevel(gauge.QUIET)
+
+
+def WriteSvgFileMinidom(svg_element, name, output_dir):
+    # the original writer: ElementTree.write, tostring and a minidom round-trip
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"{name}.svg")
+    ElementTree(svg_element).write(path, encoding="utf-8", xml_declaration=True)
+    raw_xml = tostring(svg_element, encoding="unicode")
+    parsed = minidom.parseString(raw_xml)
+    pretty_xml = parsed.toprettyxml(indent="  ")
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(pretty_xml)
+
+
+def CreateCompassLayer():
+    # a dense 360 tick compass card with labels every 10 degrees
+    operations = [
+        {"type": "circle", "radius": 290, "fill": "rgb(16,16,16)"},
+        {"type": "gaugeTicks", "radius": 280, "degreesStart": 0, "degreesEnd": 359, "degreesGap": 1,
+         "tickLength": 10, "tickWidth": 1, "tickFill": "rgb(255,255,255)"},
+        {"type": "gaugeTicks", "radius": 280, "degreesStart": 0, "degreesEnd": 355, "degreesGap": 5,
+         "tickLength": 20, "tickWidth": 2, "tickFill": "rgb(255,255,255)"},
+        {"type": "gaugeTicks", "radius": 280, "degreesStart": 0, "degreesEnd": 350, "degreesGap": 10,
+         "tickLength": 30, "tickWidth": 3, "tickFill": "rgb(255,255,255)"},
+        {"type": "gaugeTickLabels", "radius": 220, "degreesStart": 0, "degreesEnd": 350, "degreesGap": 10,
+         "labels": [str(i) for i in range(0, 36)], "labelSize": 20, "labelFont": "Arial"},
+    ]
+    return {"name": "compass", "width": 600, "height": 600, "operations": operations}
+
+
+def Measure(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return best, peak
+
+
+def BenchmarkWriter(repeat):
+    layer = CreateCompassLayer()
+    svg = gauge.ConvertNodesIntoSvg(gauge.BuildLayerNodes(layer), layer["width"], layer["height"])
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        writers = [
+            ("minidom", lambda: WriteSvgFileMinidom(svg, "compass", output_dir)),
+            ("streaming", lambda: gauge.WriteSvgFile(svg, "compass", output_dir)),
+            ("streaming --compact", lambda: gauge.WriteSvgFile(svg, "compass", output_dir, compact=True)),
+        ]
+
+        print(f"Writing a layer of {sum(1 for _ in svg.iter())} elements, best of {repeat}")
+        print(f"{'writer':<22}{'time (ms)':>12}{'peak memory (KiB)':>20}{'size (KiB)':>12}")
+
+        for label, fn in writers:
+            elapsed, peak = Measure(fn, repeat)
+            size = os.path.getsize(os.path.join(output_dir, "compass.svg"))
+            print(f"{label:<22}{elapsed * 1000:>12.2f}{peak / 1024:>20.1f}{size / 1024:>12.1f}")
+
+
+def BenchmarkTicks(repeat):
+    # a fine vario/altimeter style scale: 3600 ticks and 360 labels
+    ticks = dict(position=(300, 300), radius=280, degreesStart=0, degreesEnd=359.9, degreesGap=0.1,
+                 tickLength=10, tickWidth=1, tickFill="rgb(255,255,255)")
+    labels = dict(position=(300, 300), radius=240, degreesStart=0, degreesEnd=359, degreesGap=1,
+                  labels=[str(i) for i in range(360)])
+
+    numpy = gauge.np
+    runs = [
+        ("numpy" if numpy is not None else "numpy (not installed)", numpy, False),
+        ("pure python", None, False),
+        ("numpy --tick-paths" if numpy is not None else "numpy --tick-paths (not installed)", numpy, True),
+        ("pure python --tick-paths", None, True),
+    ]
+
+    print(f"Creating 3600 ticks and 360 labels, best of {repeat}")
+    print(f"{'geometry':<36}{'time (ms)':>12}{'peak memory (KiB)':>20}{'elements':>10}")
+
+    for label, np_module, as_path in runs:
+        gauge.np = np_module
+
+        def run():
+            return (gauge.CreateGaugeTicksNode(**ticks, asPath=as_path),
+                    gauge.CreateGaugeTickLabelsNode(**labels))
+
+        elapsed, peak = Measure(run, repeat)
+        elements = sum(sum(1 for _ in node.iter()) for node in run())
+        print(f"{label:<36}{elapsed * 1000:>12.2f}{peak / 1024:>20.1f}{elements:>10}")
+
+    gauge.np = numpy
+
+
+SUITE_VERSION = 1
+SUITE_SIZES = (10, 100, 1000, 10000, 100000)
+STAGES = ("build", "assemble", "minify", "write")
+# changes smaller than these are noise, not regressions
+NOISE_SECONDS = 0.0005
+NOISE_BYTES = 4096
+
+
+def SyntheticOperation(kind, i, count):
+    """Operation number `i` of `count` of a kind, spread around a 600x600 gauge."""
+    angle = 360 * i / count
+    x, y = gauge.polar_to_cartesian(300, 300, 50 + i % 230, angle)
+    fill = f"rgb({i % 256},{i * 7 % 256},{i * 13 % 256})"
+
+    if kind == "circle":
+        return {"type": "circle", "x": x, "y": y, "radius": 5 + i % 20, "fill": fill}
+    if kind == "arc":
+        return {"type": "arc", "radius": 100 + i % 180, "degreesStart": angle, "degreesEnd": angle + 30,
+                "innerThickness": 5, "fill": fill}
+    if kind == "gaugeTicks":
+        # 10 ticks each
+        return {"type": "gaugeTicks", "radius": 280 - i % 100, "degreesStart": angle, "degreesEnd": angle + 90,
+                "degreesGap": 10, "tickLength": 10, "tickWidth": 2, "tickFill": fill}
+    if kind == "gaugeTickLabels":
+        return {"type": "gaugeTickLabels", "radius": 240 - i % 100, "degreesStart": angle, "degreesEnd": angle + 30,
+                "degreesGap": 10, "labels": [str(i), "1", "2", "3"], "labelSize": 12}
+    if kind == "text":
+        return {"type": "text", "x": x, "y": y, "text": str(i), "size": 12, "fill": fill}
+    if kind == "square":
+        return {"type": "square", "x": x, "y": y, "width": 20, "height": 10, "fill": fill, "round": i % 4}
+    if kind == "triangle":
+        return {"type": "triangle", "x": x, "y": y, "width": 20, "height": 20, "rotation": angle, "fill": fill}
+    raise ValueError(f"Unknown operation: {kind}")
+
+
+OPERATION_KINDS = ("circle", "arc", "gaugeTicks", "gaugeTickLabels", "text", "square", "triangle")
+MIXED_KINDS = ("circle", "arc", "gaugeTicks", "gaugeTickLabels", "square", "triangle")
+
+
+def SuiteCases(sizes):
+    """Yields (name, operation count, layers, options). Cases are made when needed as
+    the big ones take a lot of memory."""
+    for size in sizes:
+        for kind in OPERATION_KINDS:
+            operations = [SyntheticOperation(kind, i, size) for i in range(size)]
+            yield f"{kind}/{size}", size, [{"name": kind, "operations": operations}], {}
+
+        # one scale with `size` ticks, as lines and as a single path
+        gap = 360 / size
+        ticks = {"type": "gaugeTicks", "radius": 280, "degreesStart": 0, "degreesEnd": 360 - gap, "degreesGap": gap,
+                 "tickLength": 10, "tickWidth": 1, "tickFill": "rgb(255,255,255)"}
+        yield f"dense-ticks/{size}", 1, [{"name": "ticks", "operations": [ticks]}], {}
+        yield f"dense-ticks-path/{size}", 1, [{"name": "ticks", "operations": [{**ticks, "asPath": True}]}], {}
+
+        # the same operations spread over layers of 10
+        mixed = [SyntheticOperation(MIXED_KINDS[i % len(MIXED_KINDS)], i, size) for i in range(size)]
+        layers = [{"name": f"layer{i // 10}", "operations": mixed[i:i + 10]} for i in range(0, size, 10)]
+        yield f"layers/{size}", size, layers, {}
+        shadowed = [{**layer, "shadow": {"size": 4}} for layer in layers]
+        yield f"layers-shadow/{size}", size, shadowed, {}
+
+
+def RunStages(layers, output_dir, options):
+    """Runs every stage of a build for each layer. Returns ({stage: seconds}, element count)."""
+    times = dict.fromkeys(STAGES, 0.0)
+    elements = 0
+
+    for layer in layers:
+        started = time.perf_counter()
+        nodes = gauge.BuildLayerNodes(layer, options)
+        times["build"] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        svg = gauge.ConvertNodesIntoSvg(nodes, layer.get("width", 600), layer.get("height", 600), layer.get("shadow"))
+        times["assemble"] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        gauge.MinifySvg(svg, 2, True)
+        times["minify"] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        gauge.WriteSvgFile(svg, layer["name"], output_dir, compact=True)
+        times["write"] += time.perf_counter() - started
+
+        elements += sum(1 for _ in svg.iter())
+
+    return times, elements
+
+
+def MeasureStagePeaks(layers, output_dir, options):
+    """Peak memory (bytes above what was allocated before) of every stage of a build."""
+    peaks = dict.fromkeys(STAGES, 0)
+    tracemalloc.start()
+
+    def measure(stage, fn):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+        peaks[stage] = max(peaks[stage], peak - before)
+        return result
+
+    try:
+        for layer in layers:
+            nodes = measure("build", lambda: gauge.BuildLayerNodes(layer, options))
+            svg = measure("assemble", lambda: gauge.ConvertNodesIntoSvg(
+                nodes, layer.get("width", 600), layer.get("height", 600), layer.get("shadow")))
+            measure("minify", lambda: gauge.MinifySvg(svg, 2, True))
+            measure("write", lambda: gauge.WriteSvgFile(svg, layer["name"], output_dir, compact=True))
+    finally:
+        tracemalloc.stop()
+
+    return peaks
+
+
+def BenchmarkSuite(repeat, sizes, name_filter=None):
+    results = []
+
+    print(f"{'case':<28}{'ops':>8}{'elements':>10}" + "".join(f"{stage + ' (ms)':>15}" for stage in STAGES)
+          + f"{'peak (KiB)':>12}")
+
+    for name, ops, layers, options in SuiteCases(sizes):
+        if name_filter and name_filter not in name:
+            continue
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            best = None
+            for _ in range(repeat):
+                times, elements = RunStages(layers, output_dir, options)
+                best = times if best is None else {stage: min(best[stage], times[stage]) for stage in STAGES}
+            peaks = MeasureStagePeaks(layers, output_dir, options)
+
+        results.append({
+            "name": name,
+            "operations": ops,
+            "layers": len(layers),
+            "elements": elements,
+            "stages": {stage: {"seconds": best[stage], "peakBytes": peaks[stage]} for stage in STAGES},
+            "seconds": sum(best.values()),
+            "peakBytes": max(peaks.values()),
+        })
+        print(f"{name:<28}{ops:>8}{elements:>10}" + "".join(f"{best[stage] * 1000:>15.2f}" for stage in STAGES)
+              + f"{max(peaks.values()) / 1024:>12.1f}")
+
+    return {
+        "version": SUITE_VERSION,
+        "python": platform.python_version(),
+        "numpy": gauge.np is not None,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def CompareToBaseline(report, baseline, threshold):
+    """Prints the change of every stage against a baseline report. Returns the
+    regressions: stages which got slower (or used more memory) by more than
+    `threshold` (0.1 = 10%) and by more than the noise of a run."""
+    previous = {result["name"]: result for result in baseline.get("results", [])}
+    regressions = []
+
+    print(f"\nCompared to the baseline (python {baseline.get('python')}, numpy {baseline.get('numpy')}):")
+    print(f"{'case':<28}{'stage':<10}{'baseline (ms)':>15}{'now (ms)':>12}{'change':>9}{'peak change':>13}")
+
+    for result in report["results"]:
+        old = previous.get(result["name"])
+        if old is None:
+            print(f"{result['name']:<28}not in the baseline")
+            continue
+
+        for stage in STAGES:
+            before, after = old["stages"][stage], result["stages"][stage]
+            time_change = after["seconds"] / before["seconds"] - 1 if before["seconds"] else 0.0
+            peak_change = after["peakBytes"] / before["peakBytes"] - 1 if before["peakBytes"] else 0.0
+
+            regressed = ((time_change > threshold and after["seconds"] - before["seconds"] > NOISE_SECONDS)
+                         or (peak_change > threshold and after["peakBytes"] - before["peakBytes"] > NOISE_BYTES))
+            if regressed:
+                regressions.append((result["name"], stage, time_change, peak_change))
+
+            print(f"{result['name']:<28}{stage:<10}{before['seconds'] * 1000:>15.2f}{after['seconds'] * 1000:>12.2f}"
+                  f"{time_change:>+9.1%}{peak_change:>+13.1%}{'  REGRESSION' if regressed else ''}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("benchmark", choices=["writer", "ticks", "suite"])
+    parser.add_argument("--repeat", type=int, default=None, help="best of this many runs (default: 10, 3 for suite)")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in SUITE_SIZES),
+                        help="comma separated operation counts of the suite (default: 10 to 100000)")
+    parser.add_argument("--filter", help="only run suite cases whose name contains this")
+    parser.add_argument("--output", help="write the suite results to this JSON file")
+    parser.add_argument("--baseline", help="compare the suite results to a JSON file written with --output")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="slowdown (or memory growth) counted as a regression by --baseline (default: 0.1 = 10%%)")
+    args = parser.parse_args()
+
+    if args.benchmark == "writer":
+        BenchmarkWriter(args.repeat or 10)
+    elif args.benchmark == "ticks":
+        BenchmarkTicks(args.repeat or 10)
+    elif args.benchmark == "suite":
+        baseline = None
+        if args.baseline:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+
+        sizes = [int(size) for size in args.sizes.split(",")]
+        report = BenchmarkSuite(args.repeat or 3, sizes, args.filter)
+
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+                f.write("\n")
+            print(f"Wrote {args.output}")
+
+        if baseline is not None:
+            regressions = CompareToBaseline(report, baseline, args.threshold)
+            if regressions:
+                print(f"{len(regressions)} stages regressed by more than {args.threshold:.0%}")
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
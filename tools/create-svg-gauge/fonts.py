@@ -0,0 +1,411 @@
+"""
+Reads glyph outlines from TrueType fonts (the glyf flavour, like
+client/src/fonts/Gordon.ttf) so text can be written as <path> elements.
+
+Only what drawing a line of text needs is read: the character map, the advance
+widths, pair kerning (the `kern` feature of GPOS, like browsers and resvg apply) and
+the outlines. There are no ligatures, other shaping or hinting.
+
+Outlines are cached per font and glyph so a digit repeated all over a scale is only
+decoded once per process. Commands are absolute and in the format of main.parse_path.
+"""
+import os
+import struct
+
+FONT_EXTENSIONS = (".ttf", ".otf")
+
+# simple glyph flags
+ON_CURVE = 0x01
+X_SHORT = 0x02
+Y_SHORT = 0x04
+REPEAT = 0x08
+X_SAME = 0x10
+Y_SAME = 0x20
+
+# composite glyph flags
+ARGS_ARE_WORDS = 0x0001
+ARGS_ARE_XY = 0x0002
+HAS_SCALE = 0x0008
+MORE_COMPONENTS = 0x0020
+HAS_XY_SCALE = 0x0040
+HAS_2X2 = 0x0080
+
+# GPOS lookup types
+PAIR_ADJUSTMENT = 2
+EXTENSION = 9
+X_ADVANCE = 0x0004
+
+_fonts = {}
+
+
+def contour_commands(points):
+    """Turns the points of a TrueType contour (x, y, on curve) into M/L/Q/Z commands.
+    Two off curve points in a row have an implied on curve point between them."""
+    first_on = next((i for i, point in enumerate(points) if point[2]), None)
+    if first_on is None:
+        start = ((points[0][0] + points[-1][0]) / 2, (points[0][1] + points[-1][1]) / 2)
+        rest = points
+    else:
+        start = points[first_on][:2]
+        rest = points[first_on + 1:] + points[:first_on]
+
+    commands = [("M", list(start))]
+    control = None
+    for x, y, on in rest:
+        if on:
+            commands.append(("Q", [*control, x, y]) if control else ("L", [x, y]))
+            control = None
+        else:
+            if control:
+                commands.append(("Q", [*control, (control[0] + x) / 2, (control[1] + y) / 2]))
+            control = (x, y)
+
+    if control:
+        commands.append(("Q", [*control, *start]))
+    commands.append(("Z", []))
+    return commands
+
+
+class Font:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = data = f.read()
+        self.path = path
+
+        count, = struct.unpack_from(">H", data, 4)
+        self.tables = {}
+        for i in range(count):
+            tag, _, offset, length = struct.unpack_from(">4sIII", data, 12 + 16 * i)
+            self.tables[tag.decode("latin-1")] = (offset, length)
+
+        if "glyf" not in self.tables:
+            raise ValueError(f"{path}: only TrueType (glyf) outlines are supported")
+
+        head = self.tables["head"][0]
+        self.units_per_em, = struct.unpack_from(">H", data, head + 18)
+        long_offsets, = struct.unpack_from(">h", data, head + 50)
+
+        glyph_count, = struct.unpack_from(">H", data, self.tables["maxp"][0] + 4)
+        loca = self.tables["loca"][0]
+        if long_offsets:
+            self.offsets = struct.unpack_from(f">{glyph_count + 1}I", data, loca)
+        else:
+            self.offsets = [o * 2 for o in struct.unpack_from(f">{glyph_count + 1}H", data, loca)]
+
+        metrics, = struct.unpack_from(">H", data, self.tables["hhea"][0] + 34)
+        hmtx = self.tables["hmtx"][0]
+        advances = list(struct.unpack_from(f">{metrics * 2}H", data, hmtx)[::2])
+        # glyphs after the last metric share its advance
+        self.advances = advances + [advances[-1]] * (glyph_count - metrics)
+
+        self.cmap = self.read_cmap()
+        self.pair_tables = self.read_kerning() if "GPOS" in self.tables else []
+        self.kerning = {}
+        self.outlines = {}
+        self.extracted = 0
+
+    def read_cmap(self):
+        data = self.data
+        cmap = self.tables["cmap"][0]
+        _, count = struct.unpack_from(">HH", data, cmap)
+
+        subtables = {}
+        for i in range(count):
+            platform, encoding, offset = struct.unpack_from(">HHI", data, cmap + 4 + 8 * i)
+            subtables[(platform, encoding)] = cmap + offset
+
+        # full unicode first, then the basic plane
+        for key in ((3, 10), (0, 4), (0, 6), (3, 1), (0, 3), (0, 1), (0, 0)):
+            if key not in subtables:
+                continue
+            offset = subtables[key]
+            fmt, = struct.unpack_from(">H", data, offset)
+            if fmt == 4:
+                return self.read_cmap_format4(offset)
+            if fmt == 12:
+                return self.read_cmap_format12(offset)
+        return {}
+
+    def read_cmap_format4(self, offset):
+        data = self.data
+        segments = struct.unpack_from(">H", data, offset + 6)[0] // 2
+        ends = struct.unpack_from(f">{segments}H", data, offset + 14)
+        starts = struct.unpack_from(f">{segments}H", data, offset + 16 + 2 * segments)
+        deltas = struct.unpack_from(f">{segments}h", data, offset + 16 + 4 * segments)
+        range_offsets_at = offset + 16 + 6 * segments
+        range_offsets = struct.unpack_from(f">{segments}H", data, range_offsets_at)
+
+        cmap = {}
+        for i in range(segments):
+            for code in range(starts[i], ends[i] + 1):
+                if code == 0xFFFF:
+                    continue
+                if range_offsets[i]:
+                    at = range_offsets_at + 2 * i + range_offsets[i] + 2 * (code - starts[i])
+                    glyph, = struct.unpack_from(">H", data, at)
+                    if glyph:
+                        glyph = (glyph + deltas[i]) & 0xFFFF
+                else:
+                    glyph = (code + deltas[i]) & 0xFFFF
+                if glyph:
+                    cmap[code] = glyph
+        return cmap
+
+    def read_cmap_format12(self, offset):
+        count, = struct.unpack_from(">I", self.data, offset + 12)
+        cmap = {}
+        for i in range(count):
+            start, end, glyph = struct.unpack_from(">III", self.data, offset + 16 + 12 * i)
+            for code in range(start, end + 1):
+                cmap[code] = glyph + code - start
+        return cmap
+
+    def read_coverage(self, offset):
+        data = self.data
+        fmt, count = struct.unpack_from(">HH", data, offset)
+        if fmt == 1:
+            return {glyph: i for i, glyph in enumerate(struct.unpack_from(f">{count}H", data, offset + 4))}
+        coverage = {}
+        for i in range(count):
+            start, end, index = struct.unpack_from(">HHH", data, offset + 4 + 6 * i)
+            for glyph in range(start, end + 1):
+                coverage[glyph] = index + glyph - start
+        return coverage
+
+    def read_class_def(self, offset):
+        data = self.data
+        fmt, = struct.unpack_from(">H", data, offset)
+        if fmt == 1:
+            start, count = struct.unpack_from(">HH", data, offset + 2)
+            return {start + i: cls for i, cls in enumerate(struct.unpack_from(f">{count}H", data, offset + 6))}
+        count, = struct.unpack_from(">H", data, offset + 2)
+        classes = {}
+        for i in range(count):
+            start, end, cls = struct.unpack_from(">HHH", data, offset + 4 + 6 * i)
+            for glyph in range(start, end + 1):
+                classes[glyph] = cls
+        return classes
+
+    def read_kerning(self):
+        """Returns the pair adjustment subtables of the lookups of every `kern`
+        feature, grouped per lookup."""
+        data = self.data
+        gpos = self.tables["GPOS"][0]
+        features, lookups = (gpos + o for o in struct.unpack_from(">HH", data, gpos + 6))
+
+        indexes = set()
+        count, = struct.unpack_from(">H", data, features)
+        for i in range(count):
+            tag, offset = struct.unpack_from(">4sH", data, features + 2 + 6 * i)
+            if tag == b"kern":
+                lookup_count, = struct.unpack_from(">H", data, features + offset + 2)
+                indexes.update(struct.unpack_from(f">{lookup_count}H", data, features + offset + 4))
+
+        tables = []
+        for index in sorted(indexes):
+            lookup = lookups + struct.unpack_from(">H", data, lookups + 2 + 2 * index)[0]
+            kind, _, count = struct.unpack_from(">HHH", data, lookup)
+            subtables = []
+            for i in range(count):
+                offset = lookup + struct.unpack_from(">H", data, lookup + 6 + 2 * i)[0]
+                subtable_kind = kind
+                if kind == EXTENSION:
+                    _, subtable_kind, extension = struct.unpack_from(">HHI", data, offset)
+                    offset += extension
+                if subtable_kind == PAIR_ADJUSTMENT:
+                    subtables.append(self.read_pair_adjustment(offset))
+            tables.append(subtables)
+        return tables
+
+    def read_pair_adjustment(self, offset):
+        data = self.data
+        fmt, coverage, format1, format2 = struct.unpack_from(">HHHH", data, offset)
+        # only the x advance of the first glyph moves the glyphs after it
+        size1, size2 = bin(format1).count("1") * 2, bin(format2).count("1") * 2
+        advance_at = bin(format1 & (X_ADVANCE - 1)).count("1") * 2 if format1 & X_ADVANCE else None
+        table = {"format": fmt, "coverage": self.read_coverage(offset + coverage)}
+
+        if fmt == 1:
+            pairs = []
+            count, = struct.unpack_from(">H", data, offset + 8)
+            for i in range(count):
+                pair_set = offset + struct.unpack_from(">H", data, offset + 10 + 2 * i)[0]
+                pair_count, = struct.unpack_from(">H", data, pair_set)
+                kerning = {}
+                for j in range(pair_count):
+                    at = pair_set + 2 + j * (2 + size1 + size2)
+                    second, = struct.unpack_from(">H", data, at)
+                    kerning[second] = struct.unpack_from(">h", data, at + 2 + advance_at)[0] if advance_at is not None else 0
+                pairs.append(kerning)
+            table["pairs"] = pairs
+        else:
+            class_def1, class_def2, count1, count2 = struct.unpack_from(">HHHH", data, offset + 8)
+            table["classes1"] = self.read_class_def(offset + class_def1)
+            table["classes2"] = self.read_class_def(offset + class_def2)
+            table["records"] = offset + 16
+            table["counts"] = (count2, size1 + size2, advance_at)
+        return table
+
+    def Kerning(self, left, right):
+        """Returns the kerning between two glyphs in font units."""
+        pair = (left, right)
+        if pair not in self.kerning:
+            total = 0
+            for subtables in self.pair_tables:
+                for table in subtables:
+                    index = table["coverage"].get(left)
+                    if index is None:
+                        continue
+                    if table["format"] == 1:
+                        if right not in table["pairs"][index]:
+                            continue
+                        total += table["pairs"][index][right]
+                    else:
+                        count2, size, advance_at = table["counts"]
+                        if advance_at is not None:
+                            cls = table["classes1"].get(left, 0) * count2 + table["classes2"].get(right, 0)
+                            total += struct.unpack_from(">h", self.data, table["records"] + cls * size + advance_at)[0]
+                    # the first subtable of a lookup which has the pair is used
+                    break
+            self.kerning[pair] = total
+        return self.kerning[pair]
+
+    def GlyphOutline(self, glyph):
+        """Returns the commands of a glyph in font units (y up)."""
+        commands = self.outlines.get(glyph)
+        if commands is None:
+            commands = [c for contour in self.read_contours(glyph) for c in contour_commands(contour)]
+            self.outlines[glyph] = commands
+            self.extracted += 1
+        return commands
+
+    def read_contours(self, glyph, depth=0):
+        start, end = self.offsets[glyph], self.offsets[glyph + 1]
+        if start == end or depth > 8:
+            return []
+
+        data = self.data
+        at = self.tables["glyf"][0] + start
+        contour_count, = struct.unpack_from(">h", data, at)
+        at += 10
+
+        if contour_count < 0:
+            return self.read_composite(at, depth)
+
+        end_points = struct.unpack_from(f">{contour_count}H", data, at)
+        at += 2 * contour_count
+        instructions, = struct.unpack_from(">H", data, at)
+        at += 2 + instructions
+
+        point_count = end_points[-1] + 1 if end_points else 0
+        flags = []
+        while len(flags) < point_count:
+            flag = data[at]
+            at += 1
+            flags.append(flag)
+            if flag & REPEAT:
+                flags.extend([flag] * data[at])
+                at += 1
+
+        def coordinates(short, same):
+            nonlocal at
+            values = []
+            value = 0
+            for flag in flags:
+                if flag & short:
+                    delta = data[at]
+                    at += 1
+                    value += delta if flag & same else -delta
+                elif not flag & same:
+                    value += struct.unpack_from(">h", data, at)[0]
+                    at += 2
+                values.append(value)
+            return values
+
+        xs = coordinates(X_SHORT, X_SAME)
+        ys = coordinates(Y_SHORT, Y_SAME)
+
+        contours = []
+        first = 0
+        for last in end_points:
+            contours.append([(xs[i], ys[i], bool(flags[i] & ON_CURVE)) for i in range(first, last + 1)])
+            first = last + 1
+        return [contour for contour in contours if contour]
+
+    def read_composite(self, at, depth):
+        data = self.data
+        contours = []
+        while True:
+            flags, glyph = struct.unpack_from(">HH", data, at)
+            at += 4
+            if flags & ARGS_ARE_WORDS:
+                arg1, arg2 = struct.unpack_from(">hh", data, at)
+                at += 4
+            else:
+                arg1, arg2 = struct.unpack_from(">bb", data, at)
+                at += 2
+            # matching points instead of offsets is only used by hinted CJK fonts
+            dx, dy = (arg1, arg2) if flags & ARGS_ARE_XY else (0, 0)
+
+            a, b, c, d = 1.0, 0.0, 0.0, 1.0
+            if flags & HAS_SCALE:
+                a = d = struct.unpack_from(">h", data, at)[0] / 16384
+                at += 2
+            elif flags & HAS_XY_SCALE:
+                a, d = (v / 16384 for v in struct.unpack_from(">hh", data, at))
+                at += 4
+            elif flags & HAS_2X2:
+                a, b, c, d = (v / 16384 for v in struct.unpack_from(">hhhh", data, at))
+                at += 8
+
+            for contour in self.read_contours(glyph, depth + 1):
+                contours.append([(a * x + c * y + dx, b * x + d * y + dy, on) for x, y, on in contour])
+
+            if not flags & MORE_COMPONENTS:
+                return contours
+
+    def TextOutline(self, text, size, x, baseline, anchor="start"):
+        """Returns the commands drawing `text` at `size` pixels with its baseline at
+        `baseline`. `anchor` is the SVG text-anchor (start, middle or end) at `x`.
+        Returns the commands and the number of glyphs drawn."""
+        scale = size / self.units_per_em
+        glyphs = [self.cmap.get(ord(char), 0) for char in text]
+        advances = [self.advances[glyph] + (self.Kerning(glyph, glyphs[i + 1]) if i + 1 < len(glyphs) else 0)
+                    for i, glyph in enumerate(glyphs)]
+        width = sum(advances) * scale
+
+        pen = x - (width / 2 if anchor == "middle" else width if anchor == "end" else 0)
+        commands = []
+        for glyph, advance in zip(glyphs, advances):
+            for cmd, args in self.GlyphOutline(glyph):
+                commands.append((cmd, [pen + v * scale if i % 2 == 0 else baseline - v * scale for i, v in enumerate(args)]))
+            pen += advance * scale
+        return commands, len(glyphs)
+
+
+def FindFont(family, font_dirs):
+    """Returns the path of `<family>.ttf` (or .otf) in one of the directories, the way
+    the client looks up fonts in its fonts/ directory, or None."""
+    family = family.split(",")[0].strip().strip("'\"")
+    for font_dir in font_dirs:
+        for ext in FONT_EXTENSIONS:
+            path = os.path.join(font_dir, family + ext)
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def LoadFont(path):
+    """Returns the Font for a file, loading it once per process. None for fonts
+    without TrueType outlines."""
+    if path not in _fonts:
+        try:
+            _fonts[path] = Font(path)
+        except ValueError:
+            _fonts[path] = None
+    return _fonts[path]
+
+
+def ExtractedCount():
+    """Number of glyph outlines decoded by this process so far."""
+    return sum(font.extracted for font in _fonts.values() if font)
@@ -1,13 +1,88 @@
 #!/usr/bin/env python3
+import argparse
+import contextlib
+import copy
+import hashlib
 import json
 import math
 import os
+import re
 import sys
-from xml.dom import minidom
-from xml.etree.ElementTree import Element, SubElement, ElementTree, tostring
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from xml.etree.ElementTree import Element, SubElement, parse, tostring
 
-def debug(msg):
-    print(f"[DEBUG] {msg}")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import atlas  # noqa: E402
+import fonts  # noqa: E402
+import paths  # noqa: E402
+from shared.files import open_atomic, write_if_changed  # noqa: E402
+
+try:
+    import numpy as np
+except ImportError:  # optional, only makes dense scales faster
+    np = None
+
+MANIFEST_NAME = ".svg-manifest.json"
+PATH_INDEX_SUFFIX = ".paths.bin"
+# flattening step (in viewbox units) of the exact paths the index is sampled from
+PATH_MEASURE_STEP = 0.05
+PATH_REPORT_DENSITIES = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+LOD_MANIFEST_NAME = "lod.json"
+# level of detail rules, in pixels of the gauge at the size a variant is made for
+LOD_MIN_TICK_SPACING = 4
+LOD_MIN_LABEL_SIZE = 7
+LOD_MIN_LABEL_GAP = 4
+# coordinates are rounded to the fewest decimals keeping them this close
+LOD_TOLERANCE = 0.25
+# rough width of a character relative to the font size, to tell when labels touch
+LABEL_CHAR_WIDTH = 0.6
+
+_tool_version = None
+
+
+QUIET = 0
+INFO = 1
+DEBUG = 2
+TRACE = 3
+
+log_level = INFO
+
+
+def SetLogLevel(level):
+    global log_level
+    log_level = level
+
+
+def log(level, prefix, msg, args):
+    # formatting is deferred until we know the message is wanted
+    if log_level >= level:
+        print(prefix + (msg % args if args else msg))
+
+
+def info(msg, *args):
+    log(INFO, "", msg, args)
+
+
+def debug(msg, *args):
+    log(DEBUG, "[DEBUG] ", msg, args)
+
+
+def trace(msg, *args):
+    log(TRACE, "[TRACE] ", msg, args)
+
+
+def GetToolVersion():
+    # hash of this script and the modules it builds with so any change to a builder
+    # invalidates previously built layers
+    global _tool_version
+    if _tool_version is None:
+        digest = hashlib.sha256()
+        for path in (__file__, atlas.__file__, fonts.__file__, paths.__file__):
+            with open(os.path.abspath(path), "rb") as f:
+                digest.update(f.read())
+        _tool_version = digest.hexdigest()[:16]
+    return _tool_version
 
 
 def deg_to_rad(deg):
@@ -21,6 +96,39 @@ def polar_to_cartesian(cx, cy, radius, angle_degrees):
     return x, y
 
 
+def get_tick_angles(degreesStart, degreesEnd, degreesGap):
+    """Every angle from start to end (inclusive) stepping by gap."""
+    gap = abs(float(degreesGap))
+    span = abs(degreesEnd - degreesStart)
+
+    if gap == 0:
+        if span != 0:
+            raise ValueError("degreesGap must be greater than 0")
+        return [float(degreesStart)]
+
+    direction = 1 if degreesEnd > degreesStart else -1
+    # small epsilon so float error does not drop the last tick
+    count = int(math.floor(span / gap + 1e-9)) + 1
+    step = direction * gap
+
+    return [degreesStart + i * step for i in range(count)]
+
+
+def polar_to_cartesian_batch(cx, cy, radii, angles):
+    """Like polar_to_cartesian but for many angles at once. The sin/cos of each angle
+    is computed once and shared between every radius. Returns [(xs, ys)] per radius."""
+    if np is not None:
+        rad = np.radians(np.asarray(angles, dtype=float) - 90)
+        cos = np.cos(rad)
+        sin = np.sin(rad)
+        return [((cx + r * cos).tolist(), (cy + r * sin).tolist()) for r in radii]
+
+    rad = [deg_to_rad(a) for a in angles]
+    cos = [math.cos(a) for a in rad]
+    sin = [math.sin(a) for a in rad]
+    return [([cx + r * c for c in cos], [cy + r * s for s in sin]) for r in radii]
+
+
 def coord_to_str(v):
     if isinstance(v, (int, float)):
         return str(v)
@@ -34,7 +142,7 @@ def CreateCircleNode(x, y, radius, fill=None, strokeWidth=None, strokeFill=None)
     cx = coord_to_str(x)
     cy = coord_to_str(y)
 
-    debug(f"CreateCircleNode: cx={cx} cy={cy} radius={radius} fill={fill} strokeWidth={strokeWidth} strokeFill={strokeFill}")
+    debug("CreateCircleNode: cx=%s cy=%s radius=%s fill=%s strokeWidth=%s strokeFill=%s", cx, cy, radius, fill, strokeWidth, strokeFill)
 
     attrs = {
         "cx": cx,
@@ -54,7 +162,7 @@ def CreateCircleNode(x, y, radius, fill=None, strokeWidth=None, strokeFill=None)
 def CreateArcNode(position, radius, degreesStart, degreesEnd, innerThickness, fill):
     cx, cy = position
 
-    debug(f"CreateArcNode: pos=({cx:.1f},{cy:.1f}) radius={radius} start={degreesStart} end={degreesEnd} thickness={innerThickness} fill={fill}")
+    debug("CreateArcNode: pos=(%.1f,%.1f) radius=%s start=%s end=%s thickness=%s fill=%s", cx, cy, radius, degreesStart, degreesEnd, innerThickness, fill)
 
     start_x, start_y = polar_to_cartesian(cx, cy, radius, degreesStart)
     end_x, end_y = polar_to_cartesian(cx, cy, radius, degreesEnd)
@@ -62,8 +170,8 @@ def CreateArcNode(position, radius, degreesStart, degreesEnd, innerThickness, fi
     large_arc_flag = "1" if abs(degreesEnd - degreesStart) % 360 > 180 else "0"
     inner_r = radius - innerThickness
 
-    debug(f" → Outer arc start=({start_x:.1f},{start_y:.1f}) end=({end_x:.1f},{end_y:.1f}) largeArc={large_arc_flag}")
-    debug(f" → Inner radius={inner_r}")
+    debug(" → Outer arc start=(%.1f,%.1f) end=(%.1f,%.1f) largeArc=%s", start_x, start_y, end_x, end_y, large_arc_flag)
+    debug(" → Inner radius=%s", inner_r)
 
     path_data = [
         f"M {start_x},{start_y}",
@@ -82,51 +190,42 @@ def CreateArcNode(position, radius, degreesStart, degreesEnd, innerThickness, fi
 
 
 def CreateGaugeTicksNode(position, radius, degreesStart, degreesEnd, degreesGap,
-                         tickLength, tickWidth, tickFill):
+                         tickLength, tickWidth, tickFill, asPath=False, every=1):
     cx, cy = position
 
     group = Element("g", {"stroke": tickFill, "fill": "none"})
 
-    direction = 1 if degreesEnd > degreesStart else -1
-    angle = degreesStart
-    tick_index = 0
-
     debug(
-        f"CreateGaugeTicksNode: pos=({cx:.1f},{cy:.1f}) radius={radius} "
-        f"start={degreesStart} end={degreesEnd} gap={degreesGap} "
-        f"tickLen={tickLength} tickWidth={tickWidth} color={tickFill} "
+        "CreateGaugeTicksNode: pos=(%.1f,%.1f) radius=%s start=%s end=%s gap=%s "
+        "tickLen=%s tickWidth=%s color=%s asPath=%s every=%s",
+        cx, cy, radius, degreesStart, degreesEnd, degreesGap, tickLength, tickWidth, tickFill, asPath, every
     )
 
-    while (direction == 1 and angle <= degreesEnd) or (direction == -1 and angle >= degreesEnd):
-        x1, y1 = polar_to_cartesian(cx, cy, radius - tickLength, angle)
-        x2, y2 = polar_to_cartesian(cx, cy, radius, angle)
-
-        debug(
-            f"  tick {tick_index:02d}: angle={angle:.2f} len={tickLength:.1f} "
-            f"width={tickWidth:.1f} ({x1:.1f},{y1:.1f})→({x2:.1f},{y2:.1f})"
-        )
-
-        line_node = Element("line", {
-            "x1": str(x1),
-            "y1": str(y1),
-            "x2": str(x2),
-            "y2": str(y2),
-            "stroke-width": str(tickWidth)
-        })
-
-        group.append(line_node)
-
-        angle += direction * degreesGap
-        tick_index += 1
+    angles = get_tick_angles(degreesStart, degreesEnd, degreesGap)[::every]
+    (x1s, y1s), (x2s, y2s) = polar_to_cartesian_batch(cx, cy, (radius - tickLength, radius), angles)
+    width_str = str(tickWidth)
 
-    debug(f" Total ticks created: {tick_index}")
+    if asPath:
+        # one element for the whole scale instead of one per tick
+        d = " ".join(f"M {x1},{y1} L {x2},{y2}" for x1, y1, x2, y2 in zip(x1s, y1s, x2s, y2s))
+        SubElement(group, "path", {"d": d, "stroke-width": width_str})
+    else:
+        for x1, y1, x2, y2 in zip(x1s, y1s, x2s, y2s):
+            SubElement(group, "line", {
+                "x1": str(x1),
+                "y1": str(y1),
+                "x2": str(x2),
+                "y2": str(y2),
+                "stroke-width": width_str
+            })
+
+    debug(" Total ticks created: %d", len(angles))
     return group
 
 
-
 def CreateGaugeTickLabelsNode(
     position, radius, degreesStart, degreesEnd, degreesGap, labels,
-    labelFill="rgb(255,255,255)", labelSize=24, labelFont="Arial"
+    labelFill="rgb(255,255,255)", labelSize=24, labelFont="Arial", every=1
 ):
     cx, cy = position
 
@@ -136,9 +235,9 @@ def CreateGaugeTickLabelsNode(
         raise TypeError(f"labelSize must be a number got {labelSize!r}")
 
     debug(
-        f"CreateGaugeTickLabelsNode: pos=({cx:.1f},{cy:.1f}) radius={radius} "
-        f"start={degreesStart} end={degreesEnd} gap={degreesGap} labels={labels} "
-        f"labelFill={labelFill} labelSize={labelSize} labelFont={labelFont}"
+        "CreateGaugeTickLabelsNode: pos=(%.1f,%.1f) radius=%s start=%s end=%s gap=%s labels=%s "
+        "labelFill=%s labelSize=%s labelFont=%s every=%s",
+        cx, cy, radius, degreesStart, degreesEnd, degreesGap, labels, labelFill, labelSize, labelFont, every
     )
 
     group = Element("g", {
@@ -157,15 +256,14 @@ def CreateGaugeTickLabelsNode(
         actual_gap = total_angle / (total_labels - 1) if total_labels > 1 else 0
         angles = [degreesStart + i * actual_gap for i in range(total_labels)]
 
-    for i, label in enumerate(labels):
-        angle = angles[i] if i < len(angles) else degreesEnd
-        x, y = polar_to_cartesian(cx, cy, radius, angle)
-        debug(f"  label {i:02d}: '{label}' angle={angle:.2f} pos=({x:.1f},{y:.1f})")
+    [(xs, ys)] = polar_to_cartesian_batch(cx, cy, (radius,), angles)
+    size_str = str(labelSize)
 
+    for label, x, y in list(zip(labels, xs, ys))[::every]:
         SubElement(group, "text", {
             "x": str(x),
             "y": str(y),
-            "font-size": str(labelSize),
+            "font-size": size_str,
             "text-anchor": "middle",
             "dominant-baseline": "middle",
             "dy": "0.35em" # compensate for text rendering issues
@@ -203,7 +301,7 @@ def CreateTriangleNode(x, y, width, height, rotation=0, fill="transparent", stro
     ]
     points_str = " ".join(f"{px},{py}" for px, py in points)
 
-    debug(f"CreateTriangleNode: x={x} y={y} (abs=({cx:.1f},{cy:.1f})) width={width} height={height} rotation={rotation} fill={fill}")
+    debug("CreateTriangleNode: x=%s y=%s (abs=(%.1f,%.1f)) width=%s height=%s rotation=%s fill=%s", x, y, cx, cy, width, height, rotation, fill)
 
     transform_parts = [f"translate({cx},{cy})"]
     if rotation != 0:
@@ -226,7 +324,7 @@ def CreateSquareNode(x, y, width, height, fill="transparent", roundAmount=None,
     cx = coord_to_str(x)
     cy = coord_to_str(y)
 
-    debug(f"CreateSquareNode: center=({cx},{cy}) width={width} height={height} round={roundAmount} fill={fill} strokeWidth={strokeWidth}")
+    debug("CreateSquareNode: center=(%s,%s) width=%s height=%s round=%s fill=%s strokeWidth=%s", cx, cy, width, height, roundAmount, fill, strokeWidth)
 
     node = Element("rect", {
         "x": cx,
@@ -249,7 +347,7 @@ def CreateTextNode(x, y, text, size=24, fill="transparent", font="Arial"):
     x_str = coord_to_str(x)
     y_str = coord_to_str(y)
 
-    debug(f"CreateTextNode: text='{text}' x={x_str} y={y_str} size={size} fill={fill} font={font}")
+    debug("CreateTextNode: text='%s' x=%s y=%s size=%s fill=%s font=%s", text, x_str, y_str, size, fill, font)
 
     node = Element("text", {
         "x": x_str,
@@ -267,13 +365,102 @@ def CreateTextNode(x, y, text, size=24, fill="transparent", font="Arial"):
 
 
 def LoadJson(pathToJson):
-    debug(f"Loading JSON: {pathToJson}")
+    debug("Loading JSON: %s", pathToJson)
     with open(pathToJson, "r") as f:
         return json.load(f)
 
 
-def ConvertNodesIntoSvg(nodes, width, height, shadow=None):
-    debug(f"Converting {len(nodes)} nodes into SVG size={width}x{height}")
+SHADOW_COLOR = "rgba(0,0,0,0.5)"
+# how far (in blur radii) a baked shadow reaches, the blur is almost invisible further out
+SHADOW_EXTENT = 2.5
+TRANSPARENT_PAINTS = {"none", "transparent"}
+RGBA_RE = re.compile(r"^\s*rgba\(\s*([^,]+),\s*([^,]+),\s*([^,]+),\s*([^)]+)\)\s*$")
+
+
+def split_color(color):
+    """Returns (the color without alpha, alpha)."""
+    match = RGBA_RE.match(color)
+    if match is None:
+        return color, 1.0
+    r, g, b, a = (v.strip() for v in match.groups())
+    return f"rgb({r},{g},{b})", float(a)
+
+
+def ShadowSteps(size, steps, alpha):
+    """Returns [(grow radius, opacity)] of solid copies of a shape which, drawn on top
+    of each other, fade out like the edge of a gaussian blur with stdDeviation `size`.
+    The first copy is the shape itself, the others are grown further and further."""
+    sigma = max(float(size), 0.01)
+    step = SHADOW_EXTENT * sigma / steps
+
+    def blurred(distance):
+        # alpha of a blurred straight edge at a distance outside of it
+        return alpha * 0.5 * math.erfc(distance / (sigma * math.sqrt(2)))
+
+    # inside the shape (half a step deep) and then the middle of every band outside
+    targets = [alpha - blurred(step / 2)] + [blurred((j - 0.5) * step) for j in range(1, steps + 1)] + [0.0]
+
+    # every band is covered by its own copy and all the bigger ones
+    return [(j * step, 1 - (1 - targets[j]) / (1 - targets[j + 1])) for j in range(steps + 1)]
+
+
+def Silhouette(nodes, color, radius):
+    """Copies of the nodes drawn in one color (like SourceAlpha) and grown by `radius`
+    with a round stroke."""
+    def paint(el, fill, stroke, stroke_width):
+        fill = el.attrib.pop("fill", fill)
+        stroke = el.attrib.pop("stroke", stroke)
+        stroke_width = el.attrib.pop("stroke-width", stroke_width)
+        for key in ("opacity", "fill-opacity", "stroke-opacity", "filter"):
+            el.attrib.pop(key, None)
+
+        if el.tag != "g":
+            visible_fill = fill not in TRANSPARENT_PAINTS
+            visible_stroke = stroke not in TRANSPARENT_PAINTS
+            try:
+                width = float(stroke_width) if visible_stroke else 0.0
+            except ValueError:
+                width = 1.0
+            el.set("fill", color if visible_fill else "none")
+            if (visible_fill or visible_stroke) and width + 2 * radius > 0:
+                el.set("stroke", color)
+                el.set("stroke-width", f"{width + 2 * radius:g}")
+                if radius:
+                    el.set("stroke-linejoin", "round")
+                    el.set("stroke-linecap", "round")
+            else:
+                el.set("stroke", "none")
+
+        for child in el:
+            paint(child, fill, stroke, stroke_width)
+
+    copies = [copy.deepcopy(node) for node in nodes]
+    for node in copies:
+        paint(node, "black", "none", "1")
+    return copies
+
+
+def BakedShadowNode(nodes, shadow, steps):
+    """A group drawing the shadow of the nodes without a filter (see ShadowSteps)."""
+    size = shadow.get("size", 4)
+    dx = shadow.get("x", shadow.get("offsetX", 3))
+    dy = shadow.get("y", shadow.get("offsetY", 3))
+    color, alpha = split_color(shadow.get("color", SHADOW_COLOR))
+
+    debug("Baking shadow: size=%s dx=%s dy=%s steps=%s", size, dx, dy, steps)
+
+    group = Element("g", {"transform": f"translate({dx},{dy})"})
+    # the biggest (faintest) copy first, it does not matter for one color but reads better
+    for radius, opacity in reversed(ShadowSteps(size, steps, alpha)):
+        step = SubElement(group, "g", {"opacity": f"{opacity:.4g}"})
+        step.extend(Silhouette(nodes, color, radius))
+    return group
+
+
+def ConvertNodesIntoSvg(nodes, width, height, shadow=None, shadow_steps=None):
+    """With `shadow_steps` a shadow is drawn with that many grown copies of the nodes
+    instead of a blur filter (see BakedShadowNode)."""
+    debug("Converting %d nodes into SVG size=%sx%s", len(nodes), width, height)
 
     svg = Element("svg", {
         "xmlns": "http://www.w3.org/2000/svg",
@@ -283,15 +470,19 @@ def ConvertNodesIntoSvg(nodes, width, height, shadow=None):
         "style": "background:none"
     })
 
-    if shadow:
+    if shadow and shadow_steps:
+        svg.append(BakedShadowNode(nodes, {} if shadow is True else shadow, shadow_steps))
+        parent = svg
+    elif shadow:
         if shadow is True:
             shadow = {}
 
         size = shadow.get("size", 4)
-        dx = shadow.get("x", 3)
-        dy = shadow.get("y", 3)
+        # the editor calls these offsetX/offsetY
+        dx = shadow.get("x", shadow.get("offsetX", 3))
+        dy = shadow.get("y", shadow.get("offsetY", 3))
 
-        debug(f"Adding shadow filter: size={size} dx={dx} dy={dy}")
+        debug("Adding shadow filter: size=%s dx=%s dy=%s", size, dx, dy)
 
         defs = SubElement(svg, "defs")
         filter_elem = SubElement(defs, "filter", {
@@ -329,141 +520,1459 @@ def ConvertNodesIntoSvg(nodes, width, height, shadow=None):
         SubElement(merge, "feMergeNode", {"in": "SourceGraphic"})
 
         # Wrap all nodes in <g> using this filter
-        group = SubElement(svg, "g", {"filter": "url(#shadow)"})
-        for i, node in enumerate(nodes):
-            debug(f"  Node {i:02d}: {tostring(node, encoding='unicode').strip()}")
-            group.append(node)
+        parent = SubElement(svg, "g", {"filter": "url(#shadow)"})
+        debug("Shadow added")
     else:
+        parent = svg
+
+    parent.extend(nodes)
+
+    # serializing every node is expensive so only do it when asked for
+    if log_level >= TRACE:
         for i, node in enumerate(nodes):
-            debug(f"  Node {i:02d}: {tostring(node, encoding='unicode').strip()}")
-            svg.append(node)
+            trace("  Node %02d: %s", i, tostring(node, encoding="unicode").strip())
+
+    return svg
 
-    debug("Shadow added")
 
+def format_number(value, precision=None, strip_leading_zero=False):
+    """Shortest text for a number. Rounded to `precision` decimals if given."""
+    if precision is not None:
+        text = f"{round(float(value), precision):.{precision}f}"
+        if "." in text:
+            text = text.rstrip("0").rstrip(".")
+    else:
+        text = repr(float(value))
+        if text.endswith(".0"):
+            text = text[:-2]
+
+    if text == "-0":
+        text = "0"
+
+    if strip_leading_zero:
+        if text.startswith("0."):
+            text = text[1:]
+        elif text.startswith("-0."):
+            text = "-" + text[2:]
+
+    return text
+
+
+NUMBER_RE = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+PATH_TOKEN_RE = re.compile(r"[MmLlHhVvCcSsQqTtAaZz]|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+PATH_ARG_COUNTS = {"M": 2, "L": 2, "H": 1, "V": 1, "C": 6, "S": 4, "Q": 4, "T": 2, "A": 7, "Z": 0}
+
+# attributes which hold a single number
+NUMERIC_ATTRS = {"x", "y", "x1", "y1", "x2", "y2", "cx", "cy", "r", "rx", "ry",
+                 "width", "height", "stroke-width", "font-size"}
+
+# inherited presentation attributes and their initial values (None = never drop)
+INHERITED_DEFAULTS = {"fill": None, "stroke": "none", "stroke-width": "1",
+                      "font-family": None, "font-size": None, "text-anchor": "start"}
+
+# attributes which are pointless when set to these values on shapes
+SHAPE_DEFAULTS = {"x": "0", "y": "0", "x1": "0", "y1": "0", "x2": "0", "y2": "0",
+                  "cx": "0", "cy": "0", "rx": "0", "ry": "0", "opacity": "1", "transform": ""}
+SHAPE_TAGS = {"g", "rect", "circle", "ellipse", "line", "polyline", "polygon", "path", "text", "use"}
+
+
+def parse_path(d):
+    """Parses path data into a list of (command, args) with absolute upper case
+    commands. H/V are turned into L."""
+    tokens = PATH_TOKEN_RE.findall(d)
+    commands = []
+    x = y = start_x = start_y = 0.0
+    i = 0
+    cmd = None
+
+    while i < len(tokens):
+        if tokens[i].isalpha():
+            cmd = tokens[i]
+            i += 1
+        elif cmd is None:
+            raise ValueError(f"Path data does not start with a command: {d!r}")
+        elif cmd in "Mm":
+            # extra pairs after a moveto are linetos
+            cmd = "L" if cmd == "M" else "l"
+
+        upper = cmd.upper()
+        relative = cmd != upper
+        count = PATH_ARG_COUNTS[upper]
+
+        if upper == "Z":
+            commands.append(("Z", []))
+            x, y = start_x, start_y
+            continue
+
+        args = [float(v) for v in tokens[i:i + count]]
+        if len(args) != count:
+            raise ValueError(f"Not enough arguments for '{cmd}' in path: {d!r}")
+        i += count
+
+        if upper == "H":
+            upper, args = "L", [args[0] + (x if relative else 0), y]
+        elif upper == "V":
+            upper, args = "L", [x, args[0] + (y if relative else 0)]
+        elif upper == "A":
+            if relative:
+                args[5] += x
+                args[6] += y
+        elif relative:
+            args = [v + (x if j % 2 == 0 else y) for j, v in enumerate(args)]
+
+        commands.append((upper, args))
+        x, y = args[-2], args[-1]
+        if upper == "M":
+            start_x, start_y = x, y
+
+    return commands
+
+
+def join_numbers(numbers):
+    # separators are only needed where the next number could be read as part of the previous one
+    out = ""
+    prev = None
+    for n in numbers:
+        if prev is not None and not n.startswith("-") and not (n.startswith(".") and "." in prev):
+            out += " "
+        out += n
+        prev = n
+    return out
+
+
+def format_path(commands, precision=None):
+    """Writes path commands using whichever of the absolute or relative form of each
+    command is shorter. Relative values are taken from the rounded absolute positions
+    so rounding errors do not add up."""
+    def fmt(v):
+        return format_number(v, precision, strip_leading_zero=True)
+
+    def rounded(v):
+        return float(format_number(v, precision))
+
+    parts = []
+    prev_letter = None
+    cur_x = cur_y = start_x = start_y = 0.0
+
+    for cmd, args in commands:
+        if cmd == "Z":
+            letter, text = "z", ""
+            cur_x, cur_y = start_x, start_y
+        else:
+            args = list(args)
+            if cmd == "A":
+                coord_indexes = (5, 6)
+            else:
+                coord_indexes = range(len(args))
+
+            for j in coord_indexes:
+                args[j] = rounded(args[j])
+
+            rel_args = list(args)
+            for j in coord_indexes:
+                rel_args[j] = args[j] - (cur_x if j % 2 == (1 if cmd == "A" else 0) else cur_y)
+
+            candidates = [
+                (cmd, join_numbers([fmt(v) for v in args])),
+                (cmd.lower(), join_numbers([fmt(v) for v in rel_args])),
+            ]
+
+            if cmd == "L" and args[1] == cur_y:
+                candidates += [("H", fmt(args[0])), ("h", fmt(rel_args[0]))]
+            elif cmd == "L" and args[0] == cur_x:
+                candidates += [("V", fmt(args[1])), ("v", fmt(rel_args[1]))]
+
+            letter, text = min(candidates, key=lambda c: len(c[1]))
+            cur_x, cur_y = args[-2], args[-1]
+            if cmd == "M":
+                start_x, start_y = cur_x, cur_y
+
+        # a repeated command can be left out (except moveto which would become a lineto)
+        if letter == prev_letter and letter not in "Mm" and text:
+            parts.append(text if text.startswith("-") else " " + text)
+        else:
+            parts.append(letter + text)
+        prev_letter = letter
+
+    return "".join(parts)
+
+
+def format_numbers_in(value, precision=None, minify=False):
+    value = NUMBER_RE.sub(lambda m: format_number(float(m.group()), precision), value)
+    if minify:
+        value = re.sub(r"\s*,\s*", ",", value)
+    return value
+
+
+TRANSFORM_FUNCTION_RE = re.compile(r"(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)")
+
+
+def format_transform(value, precision=None, minify=False):
+    """Like format_numbers_in but keeps 3 more decimals for scale factors (scale and
+    the first 4 matrix values) as coordinates are multiplied by them."""
+    if precision is None:
+        return format_numbers_in(value, precision, minify)
+
+    def replace(match):
+        name, args = match.groups()
+        factors = 4 if name == "matrix" else (2 if name == "scale" else 0)
+        numbers = [format_number(float(n), precision + 3 if i < factors else precision)
+                   for i, n in enumerate(NUMBER_RE.findall(args))]
+        return f"{name}({','.join(numbers)})"
+
+    return TRANSFORM_FUNCTION_RE.sub(replace, value)
+
+
+def MinifySvg(svg, precision=None, minify=False):
+    """Rounds every coordinate to `precision` decimals. With `minify` it also rewrites
+    path data to the shortest commands and drops attributes which are set to their
+    default or to the value they would inherit anyway."""
+    def visit(el, inherited):
+        if el.tag == "filter":
+            return
+
+        for key, value in list(el.items()):
+            if key in NUMERIC_ATTRS:
+                try:
+                    value = format_number(float(value), precision)
+                except ValueError:
+                    pass
+            elif key == "d":
+                value = format_path(parse_path(value), precision) if minify else format_numbers_in(value, precision)
+            elif key == "points":
+                value = format_numbers_in(value, precision, minify)
+            elif key == "transform":
+                value = format_transform(value, precision, minify)
+
+            if minify and el.tag in SHAPE_TAGS:
+                if key == "transform":
+                    value = re.sub(r"(translate\(0(,0)?\)|rotate\(0\))\s*", "", value).strip()
+                # what a symbol in <defs> inherits depends on where it is used
+                inherits = inherited is not None and inherited.get(key, INHERITED_DEFAULTS.get(key)) == value
+                if inherits or SHAPE_DEFAULTS.get(key) == value:
+                    del el.attrib[key]
+                    continue
+
+            el.set(key, value)
+
+        own = {k: el.get(k) for k in INHERITED_DEFAULTS if el.get(k) is not None}
+        if el.tag == "defs" or inherited is None:
+            child_inherited = None
+        else:
+            child_inherited = {**inherited, **own} if own else inherited
+        for child in el:
+            visit(child, child_inherited)
+
+    visit(svg, {})
     return svg
 
 
-def WriteSvgFile(svg_element, name, output_dir):
-    debug(f"Writing...")
+# attributes of <text> which mean nothing on the <path> replacing it
+TEXT_ATTRS = {"x", "y", "dx", "dy", "font-family", "font-size", "font-weight", "font-style",
+              "text-anchor", "dominant-baseline", "letter-spacing"}
+# precision of outlines when none is given, glyphs need no more
+OUTLINE_PRECISION = 2
+
+
+def text_length(value, size):
+    value = str(value).strip()
+    if value.endswith("em"):
+        return float(value[:-2]) * size
+    return float(value.removesuffix("px") or 0)
+
+
+def OutlineText(svg, font_dirs, precision=None):
+    """Replaces every <text> whose font-family has a TrueType font in `font_dirs` with a
+    <path> of its glyph outlines. The baseline is `y` plus `dy` (dominant-baseline is
+    ignored like the client does, the layers compensate with dy) and text-anchor is
+    honoured. Text before the first <path> of the layer stays text because the client
+    reads that path for path transforms. Returns the stats of the conversion."""
+    elements = list(svg.iter())
+    first_path = next((i for i, el in enumerate(elements) if el.tag == "path"), 0)
+    protected = set(elements[:first_path])
+    extracted = fonts.ExtractedCount()
+    stats = {"outlined": 0, "kept": 0, "glyphs": 0}
+
+    def outline(el, family, size, anchor):
+        family = el.get("font-family", family)
+        font_path = fonts.FindFont(family, font_dirs) if family else None
+        font = fonts.LoadFont(font_path) if font_path else None
+        if font is None or el in protected or len(el) or not el.text:
+            debug("Keeping <text> '%s' font=%s", el.text, family)
+            stats["kept"] += 1
+            return None
+
+        size = float(str(el.get("font-size", size)).removesuffix("px"))
+        x = float(el.get("x", 0)) + text_length(el.get("dx", 0), size)
+        baseline = float(el.get("y", 0)) + text_length(el.get("dy", 0), size)
+        commands, glyphs = font.TextOutline(el.text, size, x, baseline, el.get("text-anchor", anchor))
+        stats["outlined"] += 1
+        stats["glyphs"] += glyphs
+
+        path = Element("path", {"d": format_path(commands, OUTLINE_PRECISION if precision is None else precision)})
+        for key, value in el.items():
+            if key not in TEXT_ATTRS:
+                path.set(key, value)
+        path.tail = el.tail
+        return path
+
+    def visit(el, family, size, anchor):
+        family = el.get("font-family", family)
+        size = el.get("font-size", size)
+        anchor = el.get("text-anchor", anchor)
+        for i, child in enumerate(list(el)):
+            if child.tag == "text":
+                path = outline(child, family, size, anchor)
+                if path is not None:
+                    el[i] = path
+            else:
+                visit(child, family, size, anchor)
+
+        # groups like the tick labels only carry font settings for their text
+        if el.tag == "g" and not any(child.tag == "text" for child in el.iter()):
+            for key in TEXT_ATTRS:
+                el.attrib.pop(key, None)
+
+    visit(svg, None, "16", "start")
+    stats["extracted"] = fonts.ExtractedCount() - extracted
+    return stats
+
+
+SYMBOL_ID_RE = re.compile(r"^s[0-9a-f]{10}$")
+SYMBOL_LIBRARY_NAME = "symbols.svg"
+XLINK_NS = "http://www.w3.org/1999/xlink"
+LEADING_TRANSLATE_RE = re.compile(r"^\s*translate\(\s*(" + NUMBER_RE.pattern + r")[\s,]+(" + NUMBER_RE.pattern + r")\s*\)\s*")
+# bytes of <defs> and the xlink namespace spread over the symbols
+SYMBOL_OVERHEAD = 20
+# too small for a <use> to ever be shorter
+SYMBOL_SKIP_TAGS = {"svg", "defs", "filter", "use", "line"}
+
+
+def canonical_key(el):
+    items = sorted(el.items())
+    children = "".join(canonical_key(child) for child in el)
+    return f"<{el.tag}{items}>{el.text or ''}{children}</{el.tag}>"
+
+
+def float_attr(el, name):
+    try:
+        return float(el.get(name, "0"))
+    except ValueError:
+        return None
+
+
+def SymbolDefinition(el):
+    """Returns (definition, x, y): a copy of the element moved to the origin where
+    possible (so the same shape in different places is one symbol) and the offset a
+    <use> needs to put it back. Returns None if the element cannot be reused."""
+    definition = copy.deepcopy(el)
+    definition.tail = None
+    x = y = 0.0
+
+    if el.tag == "circle":
+        x, y = float_attr(el, "cx"), float_attr(el, "cy")
+        attrs = ("cx", "cy")
+    elif el.tag in ("rect", "text"):
+        x, y = float_attr(el, "x"), float_attr(el, "y")
+        attrs = ("x", "y")
+    elif el.tag == "polygon" and LEADING_TRANSLATE_RE.match(el.get("transform", "")):
+        match = LEADING_TRANSLATE_RE.match(el.get("transform"))
+        x, y = float(match.group(1)), float(match.group(2))
+        rest = el.get("transform")[match.end():]
+        if rest:
+            definition.set("transform", rest)
+        else:
+            del definition.attrib["transform"]
+        attrs = ()
+    elif el.tag == "path" and el.get("d"):
+        commands = parse_path(el.get("d"))
+        if not commands or commands[0][0] != "M":
+            return None
+        x, y = commands[0][1]
+        shifted = []
+        for cmd, args in commands:
+            args = list(args)
+            coords = (5, 6) if cmd == "A" else range(len(args))
+            for j in coords:
+                args[j] -= x if j % 2 == (1 if cmd == "A" else 0) else y
+            shifted.append((cmd, args))
+        # rounded so floating point noise does not make the same shape look different
+        definition.set("d", format_path(shifted, 6))
+        attrs = ()
+    else:
+        attrs = ()
+
+    if x is None or y is None:
+        return None
+    for name in attrs:
+        definition.attrib.pop(name, None)
+
+    return definition, x, y
+
+
+def symbol_id(key):
+    return "s" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:10]
+
+
+def DedupeSymbols(svg):
+    """Moves elements (or whole groups) which appear more than once in a layer into
+    <defs> and replaces every copy with a <use>. Identical shapes in different places
+    share a definition. Ids are hashes of the definitions so the same shape has the
+    same id in every layer. Returns the number of elements replaced."""
+    # the client reads the first <path> of an SVG for path transforms so it stays put
+    first_path = next((el for el in svg.iter() if el.tag == "path"), None)
+    protected = set()
+    parents = {}
+    for parent in svg.iter():
+        for child in parent:
+            parents[child] = parent
+    el = first_path
+    while el is not None:
+        protected.add(el)
+        el = parents.get(el)
+
+    candidates = {}
+    counts = {}
+
+    def collect(el):
+        for child in el:
+            if child.tag in SYMBOL_SKIP_TAGS or child.get("id") is not None:
+                continue
+            if child not in protected:
+                result = SymbolDefinition(child)
+                if result is not None:
+                    key = canonical_key(result[0])
+                    candidates[child] = (key, *result)
+                    counts[key] = counts.get(key, 0) + 1
+            collect(child)
+
+    collect(svg)
+
+    definitions = {}
+    replaced = 0
+
+    def use_size(x, y):
+        return len(f'<use xlink:href="#s0123456789" x="{x:g}" y="{y:g}"/>')
+
+    def replace(el):
+        nonlocal replaced
+        for index, child in enumerate(list(el)):
+            candidate = candidates.get(child)
+            if candidate is not None and counts[candidate[0]] > 1:
+                key, definition, x, y = candidate
+                count = counts[key]
+                size = len(tostring(definition, encoding="unicode")) + len(' id="s0123456789"')
+                # only worth it if the copies are bigger than the definition and the <use>s
+                if count * size > size + count * use_size(x, y) + SYMBOL_OVERHEAD:
+                    ident = symbol_id(key)
+                    if ident not in definitions:
+                        definition.set("id", ident)
+                        definitions[ident] = definition
+                    use = Element("use", {"xlink:href": f"#{ident}"})
+                    if x:
+                        use.set("x", str(x))
+                    if y:
+                        use.set("y", str(y))
+                    use.tail = child.tail
+                    el.remove(child)
+                    el.insert(index, use)
+                    replaced += 1
+                    continue
+            replace(child)
+
+    replace(svg)
+
+    if definitions:
+        svg.set("xmlns:xlink", XLINK_NS)
+        # after everything else so the first <path> of the file does not change
+        defs = SubElement(svg, "defs")
+        defs.extend(definitions.values())
+
+    return replaced
+
+
+def strip_namespaces(el):
+    el.tag = el.tag.rsplit("}", 1)[-1]
+    for key, value in list(el.items()):
+        if key.startswith(f"{{{XLINK_NS}}}"):
+            del el.attrib[key]
+            el.set("xlink:" + key.rsplit("}", 1)[-1], value)
+    for child in el:
+        strip_namespaces(child)
+
+
+def WriteSymbolLibrary(output_dir, layers, compact=False):
+    """Collects the symbols of the layers of one output directory into symbols.svg, a
+    library of every shape shared by the layers. Each layer still has its own copy of
+    the symbols it uses so it can be loaded on its own. Returns the number of symbols."""
+    symbols = {}
+    users = {}
+
+    for layer in layers:
+        name = layer.get("name", "unnamed")
+        path = os.path.join(output_dir, f"{name}.svg")
+        if not os.path.exists(path):
+            continue
+        for el in parse(path).getroot().iter():
+            if el.tag.rsplit("}", 1)[-1] == "defs":
+                for child in el:
+                    ident = child.get("id")
+                    if ident and SYMBOL_ID_RE.match(ident):
+                        symbols.setdefault(ident, child)
+                        users.setdefault(ident, []).append(name)
+
+    library_path = os.path.join(output_dir, SYMBOL_LIBRARY_NAME)
+    if not symbols:
+        if os.path.exists(library_path):
+            os.remove(library_path)
+        return 0
+
+    svg = Element("svg", {"xmlns": "http://www.w3.org/2000/svg", "xmlns:xlink": XLINK_NS})
+    defs = SubElement(svg, "defs")
+    for ident in sorted(symbols):
+        symbol = copy.deepcopy(symbols[ident])
+        strip_namespaces(symbol)
+        symbol.set("data-layers", ",".join(users[ident]))
+        symbol.tail = None
+        defs.append(symbol)
+
+    write_if_changed(library_path, serialize_to_text(svg, compact).encode("utf-8"))
+    return len(symbols)
+
+
+def escape_text(value):
+    return value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def escape_attr(value):
+    return escape_text(value).replace("\"", "&quot;")
+
+
+def SerializeSvg(element, write, compact=False):
+    """Writes an element tree in a single pass. The indented output is the same as
+    minidom's toprettyxml(indent="  ") without building a DOM first."""
+    write('<?xml version="1.0" ?>')
+    if not compact:
+        write("\n")
+
+    def write_element(el, indent):
+        attrs = "".join(f' {k}="{escape_attr(str(v))}"' for k, v in el.items())
+        children = list(el)
+        text = el.text
+
+        if not children and not text:
+            write(f"{indent}<{el.tag}{attrs}/>")
+        elif not children:
+            write(f"{indent}<{el.tag}{attrs}>{escape_text(text)}</{el.tag}>")
+        else:
+            child_indent = indent if compact else indent + "  "
+            newline = "" if compact else "\n"
+
+            write(f"{indent}<{el.tag}{attrs}>{newline}")
+            if text and text.strip():
+                write(f"{child_indent}{escape_text(text.strip() if not compact else text)}{newline}")
+            for child in children:
+                write_element(child, child_indent)
+                write(newline)
+                if child.tail and child.tail.strip():
+                    write(f"{child_indent}{escape_text(child.tail.strip() if not compact else child.tail)}{newline}")
+            write(f"{indent}</{el.tag}>")
+
+    write_element(element, "")
+    if not compact:
+        write("\n")
+
+
+@contextlib.contextmanager
+def timed(timings, stage):
+    # adds the time spent in the block to timings[stage]
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0) + time.perf_counter() - started
+
+
+def WriteSvgFile(svg_element, name, output_dir, compact=False):
+    debug("Writing...")
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"{name}.svg")
+
+    with open_atomic(path) as f:
+        SerializeSvg(svg_element, f.write, compact)
+
+    debug("Wrote SVG file: %s", path)
+    return path
+
+
+def serialize_to_text(svg_element, compact=False):
+    parts = []
+    SerializeSvg(svg_element, parts.append, compact)
+    return "".join(parts)
+
+
+def WriteSvgText(text, name, output_dir):
+    """Like WriteSvgFile for an SVG which is already serialized."""
     os.makedirs(output_dir, exist_ok=True)
     path = os.path.join(output_dir, f"{name}.svg")
-    rough_str = ElementTree(svg_element).write(path, encoding="utf-8", xml_declaration=True)
-    raw_xml = tostring(svg_element, encoding="unicode")
-    parsed = minidom.parseString(raw_xml)
-    pretty_xml = parsed.toprettyxml(indent="  ")
 
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(pretty_xml)
+    with open_atomic(path) as f:
+        f.write(text)
+
+    debug("Wrote SVG file: %s", path)
+    return path
+
+
+def BuildPathIndex(svg, samples, report=False):
+    """Samples every <path> of a layer by arc length (see paths.py for the format).
+    Returns (index bytes, stats) or (None, None) if the layer has no paths."""
+    measures = [paths.PathMeasure(parse_path(element.get("d")), PATH_MEASURE_STEP) for element in svg.iter()
+                if element.tag.rsplit("}", 1)[-1] == "path" and element.get("d")]
+    if not measures:
+        return None, None
+
+    indexes = [paths.SampleByLength(measure, samples) for measure in measures]
+    stats = {
+        "paths": len(measures),
+        "samples": samples,
+        "error": max(paths.MeasureSampleError(measure, index) for measure, index in zip(measures, indexes))
+    }
+
+    if report:
+        stats["densities"] = {
+            density: max(paths.MeasureSampleError(measure, paths.SampleByLength(measure, density)) for measure in measures)
+            for density in PATH_REPORT_DENSITIES
+        }
+
+    return paths.PackIndex(indexes), stats
+
+
+def HashLayer(layerInfo, width, height, options=None):
+    inputs = {
+        "layer": layerInfo,
+        "width": width,
+        "height": height,
+        "version": GetToolVersion(),
+        "options": options or {}
+    }
+    encoded = json.dumps(inputs, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def LoadManifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+
+    if not os.path.exists(path):
+        return {"layers": {}}
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        debug("Ignoring unreadable manifest %s: %s", path, e)
+        return {"layers": {}}
+
+    manifest.setdefault("layers", {})
+    return manifest
+
+
+def SaveManifest(manifest, output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    content = json.dumps(manifest, indent=2, sort_keys=True) + "\n"
+
+    # do not touch the manifest if nothing changed
+    os.makedirs(output_dir, exist_ok=True)
+    if write_if_changed(path, content):
+        debug("Wrote manifest: %s", path)
+
+
+def resolve_dimension(value, total):
+    # same rules as FlexibleDimension in the client: pixels or percent, negative is from the far edge
+    if isinstance(value, str):
+        v = value.strip()
+        if v.endswith("%"):
+            pct = float(v[:-1]) / 100
+            return pct * total if pct >= 0 else total + pct * total
+        value = float(v)
+    if isinstance(value, (int, float)):
+        return float(value) if value >= 0 else total + value
+    raise TypeError(f"Invalid dimension: {value!r}")
+
+
+def BuildCircleOperation(op, ctx):
+    cx, cy = ctx["center"]
+    return CreateCircleNode(
+        op.get("x", cx),
+        op.get("y", cy),
+        op["radius"],
+        op.get("fill", "transparent"),
+        op.get("strokeWidth"),
+        op.get("strokeFill")
+    )
+
+
+def BuildArcOperation(op, ctx):
+    return CreateArcNode(ctx["center"],
+        op["radius"],
+        op["degreesStart"],
+        op["degreesEnd"],
+        op["innerThickness"],
+        op["fill"]
+    )
+
+
+def lod_stride(spacing, minimum):
+    # keep every n-th item so neighbours are at least `minimum` pixels apart
+    return max(1, math.ceil(minimum / spacing)) if spacing > 0 else 1
+
+
+def BuildGaugeTicksOperation(op, ctx):
+    every = 1
+    scale = ctx["options"].get("lodScale")
+    if scale:
+        spacing = math.radians(abs(float(op["degreesGap"]))) * op["radius"] * scale
+        every = lod_stride(spacing, LOD_MIN_TICK_SPACING)
+
+    return CreateGaugeTicksNode(ctx["center"],
+                                op["radius"],
+                                op["degreesStart"],
+                                op["degreesEnd"],
+                                op["degreesGap"],
+                                op.get("tickLength", 20),
+                                op.get("tickWidth", 2),
+                                op.get("tickFill"),
+                                op.get("asPath", ctx["options"].get("tickPaths", False)),
+                                every)
+
+
+def BuildGaugeTickLabelsOperation(op, ctx):
+    every = 1
+    scale = ctx["options"].get("lodScale")
+    if scale:
+        labels, size = op["labels"], float(op.get("labelSize", 24))
+        if size * scale < LOD_MIN_LABEL_SIZE:
+            debug("Dropping labels smaller than %spx", LOD_MIN_LABEL_SIZE)
+            return None
+        # the same spacing as CreateGaugeTickLabelsNode
+        gap = float(op.get("degreesGap", 10) or 0)
+        if gap <= 0 and len(labels) > 1:
+            gap = abs(op["degreesEnd"] - op["degreesStart"]) / (len(labels) - 1)
+        spacing = math.radians(abs(gap)) * op["radius"] * scale
+        longest = max((len(str(label)) for label in labels), default=0)
+        every = lod_stride(spacing, longest * LABEL_CHAR_WIDTH * size * scale + LOD_MIN_LABEL_GAP)
+
+    return CreateGaugeTickLabelsNode(ctx["center"],
+                                     op["radius"],
+                                     op["degreesStart"],
+                                     op["degreesEnd"],
+                                     op.get("degreesGap", 10),
+                                     op["labels"],
+                                     op.get("labelFill", "rgb(255,255,255)"),
+                                     op.get("labelSize", 24),
+                                     op.get("labelFont", "Arial"),
+                                     every)
+
+
+def BuildTextOperation(op, ctx):
+    cx, cy = ctx["center"]
+    return CreateTextNode(
+        op["x"] if "x" in op else cx,
+        op["y"] if "y" in op else cy,
+        op["text"],
+        op.get("size", 24),
+        op.get("fill", "rgb(255,255,255)"),
+        op.get("font", "Arial")
+    )
+
+
+def BuildSquareOperation(op, ctx):
+    cx, cy = ctx["center"]
+    return CreateSquareNode(
+        op["x"] if "x" in op else cx,
+        op["y"] if "y" in op else cy,
+        ctx.get("opWidth", op.get("width")),
+        ctx.get("opHeight", op.get("height")),
+        op.get("fill", "transparent"),
+        op.get("round"),
+        op.get("strokeWidth")
+    )
+
+
+def BuildTriangleOperation(op, ctx):
+    cx, cy = ctx["center"]
+    return CreateTriangleNode(
+        op["x"] if "x" in op else cx,
+        op["y"] if "y" in op else cy,
+        ctx.get("opWidth", op.get("width")),
+        ctx.get("opHeight", op.get("height")),
+        op.get("rotation", 0),
+        op.get("fill", "transparent"),
+        op.get("strokeWidth"),
+        svgWidth=ctx["width"],
+        svgHeight=ctx["height"]
+    )
+
 
-    debug(f"Wrote SVG file: {path}")
+# operation type -> builder. Types are matched case-insensitively so both the
+# original lowercase types and the editor's ("Circle", "GaugeTicks") work.
+OPERATIONS = {
+    "circle": BuildCircleOperation,
+    "arc": BuildArcOperation,
+    "gaugeticks": BuildGaugeTicksOperation,
+    "gaugeticklabels": BuildGaugeTickLabelsOperation,
+    "text": BuildTextOperation,
+    "square": BuildSquareOperation,
+    "triangle": BuildTriangleOperation,
+}
+
+# defaults of the editor (client/src/editor/models/SvgOperation.cs) which differ from
+# the ones used by the original schema
+EDITOR_DEFAULTS = {
+    "circle": {"fill": "rgb(255,255,255)"},
+    "gaugeticks": {"tickLength": 10, "tickWidth": 5, "tickFill": "rgb(255,255,255)"},
+    "square": {"fill": "rgb(50,50,50)"},
+    "triangle": {"fill": "rgb(255,255,255)"},
+}
+
+
+def IsEditorOperation(op):
+    return "position" in op or "origin" in op or op["type"][:1].isupper()
+
+
+def BuildEditorOperation(builder, op, width, height, options):
+    # the editor positions the op's origin at its position and rotates around it
+    # (see SvgBuilder.ApplyRotation) which is a rotate() around the position
+    pos_x, pos_y = [resolve_dimension(v, total) for v, total in zip(op.get("position", ["50%", "50%"]), (width, height))]
+
+    op_width = resolve_dimension(op["width"], width) if op.get("width") is not None else width
+    op_height = resolve_dimension(op["height"], height) if op.get("height") is not None else height
+
+    origin = op.get("origin", ["50%", "50%"])
+    origin_x = resolve_dimension(origin[0], op_width) - op_width / 2
+    origin_y = resolve_dimension(origin[1], op_height) - op_height / 2
+
+    ctx = {
+        "width": width,
+        "height": height,
+        "center": (pos_x - origin_x, pos_y - origin_y),
+        "opWidth": op_width,
+        "opHeight": op_height,
+        "options": options
+    }
+
+    node = builder(op, ctx)
 
+    rotate = op.get("rotate") or 0
+    if rotate == 0 or node is None:
+        return node
+
+    group = Element("g", {"transform": f"rotate({rotate},{pos_x},{pos_y})"})
+    group.append(node)
+    return group
 
-def CreateLayer(layerInfo, output_dir):
+
+def BuildLayerNodes(layerInfo, options=None):
     name = layerInfo.get("name", "unnamed")
     width = layerInfo.get("width", 600)
     height = layerInfo.get("height", 600)
     position = (width / 2, height / 2)
 
-    debug(f"Layer '{name}' {width}x{height} center=({position[0]:.1f},{position[1]:.1f})")
+    debug("Layer '%s' %sx%s center=(%.1f,%.1f)", name, width, height, position[0], position[1])
 
     nodes = []
     for op in layerInfo.get("operations", []):
         t = op["type"]
-        debug(f"Operation: {t}")
-
-        if t == "circle":
-            nodes.append(CreateCircleNode(
-                op.get("x", position[0]),
-                op.get("y", position[1]),
-                op["radius"],
-                op.get("fill", "transparent"),
-                op.get("strokeWidth"),
-                op.get("strokeFill")
-            ))
-
-        elif t == "arc":
-            nodes.append(CreateArcNode(position, 
-                op["radius"],
-                op["degreesStart"],
-                op["degreesEnd"],
-                op["innerThickness"],
-                op["fill"])
-            )
-
-        elif t == "gaugeTicks":
-            nodes.append(CreateGaugeTicksNode(position, 
-                                              op["radius"],
-                                              op["degreesStart"],
-                                              op["degreesEnd"], 
-                                              op["degreesGap"],
-                                              op.get("tickLength", 20),
-                                              op.get("tickWidth", 2),
-                                              op.get("tickFill")))
-
-        elif t == "gaugeTickLabels":
-            nodes.append(CreateGaugeTickLabelsNode(position, 
-                                                   op["radius"], 
-                                                   op["degreesStart"],
-                                                   op["degreesEnd"], 
-                                                   op.get("degreesGap", 10),
-                                                   op["labels"],
-                                                   op.get("labelFill", "rgb(255,255,255)"),
-                                                   op["labelSize"],
-                                                   op["labelFont"]))
-        elif t == "text":
-            nodes.append(CreateTextNode(
-                op["x"],
-                op["y"],
-                op["text"],
-                op.get("size", 24),
-                op.get("fill", "rgb(255,255,255)"),
-                op.get("font", "Arial")
-            ))
-        elif t == "square":
-            nodes.append(CreateSquareNode(
-                op["x"],
-                op["y"],
-                op["width"],
-                op["height"],
-                op.get("fill", "transparent"),
-                op.get("round"),
-                op.get("strokeWidth")
-            ))
-        elif t == "triangle":
-            nodes.append(CreateTriangleNode(
-                op["x"],
-                op["y"],
-                op["width"],
-                op["height"],
-                op.get("rotation", 0),
-                op.get("fill", "transparent"),
-                op.get("strokeWidth"),
-                svgWidth=width,
-                svgHeight=height
-            ))
+        debug("Operation: %s", t)
+
+        if op.get("skip"):
+            debug("Skipping operation")
+            continue
+
+        key = t.lower()
+        builder = OPERATIONS.get(key)
+
+        if builder is None:
+            info("Unknown operation type: %s", t)
+            continue
+
+        if IsEditorOperation(op):
+            # the editor writes every property, null meaning "use the default"
+            values = {k: v for k, v in op.items() if v is not None}
+            # positioning is handled by BuildEditorOperation
+            for k in ("x", "y", "rotation"):
+                values.pop(k, None)
+            values = {**EDITOR_DEFAULTS.get(key, {}), **values}
+            node = BuildEditorOperation(builder, values, width, height, options or {})
         else:
-            debug(f"Unknown operation type: {t}")
+            node = builder(op, {"width": width, "height": height, "center": position, "options": options or {}})
+
+        # a builder can leave out what is too small for a level of detail
+        if node is not None:
+            nodes.append(node)
+
+    return nodes
+
+
+def ResolveLayers(data):
+    """Returns the layers of an input document with the document's width/height
+    (used by the editor) applied to layers which do not set their own."""
+    defaults = {k: data[k] for k in ("width", "height") if data.get(k) is not None}
+    return [{**defaults, **layer} for layer in data.get("layers", [])]
+
+
+def IsLayerUnchanged(layerInfo, output_dir, manifest, options=None):
+    """Returns (unchanged, hash) for a layer compared to the manifest of its output directory."""
+    name = layerInfo.get("name", "unnamed")
+    width = layerInfo.get("width", 600)
+    height = layerInfo.get("height", 600)
+
+    layer_hash = HashLayer(layerInfo, width, height, options)
+    output_path = os.path.join(output_dir, f"{name}.svg")
+
+    unchanged = manifest["layers"].get(name) == layer_hash and os.path.exists(output_path)
+    return unchanged, layer_hash
+
+
+def PruneManifest(manifest, layers):
+    # forget layers which no longer exist in the input
+    names = {layer.get("name", "unnamed") for layer in layers}
+    manifest["layers"] = {k: v for k, v in manifest["layers"].items() if k in names}
+
+
+def AssembleLayer(layerInfo, options, precision, timings):
+    """Builds the SVG of a layer, adding the time spent to `timings` ("geometry" for the
+    builders, "tree" for turning their nodes into the SVG tree). Returns the SVG, the
+    stats of OutlineText and the number of elements replaced by symbols."""
+    with timed(timings, "geometry"):
+        nodes = BuildLayerNodes(layerInfo, options)
+
+    with timed(timings, "tree"):
+        width = layerInfo.get("width", 600)
+        height = layerInfo.get("height", 600)
+        svg = ConvertNodesIntoSvg(nodes, width, height, layerInfo.get("shadow"), options.get("shadowSteps"))
+        text = OutlineText(svg, options["outlineFonts"], precision) if options.get("outlineFonts") else None
+        symbols = DedupeSymbols(svg) if options.get("symbols") else 0
 
-    shadow = layerInfo.get("shadow")
+        if precision is not None or options.get("minify"):
+            MinifySvg(svg, precision, options.get("minify", False))
+    return svg, text, symbols
 
-    svg = ConvertNodesIntoSvg(nodes, width, height, shadow)
-    WriteSvgFile(svg, name, output_dir)
+
+def lod_file_name(name, size):
+    return f"{name}@{size}px.svg"
+
+
+def lod_precision(scale, precision=None):
+    # decimals which keep coordinates within LOD_TOLERANCE pixels once scaled down
+    decimals = max(0, math.ceil(math.log10(scale / LOD_TOLERANCE)))
+    return decimals if precision is None else min(decimals, precision)
+
+
+def WriteLodVariants(layerInfo, output_dir, options, timings):
+    """Writes a simplified copy of a layer for every size in options["lodSizes"]
+    (pixels the gauge is drawn at) smaller than the layer: ticks closer than
+    LOD_MIN_TICK_SPACING are thinned out, labels too small or too close are dropped
+    and coordinates are rounded to fewer decimals. A variant which comes out the same
+    as the next bigger one is not written. Returns the stats of the written variants."""
+    name = layerInfo.get("name", "unnamed")
+    width = layerInfo.get("width", 600)
+    precision = layerInfo.get("precision", options.get("precision"))
+
+    variants = []
+    previous = None
+    for size in sorted(options["lodSizes"], reverse=True):
+        path = os.path.join(output_dir, lod_file_name(name, size))
+        data = None
+
+        if size < width:
+            scale = size / width
+            lod_options = {**options, "lodScale": scale}
+            svg, _, _ = AssembleLayer(layerInfo, lod_options, lod_precision(scale, precision), timings)
+
+            with timed(timings, "serialize"):
+                data = serialize_to_text(svg, options.get("compact", False)).encode("utf-8")
+
+        if data is None or data == previous:
+            if os.path.exists(path):
+                os.remove(path)
+            continue
+
+        with timed(timings, "write"):
+            write_if_changed(path, data)
+        variants.append({"size": size, "path": path, "bytes": len(data), "elements": sum(1 for _ in svg.iter())})
+        previous = data
+
+    return variants
+
+
+def WriteLodManifest(output_dir, layers, sizes):
+    """Writes lod.json which lists the files of every layer from the smallest variant
+    to the full layer. A gauge drawn at N pixels uses the first file whose `maxSize`
+    is at least N (`null` being any size)."""
+    manifest = {"version": 1, "sizes": sorted(sizes), "layers": {}}
+    for layer in layers:
+        name = layer.get("name", "unnamed")
+        files = [{"maxSize": size, "file": lod_file_name(name, size)} for size in sorted(sizes)
+                 if os.path.exists(os.path.join(output_dir, lod_file_name(name, size)))]
+        manifest["layers"][name] = files + [{"maxSize": None, "file": f"{name}.svg"}]
+
+    write_if_changed(os.path.join(output_dir, LOD_MANIFEST_NAME),
+                           (json.dumps(manifest, indent=2) + "\n").encode("utf-8"))
+    return manifest
+
+
+def CreateLayer(layerInfo, output_dir, manifest=None, options=None):
+    """Builds and writes a single layer. Returns some stats about the written file or
+    None if the layer was skipped because the manifest says its inputs have not changed
+    since the last build."""
+    options = options or {}
+    name = layerInfo.get("name", "unnamed")
+
+    layer_hash = None
+    if manifest is not None:
+        unchanged, layer_hash = IsLayerUnchanged(layerInfo, output_dir, manifest, options)
+        if unchanged:
+            debug("Layer '%s' unchanged, skipping", name)
+            return None
+
+    timings = {}
+    precision = layerInfo.get("precision", options.get("precision"))
+    svg, text, symbols = AssembleLayer(layerInfo, options, precision, timings)
+
+    with timed(timings, "serialize"):
+        serialized = serialize_to_text(svg, options.get("compact", False))
+    with timed(timings, "write"):
+        path = WriteSvgText(serialized, name, output_dir)
+
+    path_index = None
+    if options.get("pathSamples"):
+        with timed(timings, "path index"):
+            data, path_index = BuildPathIndex(svg, options["pathSamples"], options.get("pathReport", False))
+        index_path = os.path.join(output_dir, f"{name}{PATH_INDEX_SUFFIX}")
+        with timed(timings, "write"):
+            if data is not None:
+                write_if_changed(index_path, data)
+            elif os.path.exists(index_path):
+                os.remove(index_path)
+
+    lod = WriteLodVariants(layerInfo, output_dir, options, timings) if options.get("lodSizes") else None
+
+    if manifest is not None:
+        manifest["layers"][name] = layer_hash
+
+    return {
+        "name": name,
+        "path": path,
+        "bytes": os.path.getsize(path),
+        "elements": sum(1 for _ in svg.iter()),
+        "pathIndex": path_index,
+        "symbols": symbols,
+        "text": text,
+        "lod": lod,
+        "shadow": ("baked" if options.get("shadowSteps") else "filter") if layerInfo.get("shadow") else None,
+        "timings": timings
+    }
+
+
+def FindSvgJsonFiles(root_dir):
+    paths = []
+    for root, dirs, files in os.walk(root_dir):
+        dirs.sort()
+        if "svg.json" in files:
+            paths.append(os.path.join(root, "svg.json"))
+    return paths
+
+
+def BuildLayerJob(layerInfo, output_dir, options):
+    # runs inside a worker process
+    return CreateLayer(layerInfo, output_dir, options=options)
+
+
+def BuildAtlasJob(output_dir, layers, scales):
+    # runs inside a worker process
+    return atlas.BuildAtlas(output_dir, atlas.GetStaticLayerNames(output_dir, layers), scales)
+
+
+def BuildTree(root_dir, workers=None, incremental=False, options=None, atlas_scales=None):
+    """Builds every svg.json under a directory into its own directory, spreading the
+    layers across a process pool. Returns (built, skipped, failures, load_time) where
+    built is a list of stats from CreateLayer."""
+    jobs = []
+    atlas_jobs = []
+    symbol_dirs = []
+    lod_dirs = []
+    manifests = {}
+    failures = []
+    built = []
+    skipped = 0
+    load_time = 0
+
+    for input_path in FindSvgJsonFiles(root_dir):
+        output_dir = os.path.dirname(input_path)
+
+        started = time.perf_counter()
+        try:
+            data = LoadJson(input_path)
+        except (OSError, ValueError) as e:
+            failures.append(f"{input_path}: {e}")
+            continue
+        finally:
+            load_time += time.perf_counter() - started
+
+        layers = ResolveLayers(data)
+        manifest = None
+
+        if atlas_scales:
+            atlas_jobs.append((input_path, output_dir, layers))
+        if (options or {}).get("symbols"):
+            symbol_dirs.append((output_dir, layers))
+        if (options or {}).get("lodSizes"):
+            lod_dirs.append((output_dir, layers))
+
+        if incremental:
+            manifest = LoadManifest(output_dir)
+            PruneManifest(manifest, layers)
+            manifests[output_dir] = manifest
+
+        for layer in layers:
+            layer_hash = None
+
+            if manifest is not None:
+                unchanged, layer_hash = IsLayerUnchanged(layer, output_dir, manifest, options)
+                if unchanged:
+                    skipped += 1
+                    continue
+
+            jobs.append((input_path, output_dir, layer, layer_hash))
+
+    debug("Found %d layers to build (%d unchanged) in %s", len(jobs), skipped, root_dir)
+
+    def on_done(job, result, error):
+        input_path, output_dir, layer, layer_hash = job
+        name = layer.get("name", "unnamed")
+
+        if error is not None:
+            failures.append(f"{input_path}: layer '{name}': {error!r}")
+            # make sure a failed layer is rebuilt next time
+            if layer_hash is not None:
+                manifests[output_dir]["layers"].pop(name, None)
+            return
+
+        built.append(result)
+        if layer_hash is not None:
+            manifests[output_dir]["layers"][name] = layer_hash
+
+    def on_atlas_done(job, error):
+        if error is not None:
+            failures.append(f"{job[0]}: atlas: {error!r}")
+
+    if workers == 1 or len(jobs) + len(atlas_jobs) <= 1:
+        for job in jobs:
+            try:
+                on_done(job, BuildLayerJob(job[2], job[1], options), None)
+            except Exception as e:
+                on_done(job, None, e)
+        for job in atlas_jobs:
+            try:
+                BuildAtlasJob(job[1], job[2], atlas_scales)
+                on_atlas_done(job, None)
+            except Exception as e:
+                on_atlas_done(job, e)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=SetLogLevel, initargs=(log_level,)) as pool:
+            futures = {pool.submit(BuildLayerJob, job[2], job[1], options): job for job in jobs}
+            for future in as_completed(futures):
+                error = future.exception()
+                on_done(futures[future], None if error else future.result(), error)
+
+            # atlases are made from the written SVGs so wait for the layers first
+            futures = {pool.submit(BuildAtlasJob, job[1], job[2], atlas_scales): job for job in atlas_jobs}
+            for future in as_completed(futures):
+                on_atlas_done(futures[future], future.exception())
+
+    for output_dir, manifest in manifests.items():
+        SaveManifest(manifest, output_dir)
+
+    for output_dir, layers in symbol_dirs:
+        WriteSymbolLibrary(output_dir, layers, options.get("compact", False))
+
+    for output_dir, layers in lod_dirs:
+        WriteLodManifest(output_dir, layers, options["lodSizes"])
+
+    return built, skipped, failures, load_time
+
+
+def PrintTimings(stats, load_time):
+    # the layer stages are summed over every layer (and every worker), the path index
+    # is only listed when it was built
+    totals = {"load": load_time, "geometry": 0, "tree": 0, "serialize": 0, "write": 0}
+    for stat in stats:
+        for stage, elapsed in stat["timings"].items():
+            totals[stage] = totals.get(stage, 0) + elapsed
+
+    info("Timings: %s", ", ".join(f"{stage} {elapsed * 1000:.1f}ms" for stage, elapsed in totals.items()))
+
+
+def PrintSizeReport(stats):
+    print(f"{'layer':<40}{'bytes':>10}{'elements':>10}")
+    for stat in sorted(stats, key=lambda st: st["path"]):
+        print(f"{stat['path']:<40}{stat['bytes']:>10}{stat['elements']:>10}")
+    print(f"{'total':<40}{sum(st['bytes'] for st in stats):>10}{sum(st['elements'] for st in stats):>10}")
+
+
+def BuildFile(input_path, output_dir, incremental=False, options=None, atlas_scales=None):
+    """Builds the layers of one input file. Returns the same as BuildTree."""
+    started = time.perf_counter()
+    data = LoadJson(input_path)
+    layers = ResolveLayers(data)
+    load_time = time.perf_counter() - started
+    debug("Loaded %d layers from JSON", len(layers))
+
+    manifest = LoadManifest(output_dir) if incremental else None
+
+    built = []
+    skipped = 0
+    for layer in layers:
+        stats = CreateLayer(layer, output_dir, manifest, options)
+        if stats:
+            built.append(stats)
+        else:
+            skipped += 1
+
+    if manifest is not None:
+        PruneManifest(manifest, layers)
+        SaveManifest(manifest, output_dir)
+
+    if (options or {}).get("symbols"):
+        count = WriteSymbolLibrary(output_dir, layers, options.get("compact", False))
+        if count:
+            info("Symbols: %d shapes in %s", count, os.path.join(output_dir, SYMBOL_LIBRARY_NAME))
+
+    if (options or {}).get("lodSizes"):
+        WriteLodManifest(output_dir, layers, options["lodSizes"])
+
+    if atlas_scales:
+        static_names = atlas.GetStaticLayerNames(output_dir, layers)
+        rendered = atlas.BuildAtlas(output_dir, static_names, atlas_scales)
+        info("Atlas: %d static layers, rendered %d of %d scales", len(static_names), rendered, len(atlas_scales))
+
+    return built, skipped, [], load_time
+
+
+def PrintPathIndexReport(stats):
+    indexed = [stat for stat in stats if stat.get("pathIndex")]
+    if not indexed:
+        return
+
+    path_count = sum(stat["pathIndex"]["paths"] for stat in indexed)
+    samples = indexed[0]["pathIndex"]["samples"]
+    error = max(stat["pathIndex"]["error"] for stat in indexed)
+    info("Path index: %d paths in %d layers, %d samples each, max error %.4f", path_count, len(indexed), samples, error)
+
+    if "densities" not in indexed[0]["pathIndex"]:
+        return
+
+    # largest error of every layer for each sample count
+    print(f"{'layer':<40}" + "".join(f"{density:>10}" for density in PATH_REPORT_DENSITIES))
+    for stat in sorted(indexed, key=lambda st: st["path"]):
+        densities = stat["pathIndex"]["densities"]
+        print(f"{stat['path']:<40}" + "".join(f"{densities[density]:>10.4f}" for density in PATH_REPORT_DENSITIES))
+
+
+def ReportBuild(built, skipped, failures, load_time, size_report=False):
+    """Prints the outcome of a build. Returns False if anything failed."""
+    if size_report and built:
+        PrintSizeReport(built)
+
+    PrintPathIndexReport(built)
+
+    replaced = sum(stat.get("symbols", 0) for stat in built)
+    if replaced:
+        info("Symbols: replaced %d repeated elements with <use>", replaced)
+
+    texts = [stat["text"] for stat in built if stat.get("text")]
+    if texts:
+        info("Text: outlined %d texts (%d glyphs, %d outlines extracted), kept %d as <text>",
+             *(sum(text[key] for text in texts) for key in ("outlined", "glyphs", "extracted", "kept")))
+
+    variants = [(variant, stat) for stat in built for variant in stat.get("lod") or []]
+    if variants:
+        saved = sum(1 - variant["bytes"] / stat["bytes"] for variant, stat in variants) / len(variants)
+        info("LOD: wrote %d variants, %.0f%% smaller than their full layer on average", len(variants), saved * 100)
+
+    baked = sum(1 for stat in built if stat.get("shadow") == "baked")
+    filtered = sum(1 for stat in built if stat.get("shadow") == "filter")
+    if baked:
+        info("Shadows: baked %d layers without a filter (%d still use feGaussianBlur)", baked, filtered)
+
+    info("Built %d layers, skipped %d unchanged", len(built), skipped)
+    PrintTimings(built, load_time)
+
+    if failures:
+        print(f"{len(failures)} failed:")
+        for failure in failures:
+            print(f"  {failure}")
+
+    return not failures
+
+
+def snapshot_files(paths):
+    snapshot = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+            snapshot[path] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            snapshot[path] = None
+    return snapshot
+
+
+def WatchFiles(get_paths, on_change, interval=0.25, debounce=0.3):
+    """Polls the files returned by get_paths() (called every time so new files are
+    picked up) and calls on_change() once they have stopped changing for `debounce`
+    seconds. Editors often save in bursts so this avoids rebuilding several times."""
+    snapshot = snapshot_files(get_paths())
+
+    while True:
+        time.sleep(interval)
+        current = snapshot_files(get_paths())
+        if current == snapshot:
+            continue
+
+        # wait for the burst of saves to settle
+        while True:
+            time.sleep(debounce)
+            settled = snapshot_files(get_paths())
+            if settled == current:
+                break
+            current = settled
+
+        changed = sorted(path for path in set(current) | set(snapshot) if current.get(path) != snapshot.get(path))
+        snapshot = current
+        info("Changed: %s", ", ".join(changed))
+        on_change()
+
+
+def print_usage():
+    print("Usage: create-svg-gauge/main.py path/to/input.json path/to/output (default: cwd) [options]")
+    print("       create-svg-gauge/main.py --tree path/to/gauges [options]")
+    print("See tools/create-svg-gauge/README.md for the options")
 
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: create-svg-gauge/main.py path/to/input.json path/to/output (default: cwd)")
+        print_usage()
         sys.exit(1)
 
-    input_path = sys.argv[1]
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else os.getcwd()
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("input", nargs="?")
+    parser.add_argument("output", nargs="?")
+    parser.add_argument("--incremental", action="store_true",
+                        help=f"only rebuild layers whose inputs changed since the last run (tracked in {MANIFEST_NAME})")
+    parser.add_argument("--tree", help="build every svg.json found under this directory")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes for --tree (default: number of CPUs)")
+    parser.add_argument("--compact", action="store_true", help="write SVGs without indentation")
+    parser.add_argument("--tick-paths", action="store_true",
+                        help="draw each gaugeTicks operation as a single <path> instead of a <line> per tick")
+    parser.add_argument("--precision", type=int, default=None,
+                        help="number of decimals to round coordinates to (layers can override with \"precision\")")
+    parser.add_argument("--minify", action="store_true",
+                        help="shortest path commands and no attributes which are set to their default")
+    parser.add_argument("--size-report", action="store_true", help="print the size of every written layer")
+    parser.add_argument("--atlas", action="store_true",
+                        help="also rasterize static layers into a PNG atlas per scale (see atlas.py)")
+    parser.add_argument("--atlas-scales", default="1,2,3",
+                        help="comma separated device scale factors for --atlas (default: 1,2,3)")
+    parser.add_argument("--symbols", action="store_true",
+                        help=f"replace repeated elements with <use> of a shared <defs> symbol and write {SYMBOL_LIBRARY_NAME}")
+    parser.add_argument("--outline-text", action="store_true",
+                        help="replace text with <path> outlines of its glyphs if its font is in the --font-dir")
+    parser.add_argument("--font-dir", action="append", default=None,
+                        help=f"directory with <family>.ttf fonts for --outline-text, can be repeated (default: {atlas.FONTS_DIR})")
+    parser.add_argument("--bake-shadows", action="store_true",
+                        help="draw layer shadows as grown copies of the layer with stepped opacity instead of a blur filter")
+    parser.add_argument("--shadow-steps", type=int, default=4,
+                        help="copies per baked shadow besides the layer outline (default: 4)")
+    parser.add_argument("--lod", default=None,
+                        help=f"comma separated gauge sizes in pixels to also write simplified layers for, listed in {LOD_MANIFEST_NAME}")
+    parser.add_argument("--path-index", action="store_true",
+                        help=f"also write an arc-length index of every <path> of a layer to <name>{PATH_INDEX_SUFFIX}")
+    parser.add_argument("--path-samples", type=int, default=256,
+                        help="samples per path in the --path-index (default: 256)")
+    parser.add_argument("--path-report", action="store_true",
+                        help="print the largest --path-index error of every layer for a range of sample counts")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and rebuild the changed layers whenever an input file changes")
+    parser.add_argument("--debounce", type=float, default=0.3,
+                        help="seconds an input must stop changing before --watch rebuilds (default: 0.3)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print errors")
+    parser.add_argument("-v", "--verbose", action="count", default=0,
+                        help="print what is being built (-vv to also print every node)")
+    args = parser.parse_args()
+
+    SetLogLevel(QUIET if args.quiet else min(INFO + args.verbose, TRACE))
+
+    options = {
+        "compact": args.compact,
+        "tickPaths": args.tick_paths,
+        "precision": args.precision,
+        "minify": args.minify,
+        "symbols": args.symbols,
+        "outlineFonts": [os.path.abspath(d) for d in args.font_dir or [atlas.FONTS_DIR]] if args.outline_text else None,
+        "lodSizes": [int(size) for size in args.lod.split(",")] if args.lod else None,
+        "shadowSteps": max(args.shadow_steps, 1) if args.bake_shadows else None,
+        "pathSamples": max(args.path_samples, 2) if args.path_index else None,
+        "pathReport": args.path_report
+    }
 
-    data = LoadJson(input_path)
-    layers = data.get("layers", [])
-    debug(f"Loaded {len(layers)} layers from JSON")
+    atlas_scales = [float(scale) for scale in args.atlas_scales.split(",")] if args.atlas else None
+    # watching only makes sense if unchanged layers are left alone
+    incremental = args.incremental or args.watch
+
+    if args.tree:
+        if args.input or args.output:
+            # layers are always written next to their svg.json, never into a given output
+            print("Error: --tree builds every layer next to its svg.json and takes no input or output")
+            sys.exit(1)
+        if not os.path.isdir(args.tree):
+            print(f"Error: Directory not found: {args.tree}")
+            sys.exit(1)
+
+        def build():
+            return BuildTree(args.tree, args.workers, incremental, options, atlas_scales)
+
+        def get_watched_paths():
+            return FindSvgJsonFiles(args.tree)
+    elif args.input:
+        def build():
+            return BuildFile(args.input, args.output or os.getcwd(), incremental, options, atlas_scales)
+
+        def get_watched_paths():
+            return [args.input]
+    else:
+        print_usage()
+        sys.exit(1)
 
-    for layer in layers:
-        CreateLayer(layer, output_dir)
+    if not args.watch:
+        if not ReportBuild(*build(), size_report=args.size_report):
+            sys.exit(1)
+        return
+
+    def rebuild():
+        try:
+            ReportBuild(*build(), size_report=args.size_report)
+        except Exception as e:
+            # most likely a file saved half way, it will be rebuilt on the next save
+            print(f"Error: {e!r}")
+
+    rebuild()
+    info("Watching for changes (Ctrl+C to stop)...")
+
+    try:
+        WatchFiles(get_watched_paths, rebuild, debounce=args.debounce)
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == "__main__":
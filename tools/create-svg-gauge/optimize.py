@@ -0,0 +1,677 @@
+#!/usr/bin/env python3
+"""
+Optimizes SVGs made by other tools (mostly Inkscape) so the client loads and draws
+fewer elements.
+
+    python3 tools/create-svg-gauge/optimize.py gauges/Skyhawk-Flight-Instruments/svg --output optimized
+    python3 tools/create-svg-gauge/optimize.py some.svg other.svg --in-place
+
+What it does:
+
+- removes editor metadata (Inkscape/Sodipodi/RDF elements and attributes, comments)
+- removes unused defs, unreferenced ids and hidden (display:none) elements
+- turns style="" into attributes and drops properties set to their default or to the
+  value they inherit anyway
+- removes groups which do nothing and moves group transforms into their children,
+  then into path data where that is safe
+- merges neighbouring paths with the same attributes if they do not overlap
+- rounds coordinates and writes path data with the shortest commands
+
+The first <path> of a file keeps its geometry because the client reads it for path
+transforms.
+"""
+import argparse
+import math
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree.ElementTree import ParseError, XMLParser, parse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import main as gauge  # noqa: E402
+from shared.files import open_atomic  # noqa: E402
+
+SVG_NS = "http://www.w3.org/2000/svg"
+XLINK_NS = "http://www.w3.org/1999/xlink"
+XML_NS = "http://www.w3.org/XML/1998/namespace"
+
+# prefixes of the attribute namespaces which are kept (the tree is written without namespaces)
+KEPT_ATTR_NAMESPACES = {XLINK_NS: "xlink:", XML_NS: "xml:"}
+
+# elements which are never drawn or only by editors
+METADATA_TAGS = {"metadata", "title", "desc"}
+
+# presentation properties which children inherit and their initial values
+INHERITED = {
+    "fill": "black", "fill-opacity": "1", "fill-rule": "nonzero",
+    "stroke": "none", "stroke-width": "1", "stroke-opacity": "1", "stroke-linecap": "butt",
+    "stroke-linejoin": "miter", "stroke-miterlimit": "4", "stroke-dasharray": "none",
+    "stroke-dashoffset": "0", "clip-rule": "nonzero", "visibility": "visible",
+    "font-style": "normal", "font-variant": "normal", "font-weight": "normal", "font-stretch": "normal",
+    "font-size": None, "font-family": None, "text-anchor": "start", "letter-spacing": "normal",
+    "word-spacing": "normal", "writing-mode": "lr-tb", "direction": "ltr", "color": None,
+    "marker": "none", "marker-start": "none", "marker-mid": "none", "marker-end": "none",
+    "shape-rendering": "auto", "text-rendering": "auto", "color-interpolation-filters": None,
+}
+
+# presentation properties which are not inherited and their initial values
+NOT_INHERITED = {
+    "opacity": "1", "display": "inline", "overflow": "visible", "clip-path": "none", "mask": "none",
+    "filter": "none", "stop-opacity": "1", "stop-color": "black", "isolation": "auto",
+    "mix-blend-mode": "normal", "solid-color": None, "solid-opacity": None, "enable-background": None,
+}
+
+# properties nothing draws with
+DROPPED_PROPERTIES = {"line-height", "-inkscape-font-specification", "font-variant-ligatures",
+                      "font-variant-caps", "font-variant-numeric", "font-feature-settings",
+                      "font-variant-position", "font-variant-alternates", "font-variant-east-asian",
+                      "text-decoration-line", "text-decoration-style", "text-decoration-color",
+                      "text-decoration", "text-indent", "text-align", "text-transform", "baseline-shift",
+                      "block-progression", "inline-size", "vector-effect", "paint-order",
+                      "solid-color", "solid-opacity", "enable-background", "color-interpolation",
+                      "color-rendering", "image-rendering", "isolation", "mix-blend-mode", "font-variation-settings"}
+
+# attributes of the root which do nothing for the outermost <svg>
+ROOT_DROPPED = {"x", "y", "version", "enable-background", "class"}
+
+# attributes which make a group do more than pass things on to its children
+GROUP_EFFECTS = {"opacity", "clip-path", "mask", "filter", "id", "class", "style", "display"}
+
+URL_RE = re.compile(r"url\(\s*['\"]?#([^)'\"\s]+)['\"]?\s*\)")
+TRANSFORM_RE = re.compile(r"(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)")
+
+
+def local_name(name):
+    return name.rsplit("}", 1)[-1]
+
+
+def namespace_of(name):
+    return name[1:].split("}", 1)[0] if name.startswith("{") else None
+
+
+def count_elements(root):
+    return sum(1 for _ in root.iter())
+
+
+# --- cleanup ---------------------------------------------------------------
+
+def StripEditorData(root):
+    """Removes elements and attributes of other namespaces and metadata, and turns the
+    tree into plain tag names (like create-svg-gauge builds it)."""
+    def visit(el):
+        previous = None
+        for child in list(el):
+            if not isinstance(child.tag, str) or namespace_of(child.tag) not in (None, SVG_NS) \
+                    or local_name(child.tag) in METADATA_TAGS:
+                # keep the tail text of removed elements (matters inside <text>)
+                if child.tail:
+                    if previous is None:
+                        el.text = (el.text or "") + child.tail
+                    else:
+                        previous.tail = (previous.tail or "") + child.tail
+                el.remove(child)
+                continue
+            visit(child)
+            previous = child
+
+        el.tag = local_name(el.tag)
+        for key in list(el.attrib):
+            ns = namespace_of(key)
+            if ns is None:
+                continue
+            value = el.attrib.pop(key)
+            if ns in KEPT_ATTR_NAMESPACES:
+                el.set(KEPT_ATTR_NAMESPACES[ns] + local_name(key), value)
+
+    visit(root)
+
+    for key in ROOT_DROPPED:
+        root.attrib.pop(key, None)
+    root.set("xmlns", SVG_NS)
+    if any(el.get("xlink:href") for el in root.iter()):
+        root.set("xmlns:xlink", XLINK_NS)
+
+
+def parse_style(style):
+    props = {}
+    for declaration in style.split(";"):
+        if ":" in declaration:
+            name, value = declaration.split(":", 1)
+            props[name.strip()] = value.strip()
+    return props
+
+
+def ConvertStyles(root):
+    """Moves style="" properties into attributes (style wins over attributes so they
+    replace any attribute of the same name). Only done when there is no <style> sheet
+    because its rules would beat attributes but not style=""."""
+    if any(el.tag == "style" for el in root.iter()):
+        return False
+
+    for el in root.iter():
+        style = el.attrib.pop("style", None)
+        if style is None:
+            continue
+        for name, value in parse_style(style).items():
+            if name in DROPPED_PROPERTIES or name.startswith("-inkscape"):
+                continue
+            el.set(name, value)
+
+    for el in root.iter():
+        for name in DROPPED_PROPERTIES:
+            el.attrib.pop(name, None)
+    return True
+
+
+def get_href(el):
+    return el.get("xlink:href") or el.get("href")
+
+
+def FindReferences(elements):
+    """Ids referenced with url(#id) or href="#id" by the given elements."""
+    refs = set()
+    for el in elements:
+        for key, value in el.items():
+            if "url(" in value:
+                refs.update(URL_RE.findall(value))
+        href = get_href(el)
+        if href and href.startswith("#"):
+            refs.add(href[1:])
+    return refs
+
+
+def RemoveUnused(root):
+    """Removes hidden elements, defs nothing uses and ids nothing references."""
+    parents = {child: parent for parent in root.iter() for child in parent}
+    by_id = {el.get("id"): el for el in root.iter() if el.get("id")}
+
+    def is_drawn(el):
+        while el is not None:
+            if el.tag == "defs" or el.get("display") == "none":
+                return False
+            el = parents.get(el)
+        return True
+
+    # ids used by what is drawn, then whatever those use in turn. Hidden subtrees are
+    # removed below so what only they reference is unused too.
+    drawn = [el for el in root.iter() if is_drawn(el)]
+    used = FindReferences(drawn)
+    pending = list(used)
+    while pending:
+        el = by_id.get(pending.pop())
+        if el is None:
+            continue
+        for ref in FindReferences(el.iter()) - used:
+            used.add(ref)
+            pending.append(ref)
+
+    removed = 0
+    for el in list(root.iter()):
+        parent = parents.get(el)
+        if parent is None:
+            continue
+        hidden = el.get("display") == "none" and el.get("id") not in used
+        unused_def = parent.tag == "defs" and el.tag != "style" and el.get("id") not in used
+        if hidden or unused_def:
+            parent.remove(el)
+            removed += 1
+
+    for el in root.iter():
+        if el.get("id") is not None and el.get("id") not in used:
+            del el.attrib["id"]
+
+    for el in list(root.iter()):
+        for child in list(el):
+            if child.tag == "defs" and len(child) == 0:
+                el.remove(child)
+
+    return removed
+
+
+def DropRedundantProperties(root):
+    """Drops properties set to what they would be anyway: the inherited value for
+    inherited properties and the initial value for the others."""
+    def visit(el, inherited):
+        for name in list(el.attrib):
+            value = el.get(name)
+            if name in INHERITED:
+                current = inherited.get(name, INHERITED[name])
+                if current is not None and value == current:
+                    del el.attrib[name]
+            elif name in NOT_INHERITED and NOT_INHERITED[name] is not None and value == NOT_INHERITED[name]:
+                del el.attrib[name]
+
+        own = {name: el.get(name) for name in INHERITED if el.get(name) is not None}
+        child_inherited = {**inherited, **own} if own else inherited
+        for child in el:
+            visit(child, child_inherited)
+
+    visit(root, {})
+
+
+# --- transforms -------------------------------------------------------------
+
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+
+def multiply(m1, m2):
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (a1 * a2 + c1 * b2, b1 * a2 + d1 * b2,
+            a1 * c2 + c1 * d2, b1 * c2 + d1 * d2,
+            a1 * e2 + c1 * f2 + e1, b1 * e2 + d1 * f2 + f1)
+
+
+def parse_transform(value):
+    """Returns the matrix (a, b, c, d, e, f) of a transform attribute or None if it
+    can not be parsed."""
+    matrix = IDENTITY
+    rest = TRANSFORM_RE.sub("", value).replace(",", "").strip()
+    if rest:
+        return None
+
+    for name, args in TRANSFORM_RE.findall(value):
+        v = [float(n) for n in gauge.NUMBER_RE.findall(args)]
+        if name == "matrix" and len(v) == 6:
+            m = tuple(v)
+        elif name == "translate" and len(v) in (1, 2):
+            m = (1, 0, 0, 1, v[0], v[1] if len(v) == 2 else 0)
+        elif name == "scale" and len(v) in (1, 2):
+            m = (v[0], 0, 0, v[1] if len(v) == 2 else v[0], 0, 0)
+        elif name == "rotate" and len(v) in (1, 3):
+            rad = math.radians(v[0])
+            cos, sin = math.cos(rad), math.sin(rad)
+            m = (cos, sin, -sin, cos, 0, 0)
+            if len(v) == 3:
+                m = multiply(multiply((1, 0, 0, 1, v[1], v[2]), m), (1, 0, 0, 1, -v[1], -v[2]))
+        elif name == "skewX" and len(v) == 1:
+            m = (1, 0, math.tan(math.radians(v[0])), 1, 0, 0)
+        elif name == "skewY" and len(v) == 1:
+            m = (1, math.tan(math.radians(v[0])), 0, 1, 0, 0)
+        else:
+            return None
+        matrix = multiply(matrix, m)
+
+    return matrix
+
+
+def transform_path(commands, m):
+    """Applies a matrix to absolute path commands. Returns None for arcs unless the
+    matrix only translates and scales evenly (which keeps them arcs with the same flags)."""
+    a, b, c, d, e, f = m
+    uniform = abs(b) < 1e-12 and abs(c) < 1e-12 and abs(a - d) < 1e-12 and a > 0
+
+    def point(x, y):
+        return a * x + c * y + e, b * x + d * y + f
+
+    result = []
+    for cmd, args in commands:
+        if cmd == "A":
+            if not uniform:
+                return None
+            x, y = point(args[5], args[6])
+            result.append((cmd, [args[0] * a, args[1] * a, args[2], args[3], args[4], x, y]))
+        elif cmd == "Z":
+            result.append((cmd, []))
+        else:
+            new_args = []
+            for i in range(0, len(args), 2):
+                new_args += point(args[i], args[i + 1])
+            result.append((cmd, new_args))
+    return result
+
+
+def is_translate(m):
+    return m[0] == 1 and m[1] == 0 and m[2] == 0 and m[3] == 1
+
+
+def uses_url(el, inherited):
+    for name in ("fill", "stroke"):
+        value = el.get(name, inherited.get(name, ""))
+        if value and "url(" in value:
+            return True
+    return any(el.get(name) for name in ("clip-path", "mask", "filter", "marker", "marker-start", "marker-mid", "marker-end"))
+
+
+def has_stroke(el, inherited):
+    return el.get("stroke", inherited.get("stroke", "none")) != "none"
+
+
+def BakeTransform(el, inherited):
+    """Moves the transform of a path into its path data if nothing else depends on the
+    coordinate system: no gradients, clips, masks, filters or markers and no stroke
+    unless the transform only translates (scaling would change the stroke width)."""
+    transform = el.get("transform")
+    d = el.get("d")
+    if not transform or not d or uses_url(el, inherited):
+        return False
+
+    m = parse_transform(transform)
+    if m is None or (has_stroke(el, inherited) and not is_translate(m)):
+        return False
+
+    try:
+        commands = transform_path(gauge.parse_path(d), m)
+    except ValueError:
+        return False
+    if commands is None:
+        return False
+
+    el.set("d", gauge.format_path(commands))
+    del el.attrib["transform"]
+    return True
+
+
+def can_collapse(group):
+    return group.tag == "g" and not any(key in GROUP_EFFECTS or namespace_of(key) for key in group.keys())
+
+
+def CollapseGroups(root, protected):
+    """Replaces groups which only hold inherited properties and a transform by their
+    children, pushing the properties and transform down. A transform is only pushed
+    down if every child can take it into its path data or there is a single child."""
+    stats = {"groups": 0, "baked": 0}
+
+    def visit(el, inherited):
+        own = {name: el.get(name) for name in INHERITED if el.get(name) is not None}
+        child_inherited = {**inherited, **own} if own else inherited
+
+        for child in list(el):
+            visit(child, child_inherited)
+
+        index = 0
+        while index < len(el):
+            child = el[index]
+            if child.tag == "path" and child.get("transform") and child not in protected:
+                if BakeTransform(child, child_inherited):
+                    stats["baked"] += 1
+
+            if child.tag == "g" and len(child) == 0 and not child.get("id"):
+                el.remove(child)
+                stats["groups"] += 1
+                continue
+
+            if can_collapse(child) and TryCollapse(child, child_inherited, protected, stats):
+                grandchildren = list(child)
+                el.remove(child)
+                for offset, grandchild in enumerate(grandchildren):
+                    el.insert(index + offset, grandchild)
+                stats["groups"] += 1
+                continue
+
+            index += 1
+
+    def TryCollapse(group, inherited, protected, stats):
+        children = list(group)
+        if not children or group.text and group.text.strip():
+            return False
+
+        properties = {key: value for key, value in group.items() if key != "transform"}
+        transform = group.get("transform")
+
+        if len(children) > 1 and properties:
+            # copying the properties to every child would make the file bigger
+            return False
+
+        if transform and len(children) > 1:
+            group_inherited = {**inherited, **{k: v for k, v in properties.items() if k in INHERITED}}
+            m = parse_transform(transform)
+            for child in children:
+                if child.tag != "path" or child in protected or m is None or uses_url(child, group_inherited) \
+                        or (has_stroke(child, group_inherited) and not is_translate(m)):
+                    return False
+
+        for child in children:
+            for key, value in properties.items():
+                if child.get(key) is None:
+                    child.set(key, value)
+            if transform:
+                child.set("transform", f"{transform} {child.get('transform', '')}".strip())
+                if child.tag == "path" and child not in protected:
+                    child_inherited = {**inherited, **{k: child.get(k) for k in INHERITED if child.get(k) is not None}}
+                    if BakeTransform(child, child_inherited):
+                        stats["baked"] += 1
+        return True
+
+    visit(root, {})
+    return stats
+
+
+# --- merging paths ----------------------------------------------------------
+
+def path_bounds(commands, padding):
+    xs = []
+    ys = []
+    x = y = start_x = start_y = 0.0
+    for cmd, args in commands:
+        if cmd == "A":
+            # an arc stays within its ellipse, with the radii scaled up like a renderer
+            # does when they are too small to reach the end point
+            arc = gauge.paths.arc_center(x, y, *args)
+            if arc is not None:
+                cx, cy, rx, ry = arc[:4]
+                r = max(rx, ry)
+                xs += [cx - r, cx + r]
+                ys += [cy - r, cy + r]
+            xs.append(args[5])
+            ys.append(args[6])
+        else:
+            xs += args[0::2]
+            ys += args[1::2]
+        if cmd == "Z":
+            x, y = start_x, start_y
+        elif args:
+            x, y = args[-2], args[-1]
+            if cmd == "M":
+                start_x, start_y = x, y
+    if not xs:
+        return None
+    return min(xs) - padding, min(ys) - padding, max(xs) + padding, max(ys) + padding
+
+
+def overlaps(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def MergePaths(root, protected):
+    """Merges runs of sibling paths with exactly the same attributes into one path.
+    Only paths whose bounds do not overlap are merged as overlapping shapes could
+    cancel each other out (fill rule) or be blended differently (opacity)."""
+    merged = [0]
+
+    def visit(el, inherited):
+        own = {name: el.get(name) for name in INHERITED if el.get(name) is not None}
+        child_inherited = {**inherited, **own} if own else inherited
+
+        current = None
+        current_bounds = []
+        current_commands = []
+
+        def flush():
+            if current is not None and len(current_bounds) > 1:
+                current.set("d", gauge.format_path(current_commands))
+
+        for child in list(el):
+            if child.tag != "path":
+                visit(child, child_inherited)
+
+            mergeable = child.tag == "path" and child not in protected and child.get("d") \
+                and not child.get("id") and not uses_url(child, child_inherited)
+
+            if mergeable:
+                stroke_padding = 0
+                if has_stroke(child, child_inherited):
+                    try:
+                        stroke_padding = float(child.get("stroke-width", child_inherited.get("stroke-width", "1"))) / 2
+                    except ValueError:
+                        mergeable = False
+
+            if mergeable:
+                try:
+                    commands = gauge.parse_path(child.get("d"))
+                except ValueError:
+                    commands = None
+                bounds = path_bounds(commands, stroke_padding) if commands else None
+                mergeable = bounds is not None
+
+            if not mergeable:
+                flush()
+                current = None
+                continue
+
+            same = current is not None and dict(child.items(), d=None) == dict(current.items(), d=None)
+            if same and not any(overlaps(bounds, other) for other in current_bounds):
+                current_commands += commands
+                current_bounds.append(bounds)
+                el.remove(child)
+                merged[0] += 1
+                continue
+
+            flush()
+            current = child
+            current_commands = list(commands)
+            current_bounds = [bounds]
+
+        flush()
+
+    visit(root, {})
+    return merged[0]
+
+
+# --- driver -----------------------------------------------------------------
+
+def OptimizeSvg(root, precision=3, merge=True):
+    """Optimizes a parsed SVG in place. Returns counts of what was done."""
+    StripEditorData(root)
+    ConvertStyles(root)
+    removed = RemoveUnused(root)
+    DropRedundantProperties(root)
+
+    first_path = next((el for el in root.iter() if el.tag == "path"), None)
+    protected = {first_path} if first_path is not None else set()
+
+    stats = CollapseGroups(root, protected)
+    stats["removed"] = removed
+    stats["merged"] = MergePaths(root, protected) if merge else 0
+
+    gauge.MinifySvg(root, precision, minify=True)
+    return stats
+
+
+def parse_svg(path):
+    # TreeBuilder drops comments and processing instructions by default
+    with open(path, "rb") as f:
+        parser = XMLParser()
+        return parse(f, parser).getroot()
+
+
+def OptimizeFile(input_path, output_path, precision, merge, pretty):
+    """Returns a report dict for one file."""
+    before = os.path.getsize(input_path)
+    try:
+        root = parse_svg(input_path)
+    except ParseError as e:
+        return {"path": input_path, "error": f"invalid XML: {e}"}
+
+    elements_before = count_elements(root)
+    stats = OptimizeSvg(root, precision, merge)
+    elements_after = count_elements(root)
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open_atomic(output_path) as f:
+        gauge.SerializeSvg(root, f.write, compact=not pretty)
+
+    return {
+        "path": input_path,
+        "bytes": (before, os.path.getsize(output_path)),
+        "elements": (elements_before, elements_after),
+        **stats
+    }
+
+
+def FindSvgFiles(inputs):
+    """Returns [(file, directory it was found in or None)]."""
+    files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    if name.lower().endswith(".svg"):
+                        files.append((os.path.join(root, name), path))
+        else:
+            files.append((path, None))
+    return files
+
+
+def get_output_path(path, base_dir, output_dir, in_place):
+    if in_place:
+        return path
+    relative = os.path.relpath(path, base_dir) if base_dir else os.path.basename(path)
+    return os.path.join(output_dir, relative)
+
+
+def percent(before, after):
+    return f"{(before - after) / before * 100:.0f}%" if before else "-"
+
+
+def PrintReport(results):
+    print(f"{'file':<48}{'bytes':>22}{'saved':>7}{'elements':>16}{'saved':>7}")
+    total_bytes = [0, 0]
+    total_elements = [0, 0]
+
+    for result in results:
+        name = result["path"] if len(result["path"]) <= 47 else "..." + result["path"][-44:]
+        if "error" in result:
+            print(f"{name:<48}{result['error']}")
+            continue
+        (bytes_before, bytes_after), (elements_before, elements_after) = result["bytes"], result["elements"]
+        total_bytes[0] += bytes_before
+        total_bytes[1] += bytes_after
+        total_elements[0] += elements_before
+        total_elements[1] += elements_after
+        print(f"{name:<48}{bytes_before:>10,} => {bytes_after:>8,}{percent(bytes_before, bytes_after):>7}"
+              f"{elements_before:>7,} => {elements_after:>5,}{percent(elements_before, elements_after):>7}")
+
+    print(f"{'total':<48}{total_bytes[0]:>10,} => {total_bytes[1]:>8,}{percent(*total_bytes):>7}"
+          f"{total_elements[0]:>7,} => {total_elements[1]:>5,}{percent(*total_elements):>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Optimizes SVG files for the client.")
+    parser.add_argument("inputs", nargs="+", help="SVG files or directories of them")
+    parser.add_argument("-o", "--output", help="directory to write to (directories keep their layout)")
+    parser.add_argument("--in-place", action="store_true", help="overwrite the input files")
+    parser.add_argument("--precision", type=int, default=3, help="decimals to round coordinates to (default: 3)")
+    parser.add_argument("--no-merge", action="store_true", help="do not merge paths")
+    parser.add_argument("--pretty", action="store_true", help="write indented SVGs")
+    parser.add_argument("--workers", type=int, help="number of worker processes (default: number of CPUs)")
+    args = parser.parse_args()
+
+    if not args.in_place and not args.output:
+        print("Error: Use --output <dir> or --in-place")
+        sys.exit(1)
+
+    files = FindSvgFiles(args.inputs)
+    if not files:
+        print("No SVG files found")
+        sys.exit(1)
+
+    jobs = [(path, get_output_path(path, base_dir, args.output, args.in_place), args.precision, not args.no_merge, args.pretty)
+            for path, base_dir in files]
+
+    if args.workers == 1 or len(jobs) == 1:
+        results = [OptimizeFile(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = [executor.submit(OptimizeFile, *job) for job in jobs]
+            results = [future.result() for future in futures]
+
+    PrintReport(results)
+
+    if any("error" in result for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
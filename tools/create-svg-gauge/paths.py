@@ -0,0 +1,261 @@
+"""
+Measures path data like Skia's SKPathMeasure (used by the client to move layers along a
+path): the path is flattened into short lines and positions are found by arc length.
+
+Works on the absolute commands returned by main.parse_path.
+
+Arc-length index (<layer>.paths.bin, little endian):
+
+    header  8s   magic "OSGPTH1\\0"
+            u32  version (1)
+            u32  path count
+    paths   path count times, in the order of the <path> elements:
+            u32  sample count
+            f32  length of the path
+            sample count times f32 distance, x, y, tangent angle (radians)
+"""
+import bisect
+import math
+import struct
+
+
+def arc_center(x1, y1, rx, ry, rotation, large_arc, sweep, x2, y2):
+    """Converts an SVG arc from endpoint to center parameterization (SVG spec F.6.5).
+    Returns (cx, cy, rx, ry, phi, start angle, delta angle) or None for a straight line."""
+    if rx == 0 or ry == 0 or (x1 == x2 and y1 == y2):
+        return None
+
+    rx, ry = abs(rx), abs(ry)
+    phi = math.radians(rotation % 360)
+    cos_phi, sin_phi = math.cos(phi), math.sin(phi)
+
+    dx, dy = (x1 - x2) / 2, (y1 - y2) / 2
+    x1p = cos_phi * dx + sin_phi * dy
+    y1p = -sin_phi * dx + cos_phi * dy
+
+    # radii too small to reach the end point are scaled up
+    scale = (x1p / rx) ** 2 + (y1p / ry) ** 2
+    if scale > 1:
+        rx *= math.sqrt(scale)
+        ry *= math.sqrt(scale)
+
+    numerator = rx * rx * ry * ry - rx * rx * y1p * y1p - ry * ry * x1p * x1p
+    denominator = rx * rx * y1p * y1p + ry * ry * x1p * x1p
+    factor = math.sqrt(max(0.0, numerator / denominator)) if denominator else 0.0
+    if bool(large_arc) == bool(sweep):
+        factor = -factor
+
+    cxp = factor * rx * y1p / ry
+    cyp = -factor * ry * x1p / rx
+    cx = cos_phi * cxp - sin_phi * cyp + (x1 + x2) / 2
+    cy = sin_phi * cxp + cos_phi * cyp + (y1 + y2) / 2
+
+    def angle(ux, uy, vx, vy):
+        return math.atan2(ux * vy - uy * vx, ux * vx + uy * vy)
+
+    start = angle(1, 0, (x1p - cxp) / rx, (y1p - cyp) / ry)
+    delta = angle((x1p - cxp) / rx, (y1p - cyp) / ry, (-x1p - cxp) / rx, (-y1p - cyp) / ry)
+    if not sweep and delta > 0:
+        delta -= 2 * math.pi
+    elif sweep and delta < 0:
+        delta += 2 * math.pi
+
+    return cx, cy, rx, ry, phi, start, delta
+
+
+def segment_count(points, step):
+    # the control polygon is never shorter than the curve
+    length = sum(math.dist(points[i], points[i + 1]) for i in range(len(points) - 1))
+    return max(1, min(4096, math.ceil(length / step)))
+
+
+def FlattenPath(commands, step=0.5, scale=(1, 1)):
+    """Returns the subpaths of the path as lists of points no more than about `step`
+    apart along curves. Closed subpaths end with their first point.
+
+    The points are scaled by `scale` after flattening (like SKPath.Transform) so
+    scaled arcs keep their shape."""
+    step /= max(abs(scale[0]), abs(scale[1])) or 1
+    contours = []
+    points = None
+    x = y = start_x = start_y = 0.0
+    last_control = None
+
+    for cmd, args in commands:
+        if cmd == "M":
+            points = [(args[0], args[1])]
+            contours.append(points)
+            x, y = start_x, start_y = args[0], args[1]
+            last_control = None
+            continue
+
+        if points is None:
+            points = [(x, y)]
+            contours.append(points)
+
+        if cmd == "Z":
+            points.append((start_x, start_y))
+            x, y = start_x, start_y
+            # drawing after a close starts a new subpath at the same point
+            points = None
+            last_control = None
+            continue
+
+        if cmd == "L":
+            points.append((args[0], args[1]))
+            last_control = None
+        elif cmd in ("C", "S"):
+            if cmd == "S":
+                c1 = (2 * x - last_control[0], 2 * y - last_control[1]) if last_control and last_control[2] == "C" else (x, y)
+                c2, end = (args[0], args[1]), (args[2], args[3])
+            else:
+                c1, c2, end = (args[0], args[1]), (args[2], args[3]), (args[4], args[5])
+            n = segment_count([(x, y), c1, c2, end], step)
+            for i in range(1, n + 1):
+                t = i / n
+                u = 1 - t
+                points.append((
+                    u * u * u * x + 3 * u * u * t * c1[0] + 3 * u * t * t * c2[0] + t * t * t * end[0],
+                    u * u * u * y + 3 * u * u * t * c1[1] + 3 * u * t * t * c2[1] + t * t * t * end[1],
+                ))
+            last_control = (c2[0], c2[1], "C")
+        elif cmd in ("Q", "T"):
+            if cmd == "T":
+                c = (2 * x - last_control[0], 2 * y - last_control[1]) if last_control and last_control[2] == "Q" else (x, y)
+                end = (args[0], args[1])
+            else:
+                c, end = (args[0], args[1]), (args[2], args[3])
+            n = segment_count([(x, y), c, end], step)
+            for i in range(1, n + 1):
+                t = i / n
+                u = 1 - t
+                points.append((u * u * x + 2 * u * t * c[0] + t * t * end[0], u * u * y + 2 * u * t * c[1] + t * t * end[1]))
+            last_control = (c[0], c[1], "Q")
+        elif cmd == "A":
+            arc = arc_center(x, y, *args)
+            if arc is None:
+                points.append((args[5], args[6]))
+            else:
+                cx, cy, rx, ry, phi, start, delta = arc
+                n = max(1, min(4096, math.ceil(abs(delta) * max(rx, ry) / step)))
+                cos_phi, sin_phi = math.cos(phi), math.sin(phi)
+                for i in range(1, n):
+                    a = start + delta * i / n
+                    px, py = rx * math.cos(a), ry * math.sin(a)
+                    points.append((cx + cos_phi * px - sin_phi * py, cy + sin_phi * px + cos_phi * py))
+                # end exactly where the next command starts
+                points.append((args[5], args[6]))
+            last_control = None
+
+        x, y = points[-1]
+
+    if scale != (1, 1):
+        contours = [[(px * scale[0], py * scale[1]) for px, py in contour] for contour in contours]
+    return contours
+
+
+class PathMeasure:
+    """Measures the first subpath with a length (like SKPathMeasure without forceClosed)."""
+
+    def __init__(self, commands, step=0.5, scale=(1, 1)):
+        self.points = []
+        self.lengths = []
+
+        for contour in FlattenPath(commands, step, scale):
+            lengths = [0.0]
+            for i in range(1, len(contour)):
+                lengths.append(lengths[-1] + math.dist(contour[i - 1], contour[i]))
+            if lengths[-1] > 0:
+                self.points, self.lengths = contour, lengths
+                break
+
+        self.length = self.lengths[-1] if self.lengths else 0.0
+
+    def PositionAndTangent(self, distance):
+        """Returns (x, y, tangent x, tangent y) at a distance along the path (clamped to
+        the path). The tangent is a unit vector in the direction of the path."""
+        if not self.points:
+            return 0.0, 0.0, 1.0, 0.0
+
+        distance = min(max(distance, 0.0), self.length)
+        i = bisect.bisect_right(self.lengths, distance)
+        i = min(max(i, 1), len(self.points) - 1)
+
+        # skip zero length segments for the tangent
+        while i < len(self.points) - 1 and self.lengths[i] == self.lengths[i - 1]:
+            i += 1
+
+        (x1, y1), (x2, y2) = self.points[i - 1], self.points[i]
+        segment = self.lengths[i] - self.lengths[i - 1]
+        if segment <= 0:
+            return x2, y2, 1.0, 0.0
+
+        t = (distance - self.lengths[i - 1]) / segment
+        return x1 + (x2 - x1) * t, y1 + (y2 - y1) * t, (x2 - x1) / segment, (y2 - y1) / segment
+
+
+def SampleByLength(measure, count):
+    """Returns `count` samples (distance, x, y, tangent angle in radians) spread evenly
+    along the measured path, both ends included."""
+    samples = []
+    for i in range(count):
+        distance = measure.length * i / (count - 1) if count > 1 else 0.0
+        x, y, tx, ty = measure.PositionAndTangent(distance)
+        samples.append((distance, x, y, math.atan2(ty, tx)))
+    return samples
+
+
+def lookup(samples, lengths, distance):
+    # what a consumer of an index does: binary search the distance and interpolate
+    i = min(max(bisect.bisect_right(lengths, distance), 1), len(samples) - 1)
+    (d1, x1, y1, _), (d2, x2, y2, _) = samples[i - 1], samples[i]
+    t = (distance - d1) / (d2 - d1) if d2 > d1 else 0.0
+    return x1 + (x2 - x1) * t, y1 + (y2 - y1) * t
+
+
+def MeasureSampleError(measure, samples, probes=4):
+    """Returns the largest distance between the exact position and the one
+    interpolated from the samples, probing `probes` points between every two samples."""
+    if len(samples) < 2 or measure.length == 0:
+        return 0.0
+
+    error = 0.0
+    lengths = [sample[0] for sample in samples]
+    total = (len(samples) - 1) * probes
+    for i in range(total + 1):
+        distance = measure.length * i / total
+        x, y, _, _ = measure.PositionAndTangent(distance)
+        error = max(error, math.dist((x, y), lookup(samples, lengths, distance)))
+    return error
+
+
+INDEX_MAGIC = b"OSGPTH1\0"
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct("<8sII")
+INDEX_PATH = struct.Struct("<If")
+
+
+def PackIndex(paths):
+    """Packs a list of sample lists (one per path) into the .paths.bin format."""
+    data = bytearray(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(paths)))
+    for samples in paths:
+        values = [value for sample in samples for value in sample]
+        data += INDEX_PATH.pack(len(samples), samples[-1][0] if samples else 0.0)
+        data += struct.pack(f"<{len(values)}f", *values)
+    return bytes(data)
+
+
+def UnpackIndex(data):
+    magic, version, count = INDEX_HEADER.unpack_from(data, 0)
+    if magic != INDEX_MAGIC or version != INDEX_VERSION:
+        raise ValueError("Not a path index")
+
+    paths = []
+    offset = INDEX_HEADER.size
+    for _ in range(count):
+        sample_count, _ = INDEX_PATH.unpack_from(data, offset)
+        offset += INDEX_PATH.size
+        values = struct.unpack_from(f"<{sample_count * 4}f", data, offset)
+        offset += sample_count * 16
+        paths.append([values[i:i + 4] for i in range(0, len(values), 4)])
+    return paths
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Tests of the gauge builder, run with `python3 -m unittest` in this directory."""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+from xml.dom import minidom
+from xml.etree.ElementTree import Element, fromstring, tostring
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import main as gauge  # noqa: E402
+
+
+class ManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+        self.layer = {"name": "needle", "width": 100, "height": 100,
+                      "operations": [{"type": "circle", "radius": 10}]}
+
+    def build(self, layer, manifest, options=None):
+        # what main does for a layer: write it if it changed and remember its hash
+        unchanged, layer_hash = gauge.IsLayerUnchanged(layer, self.output_dir, manifest, options)
+        if not unchanged:
+            with open(os.path.join(self.output_dir, f"{layer['name']}.svg"), "w", encoding="utf-8") as f:
+                f.write("<svg/>")
+            manifest["layers"][layer["name"]] = layer_hash
+        return unchanged
+
+    def test_unchanged_layer_is_skipped(self):
+        manifest = {"layers": {}}
+        self.assertFalse(self.build(self.layer, manifest))
+        self.assertTrue(self.build(self.layer, manifest))
+
+    def test_changed_layer_or_options_are_rebuilt(self):
+        manifest = {"layers": {}}
+        self.build(self.layer, manifest)
+        changed = dict(self.layer, operations=[{"type": "circle", "radius": 11}])
+        self.assertFalse(self.build(changed, manifest))
+        self.assertFalse(self.build(changed, manifest, {"minify": True}))
+        self.assertTrue(self.build(changed, manifest, {"minify": True}))
+
+    def test_deleted_output_is_rebuilt(self):
+        manifest = {"layers": {}}
+        self.build(self.layer, manifest)
+        os.remove(os.path.join(self.output_dir, "needle.svg"))
+        self.assertFalse(self.build(self.layer, manifest))
+
+    def test_removed_layers_are_pruned(self):
+        manifest = {"layers": {"needle": "a", "gone": "b"}}
+        gauge.PruneManifest(manifest, [self.layer])
+        self.assertEqual(manifest["layers"], {"needle": "a"})
+
+    def test_changed_builder_module_changes_the_hash(self):
+        # the tool version covers the modules the layers are built with, not only main.py
+        before = gauge.HashLayer(self.layer, 100, 100)
+        changed = os.path.join(self.output_dir, "paths.py")
+        with open(gauge.paths.__file__, encoding="utf-8") as f:
+            source = f.read()
+        with open(changed, "w", encoding="utf-8") as f:
+            f.write(source + "\n# changed\n")
+
+        with mock.patch.object(gauge, "_tool_version", None), mock.patch.object(gauge.paths, "__file__", changed):
+            self.assertNotEqual(gauge.HashLayer(self.layer, 100, 100), before)
+        self.assertEqual(gauge.HashLayer(self.layer, 100, 100), before)
+
+
+class EditorOperationTest(unittest.TestCase):
+    def test_dimensions_like_the_client(self):
+        self.assertEqual(gauge.resolve_dimension(30, 200), 30)
+        self.assertEqual(gauge.resolve_dimension("30", 200), 30)
+        self.assertEqual(gauge.resolve_dimension("25%", 200), 50)
+        # negative is from the far edge
+        self.assertEqual(gauge.resolve_dimension(-10, 200), 190)
+        self.assertEqual(gauge.resolve_dimension("-25%", 200), 150)
+        with self.assertRaises(TypeError):
+            gauge.resolve_dimension(None, 200)
+
+    def build(self, op):
+        contexts = []
+
+        def builder(op, ctx):
+            contexts.append(ctx)
+            return Element("rect")
+
+        node = gauge.BuildEditorOperation(builder, op, 200, 100, {})
+        return node, contexts[0]
+
+    def test_origin_moves_the_center(self):
+        # a 100x40 op whose top left corner is at a quarter of the width, half the height
+        node, ctx = self.build({"position": ["25%", "50%"], "width": "50%", "height": 40, "origin": ["0%", "0%"]})
+        self.assertEqual(node.tag, "rect")
+        self.assertEqual(ctx["center"], (100, 70))
+        self.assertEqual((ctx["opWidth"], ctx["opHeight"]), (100, 40))
+
+    def test_defaults_to_the_whole_layer_centered(self):
+        _, ctx = self.build({})
+        self.assertEqual(ctx["center"], (100, 50))
+        self.assertEqual((ctx["opWidth"], ctx["opHeight"]), (200, 100))
+
+    def test_rotates_around_the_position(self):
+        node, _ = self.build({"position": [50, 50], "origin": ["0%", "0%"], "rotate": 30})
+        self.assertEqual(node.tag, "g")
+        self.assertEqual(node.get("transform"), "rotate(30,50.0,50.0)")
+        self.assertEqual(node[0].tag, "rect")
+
+
+class SerializeSvgTest(unittest.TestCase):
+    SVG = ('<svg width="10" height="10">'
+           '<g transform="rotate(5)"><rect x="1" y="1" width="2" height="2"/><text x="5" font-family="A &amp; &lt;B&gt;">A &amp; &lt;C&gt;</text></g>'
+           '<circle r="1"/>'
+           '</svg>')
+
+    def serialize(self, element, compact=False):
+        parts = []
+        gauge.SerializeSvg(element, parts.append, compact)
+        return "".join(parts)
+
+    def test_same_as_minidom(self):
+        # what the builder wrote before it serialized in one pass
+        root = fromstring(self.SVG)
+        expected = minidom.parseString(tostring(root)).toprettyxml(indent="  ")
+        self.assertEqual(self.serialize(root), expected)
+
+    def test_compact_parses_back_to_the_same_tree(self):
+        root = fromstring(self.SVG)
+        text = self.serialize(root, compact=True)
+        self.assertNotIn("\n", text)
+        self.assertEqual(tostring(fromstring(text)), tostring(root))
+
+
+class PathDataTest(unittest.TestCase):
+    PATH = "m 10 10 l 5 5 l 5 5 h -3 v 2 a 5 5 0 0 1 10 0 c 1 2 3 4 5 6 z M 0.5 0.25 L -0.5 -0.25"
+
+    def assertSameCommands(self, actual, expected, delta=0.0):
+        self.assertEqual([cmd for cmd, _ in actual], [cmd for cmd, _ in expected])
+        for (_, actual_args), (_, expected_args) in zip(actual, expected):
+            for a, b in zip(actual_args, expected_args):
+                self.assertAlmostEqual(a, b, delta=delta)
+
+    def test_round_trip(self):
+        commands = gauge.parse_path(self.PATH)
+        self.assertSameCommands(gauge.parse_path(gauge.format_path(commands)), commands)
+
+    def test_shortest_form(self):
+        commands = gauge.parse_path(self.PATH)
+        self.assertEqual(gauge.format_path(commands), "M10 10l5 5 5 5H17v2a5 5 0 0 1 10 0c1 2 3 4 5 6zM.5.25l-1-.5")
+
+    def test_rounding_errors_do_not_add_up(self):
+        # a hundred relative steps that each round away 0.04
+        commands = gauge.parse_path("M0 0" + "l0.04 0" * 100)
+        formatted = gauge.parse_path(gauge.format_path(commands, precision=1))
+        self.assertSameCommands(formatted, commands, delta=0.05 + 1e-9)
+
+
+if __name__ == "__main__":
+    unittest.main()
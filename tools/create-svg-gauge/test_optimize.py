@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Tests of the SVG optimizer, run with `python3 -m unittest` in this directory."""
+import os
+import sys
+import unittest
+from xml.etree.ElementTree import fromstring
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import optimize  # noqa: E402
+
+
+class RemoveUnusedTest(unittest.TestCase):
+    def test_defs_only_hidden_elements_use_are_removed(self):
+        root = fromstring(
+            '<svg>'
+            '<defs>'
+            '<linearGradient id="hidden"><stop offset="0"/></linearGradient>'
+            '<linearGradient id="shown"><stop offset="0"/></linearGradient>'
+            '</defs>'
+            '<g display="none"><rect fill="url(#hidden)" width="1" height="1"/></g>'
+            '<rect fill="url(#shown)" width="1" height="1"/>'
+            '</svg>')
+        optimize.RemoveUnused(root)
+        self.assertEqual([el.get("id") for el in root.iter("linearGradient")], ["shown"])
+        self.assertEqual(len(root.findall("g")), 0)
+
+    def test_hidden_element_used_by_visible_one_is_kept(self):
+        root = fromstring(
+            '<svg>'
+            '<defs><linearGradient id="gradient"><stop offset="0"/></linearGradient></defs>'
+            '<path id="shape" display="none" fill="url(#gradient)" d="M0 0L1 1"/>'
+            '<use href="#shape"/>'
+            '</svg>')
+        optimize.RemoveUnused(root)
+        self.assertIsNotNone(root.find("path"))
+        self.assertIsNotNone(root.find("defs/linearGradient"))
+
+
+class PathBoundsTest(unittest.TestCase):
+    def test_arc_with_too_small_radii_is_scaled_up(self):
+        # the radii are scaled up to reach the end point, a half circle of radius 50
+        commands = [("M", [0, 0]), ("A", [1, 1, 0, 0, 1, 100, 0])]
+        left, top, right, bottom = optimize.path_bounds(commands, 0)
+        self.assertLessEqual(top, -50)
+        self.assertLessEqual(left, 0)
+        self.assertGreaterEqual(right, 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
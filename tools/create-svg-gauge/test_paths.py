@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Tests of the path measure and arc-length index, run with `python3 -m unittest` in this directory."""
+import math
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import main as gauge  # noqa: E402
+import paths  # noqa: E402
+
+
+def measure(d):
+    return paths.PathMeasure(gauge.parse_path(d))
+
+
+class IndexTest(unittest.TestCase):
+    def test_pack_unpack_round_trip(self):
+        indexes = [
+            paths.SampleByLength(measure("M0 0L100 0"), 3),
+            paths.SampleByLength(measure("M0 50A50 50 0 0 1 50 0"), 5),
+            [],
+        ]
+        unpacked = paths.UnpackIndex(paths.PackIndex(indexes))
+        self.assertEqual(len(unpacked), len(indexes))
+        for samples, expected in zip(unpacked, indexes):
+            self.assertEqual(len(samples), len(expected))
+            for sample, expected_sample in zip(samples, expected):
+                # stored as float32
+                for value, expected_value in zip(sample, expected_sample):
+                    self.assertAlmostEqual(value, expected_value, places=4)
+
+    def test_rejects_other_files(self):
+        with self.assertRaises(ValueError):
+            paths.UnpackIndex(b"OSGTBL1\0" + bytes(8))
+
+
+class SampleErrorTest(unittest.TestCase):
+    def test_straight_line_needs_two_samples(self):
+        line = measure("M0 0L100 0")
+        self.assertAlmostEqual(paths.MeasureSampleError(line, paths.SampleByLength(line, 2)), 0.0)
+
+    def test_error_of_an_arc_shrinks_with_more_samples(self):
+        arc = measure("M0 50A50 50 0 0 1 50 0")
+        errors = [paths.MeasureSampleError(arc, paths.SampleByLength(arc, count)) for count in (2, 3, 17, 65)]
+        self.assertEqual(errors, sorted(errors, reverse=True))
+        # two samples are the chord of a quarter circle, off by its sagitta in the middle
+        self.assertAlmostEqual(errors[0], 50 * (1 - math.cos(math.pi / 4)), places=1)
+        self.assertLess(errors[-1], 0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
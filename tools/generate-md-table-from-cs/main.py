@@ -1,25 +1,35 @@
 #!/usr/bin/env python3
-import sys
-import os
+"""
+Generates markdown tables of the properties of C# classes marked with
+[GenerateMarkdownTable].
 
-if len(sys.argv) < 2:
-    print("Usage: python generate_docs.py <input_dir> <output_file>")
-    sys.exit(1)
+    python3 main.py <input> [<input>...] <output_file>
+    python3 main.py <input>
 
-input_dir = sys.argv[1]
-output_file = sys.argv[2]
+Inputs are directories (searched for .cs files) or .cs files. With a single input the
+output is written next to this script as <input name>.md.
 
-if not os.path.isdir(input_dir):
-    print(f"Input file not found: {input_dir}")
-    sys.exit(1)
+Parsed classes are cached per file in .parse-cache.json next to this script, keyed by
+size and modification time (and the content hash if those changed), so only changed
+files are parsed again. Changed files are parsed in parallel. The output is only
+written if it changed.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 
-if os.path.isdir(output_file):
-    print(f"Output file is a directory: {output_file}")
-    sys.exit(1)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.files import write_if_changed  # noqa: E402
 
-base_name = os.path.splitext(os.path.basename(input_dir))[0]
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.path.join(SCRIPT_DIR, ".parse-cache.json")
+# bump when parse_file changes what it returns so old cache entries are not used
+CACHE_VERSION = 1
 
-def parse_file(path, lines):
+def parse_file(path, lines, verbose=False):
     classes = []
     current_class = None
     class_summary = []
@@ -30,7 +40,11 @@ def parse_file(path, lines):
     recording_value = False
     attr_generate = False
 
-    print(f"Parse file {path}")
+    def debug(message):
+        if verbose:
+            print(message)
+
+    debug(f"Parse file {path}")
 
     def flush_class():
         nonlocal current_class, class_summary, current_properties
@@ -40,7 +54,7 @@ def parse_file(path, lines):
                 "desc": " ".join(class_summary).strip(),
                 "props": current_properties.copy()
             })
-            print(f"Added class {current_class}")
+            debug(f"Added class {current_class}")
             current_class = None
             class_summary = []
             current_properties = []
@@ -82,7 +96,7 @@ def parse_file(path, lines):
                 current_properties = []
                 attr_generate = False
                 prop_summary = []
-                print(f"  Class {current_class} --- {class_summary}")
+                debug(f"  Class {current_class} --- {class_summary}")
             continue
 
         if current_class and line.startswith("public ") and " get; " in line:
@@ -117,7 +131,7 @@ def parse_file(path, lines):
                 final_type = type_override or type_
                 final_default = default_override if default_override is not None else default
 
-                print(f"    {name} --- default_override={default_override} final_default={default}")
+                debug(f"    {name} --- default_override={default_override} final_default={default}")
 
                 current_properties.append((name, final_type, final_default, desc))
                 prop_summary = []
@@ -147,30 +161,133 @@ def generate_markdown(classes):
         lines.append("")
     return "\n".join(lines)
 
-def collect_classes(input_dir):
+def find_cs_files(inputs):
+    files = []
+    for input_path in inputs:
+        if os.path.isfile(input_path):
+            files.append(os.path.abspath(input_path))
+            continue
+        for root, dirs, names in os.walk(input_path):
+            dirs.sort()
+            files += [os.path.abspath(os.path.join(root, name)) for name in sorted(names) if name.lower().endswith(".cs")]
+    return files
+
+
+def load_cache():
+    try:
+        with open(CACHE_PATH, encoding="utf-8") as f:
+            cache = json.load(f)
+        if cache.get("version") == CACHE_VERSION:
+            return cache["files"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}
+
+
+def save_cache(files):
+    content = json.dumps({"version": CACHE_VERSION, "files": files}, sort_keys=True)
+    tmp_path = f"{CACHE_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, CACHE_PATH)
+
+
+def parse_path(path, verbose=False):
+    with open(path, "rb") as f:
+        data = f.read()
+    stat = os.stat(path)
+    classes = parse_file(path, data.decode("utf-8").splitlines(True), verbose)
+    return {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "hash": hashlib.sha256(data).hexdigest(),
+        "classes": classes,
+    }
+
+
+def is_cached(path, entry):
+    """Returns True if the file has not changed since it was cached. Files with a new
+    modification time but the same content get their entry updated."""
+    if entry is None:
+        return False
+    stat = os.stat(path)
+    if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+        return True
+    if entry["size"] != stat.st_size:
+        return False
+    with open(path, "rb") as f:
+        if hashlib.sha256(f.read()).hexdigest() != entry["hash"]:
+            return False
+    entry["mtime"] = stat.st_mtime_ns
+    return True
+
+
+def collect_classes(inputs, workers=None, verbose=False, use_cache=True):
+    """Returns (classes, number of files parsed, number of files)."""
+    files = find_cs_files(inputs)
+    cache = load_cache() if use_cache else {}
+    old_cache = json.dumps(cache, sort_keys=True)
+
+    changed = [path for path in files if not is_cached(path, cache.get(path))]
+
+    if len(changed) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(parse_path, changed, [verbose] * len(changed)))
+    else:
+        results = [parse_path(path, verbose) for path in changed]
+
+    for path, entry in zip(changed, results):
+        cache[path] = entry
+
+    if use_cache:
+        # forget files which no longer exist (keep the ones of other inputs)
+        cache = {path: entry for path, entry in cache.items() if os.path.exists(path)}
+        if json.dumps(cache, sort_keys=True) != old_cache:
+            save_cache(cache)
+
     all_classes = []
+    for path in files:
+        all_classes.extend(cache[path]["classes"])
+
+    return all_classes, len(changed), len(files)
+
 
-    for root, _, files in os.walk(input_dir):
-        for name in files:
-            if not name.lower().endswith(".cs"):
-                continue
+def main():
+    parser = argparse.ArgumentParser(description="Generates markdown tables of C# classes marked with [GenerateMarkdownTable].")
+    parser.add_argument("paths", nargs="+", metavar="path",
+                        help="input directories or .cs files followed by the output file (the output can be left out if there is one input)")
+    parser.add_argument("--workers", type=int, help="number of processes to parse with (default: number of CPUs)")
+    parser.add_argument("--no-cache", action="store_true", help="parse every file again and do not write the cache")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every class and property parsed")
+    args = parser.parse_args()
 
-            path = os.path.join(root, name)
-            with open(path, encoding="utf-8") as f:
-                lines = f.readlines()
+    if len(args.paths) == 1:
+        inputs = args.paths
+        base_name = os.path.splitext(os.path.basename(os.path.normpath(inputs[0])))[0]
+        output_file = os.path.join(SCRIPT_DIR, f"{base_name}.md")
+    else:
+        inputs, output_file = args.paths[:-1], args.paths[-1]
 
-            classes = parse_file(path, lines)
-            if classes:
-                all_classes.extend(classes)
+    for input_path in inputs:
+        if not os.path.exists(input_path):
+            print(f"Input file not found: {input_path}")
+            sys.exit(1)
 
-    return all_classes
+    if os.path.isdir(output_file):
+        print(f"Output file is a directory: {output_file}")
+        sys.exit(1)
 
-classes = collect_classes(input_dir)
+    classes, parsed, total = collect_classes(inputs, args.workers, args.verbose, not args.no_cache)
+
+    if not classes:
+        print("No classes found with [GenerateMarkdownTable].")
+        return
 
-if not classes:
-    print("No classes found with [GenerateMarkdownTable].")
-else:
     markdown = generate_markdown(classes)
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(markdown)
-    print(f"Documentation written to {output_file}")
+    written = write_if_changed(output_file, markdown)
+    print(f"Documentation {'written to' if written else 'unchanged in'} {output_file} "
+          f"({len(classes)} classes, {parsed} of {total} files parsed)")
+
+
+if __name__ == "__main__":
+    main()
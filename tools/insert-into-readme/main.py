@@ -1,27 +1,127 @@
 #!/usr/bin/env python3
 import re
 import argparse
+import json
+import os
+import shlex
+import subprocess
 import sys
 from pathlib import Path
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.files import write_if_changed  # noqa: E402
 
-def update_section(readme_path: Path, section: str, new_content: str):
+MARKER_RE = re.compile(r"<!-- (START|END)_SECTION:([^\s>]+) -->")
+
+
+def replace_sections(text: str, contents: dict, path="README"):
+    """Replaces the content between the markers of every section in `contents` in a
+    single pass over the text. Only the markers of those sections are checked, others
+    are left as they are. Returns (new text, names of the sections found)."""
+    parts = []
+    found = set()
+    position = 0
+    open_section = None
+
+    for match in MARKER_RE.finditer(text):
+        kind, section = match.groups()
+        if section not in contents:
+            continue
+
+        if kind == "START":
+            if open_section is not None:
+                raise ValueError(f"Section '{section}' starts inside section '{open_section[0]}' in {path}")
+            open_section = (section, match)
+            continue
+
+        if open_section is None or open_section[0] != section:
+            raise ValueError(f"Section '{section}' ends without starting in {path}")
+
+        start = open_section[1]
+        open_section = None
+
+        found.add(section)
+        parts.append(text[position:start.start()])
+        parts.append(f"{start.group()}\n\n{contents[section]}\n{match.group()}")
+        position = match.end()
+
+    if open_section is not None:
+        raise ValueError(f"Section '{open_section[0]}' is not ended in {path}")
+
+    parts.append(text[position:])
+    return "".join(parts), found
+
+
+def update_sections(readme_path: Path, contents: dict, check=False):
+    """Returns True if the file changed (or would change with `check`)."""
     text = readme_path.read_text(encoding="utf-8")
+    new_text, found = replace_sections(text, contents, readme_path)
+
+    missing = set(contents) - found
+    if missing:
+        names = ", ".join(f"'{name}'" for name in sorted(missing))
+        raise ValueError(f"Section {names} not found in {readme_path}")
 
-    pattern = rf"(<!-- START_SECTION:{section} -->)(.*?)(<!-- END_SECTION:{section} -->)"
-    match = re.search(pattern, text, flags=re.DOTALL)
-    if not match:
-        raise ValueError(f"Section '{section}' not found in {readme_path}")
+    if check:
+        return new_text != text
+    return write_if_changed(readme_path, new_text)
 
-    start_tag, _, end_tag = match.groups()
-    updated_block = f"{start_tag}\n\n{new_content}\n{end_tag}"
 
-    new_text = text[:match.start()] + updated_block + text[match.end():]
-    readme_path.write_text(new_text, encoding="utf-8")
+def update_section(readme_path: Path, section: str, new_content: str):
+    return update_sections(readme_path, {section: new_content})
+
+
+def run_command(command, cwd):
+    args = shlex.split(command) if isinstance(command, str) else command
+    result = subprocess.run(args, cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise ValueError(f"Command failed ({result.returncode}): {command}\n{result.stderr.strip()}")
+    return result.stdout.rstrip("\n") + "\n"
+
+
+def run_manifest(manifest_path: Path, check=False):
+    """Updates every section of every file in the manifest. Each file is read and
+    written at most once and each command is run once. Returns the changed files."""
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    base_dir = manifest_path.parent
+    command_output = {}
+    changed = []
+
+    for target in manifest.get("files", []):
+        readme = base_dir / target["file"]
+        if not readme.exists():
+            raise ValueError(f"File not found: {readme}")
+
+        contents = {}
+        for section, source in target.get("sections", {}).items():
+            if isinstance(source, str):
+                source = {"input": source}
+
+            if "input" not in source and "command" not in source:
+                raise ValueError(f"Section '{section}' of {readme} needs an 'input' or a 'command'")
+
+            # a command either prints the content or (with an input) writes it to a file
+            if "command" in source:
+                key = json.dumps(source["command"])
+                if key not in command_output:
+                    command_output[key] = run_command(source["command"], base_dir)
+                contents[section] = command_output[key]
+
+            if "input" in source:
+                input_path = base_dir / source["input"]
+                if not input_path.exists():
+                    raise ValueError(f"Input file not found: {input_path}")
+                contents[section] = input_path.read_text(encoding="utf-8")
+
+        if update_sections(readme, contents, check):
+            changed.append(readme)
+
+    return changed
 
 
 def print_usage():
     print("Usage: update_section.py --section <name> --input <file> [--file README.md]")
+    print("       update_section.py --manifest <sections.json> [--check]")
 
 
 def main():
@@ -29,6 +129,8 @@ def main():
     parser.add_argument("--file", default="README.md")
     parser.add_argument("--section")
     parser.add_argument("--input")
+    parser.add_argument("--manifest")
+    parser.add_argument("--check", action="store_true")
 
     if len(sys.argv) == 1:
         print_usage()
@@ -36,6 +138,26 @@ def main():
 
     args = parser.parse_args()
 
+    if args.manifest:
+        manifest_path = Path(args.manifest)
+        if not manifest_path.exists():
+            print(f"Error: Manifest not found: {manifest_path}")
+            sys.exit(1)
+
+        try:
+            changed = run_manifest(manifest_path, args.check)
+        except (ValueError, KeyError, OSError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+        for path in changed:
+            print(f"{'Out of date' if args.check else 'Updated'}: {path}")
+        if not changed:
+            print("Everything is up to date")
+        if args.check and changed:
+            sys.exit(1)
+        return
+
     if not args.section or not args.input:
         print_usage()
         sys.exit(1)
@@ -54,8 +176,10 @@ def main():
     new_content = input_path.read_text(encoding="utf-8")
 
     try:
-        update_section(readme, args.section, new_content)
-        print(f"Updated '{args.section}' in {readme}")
+        if update_section(readme, args.section, new_content):
+            print(f"Updated '{args.section}' in {readme}")
+        else:
+            print(f"'{args.section}' in {readme} is up to date")
     except Exception as e:
         print(f"Error: {e}")
         sys.exit(1)
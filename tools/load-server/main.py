@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+A stand-in for the server that speaks the same newline delimited JSON protocol
+(see server/src/server/Server.cs and Messages.cs) and sends generated var values at a
+fixed rate so client throughput can be tested without a simulator.
+
+    python3 tools/load-server/main.py --rate 60 --clients 20 --vars 50
+"""
+import argparse
+import asyncio
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.protocol import INIT, REINIT, VAR, DecodeMessage, EncodeClientMessage, EncodeMessage, format_bytes  # noqa: E402
+
+
+def get_var_value(name, unit, t):
+    # a smooth wave per var so gauges visibly move, phase shifted by name
+    phase = (sum(name.encode("utf-8")) % 360) * math.pi / 180
+    return round(math.sin(t * 0.5 + phase) * 100, 4)
+
+
+class Client:
+    def __init__(self, writer, name):
+        self.writer = writer
+        self.name = name
+        self.vars = []
+        self.sent_messages = 0
+        self.sent_bytes = 0
+        self.max_backlog = 0
+
+    def backlog(self):
+        return self.writer.transport.get_write_buffer_size()
+
+    def send(self, data):
+        # like Server.Broadcast this never waits for the client, slow clients back up
+        self.writer.write(data)
+        self.sent_messages += 1
+        self.sent_bytes += len(data)
+
+
+class LoadServer:
+    def __init__(self, vehicle_name, rate, max_backlog, timestamps=False):
+        self.vehicle_name = vehicle_name
+        self.timestamps = timestamps
+        self.period = 1 / rate
+        self.max_backlog = max_backlog
+        self.clients = {}
+        self.dropped = []
+        self.disconnected = 0
+        self.late_ticks = 0
+        self.ticks = 0
+        self.connection_count = 0
+        # what was sent to clients that are gone
+        self.removed_messages = 0
+        self.removed_bytes = 0
+
+    async def HandleClient(self, reader, writer):
+        self.connection_count += 1
+        peer = writer.get_extra_info("peername")
+        client = Client(writer, f"{peer[0]}:{peer[1]}" if peer else f"client-{self.connection_count}")
+        self.clients[client.name] = client
+        print(f"Client {client.name} connected")
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    msg_type, payload = DecodeMessage(line)
+                except ValueError as e:
+                    print(f"Client {client.name} sent invalid JSON: {e}")
+                    continue
+                if msg_type == INIT:
+                    self.InitClient(client, payload or {})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if self.Remove(client):
+                self.disconnected += 1
+                print(f"Client {client.name} disconnected")
+            writer.close()
+
+    def InitClient(self, client, payload):
+        # same as ServerApp: a client with the wrong vehicle has to start again
+        if payload.get("VehicleName") != self.vehicle_name:
+            print(f"Client {client.name} has vehicle '{payload.get('VehicleName')}' but it is '{self.vehicle_name}' - telling them to re-init")
+            client.send(EncodeMessage(REINIT, {"VehicleName": self.vehicle_name, "Vars": [], "Events": []}))
+            return
+
+        client.send(EncodeMessage(INIT, {"VehicleName": self.vehicle_name, "Vars": [], "Events": []}))
+        client.vars = [(var["Name"], var["Unit"]) for var in payload.get("Vars") or []]
+        print(f"Client {client.name} subscribed to {len(client.vars)} vars")
+
+    def Remove(self, client):
+        if self.clients.pop(client.name, None) is None:
+            return False
+        self.removed_messages += client.sent_messages
+        self.removed_bytes += client.sent_bytes
+        return True
+
+    def Drop(self, client, backlog):
+        print(f"Dropping client {client.name}: {format_bytes(backlog)} waiting to be sent")
+        self.Remove(client)
+        self.dropped.append(client.name)
+        client.writer.transport.abort()
+
+    def Tick(self, t):
+        # each distinct var is serialized once per tick no matter how many clients want it
+        encoded = {}
+        sent_at = time.time()
+
+        for client in list(self.clients.values()):
+            backlog = client.backlog()
+            client.max_backlog = max(client.max_backlog, backlog)
+            if self.max_backlog and backlog > self.max_backlog:
+                self.Drop(client, backlog)
+                continue
+
+            for var in client.vars:
+                data = encoded.get(var)
+                if data is None:
+                    name, unit = var
+                    payload = {"Name": name, "Unit": unit, "Value": get_var_value(name, unit, t)}
+                    if self.timestamps:
+                        # unknown properties are ignored by the client
+                        payload["Timestamp"] = sent_at
+                    data = encoded[var] = EncodeMessage(VAR, payload)
+                client.send(data)
+
+    async def Run(self, duration=None):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        while duration is None or loop.time() - started < duration:
+            self.Tick(loop.time() - started)
+            self.ticks += 1
+
+            # schedule against the start time so slow ticks do not add up into drift
+            next_tick = started + self.ticks * self.period
+            delay = next_tick - loop.time()
+            if delay < 0:
+                self.late_ticks += 1
+                delay = 0
+            await asyncio.sleep(delay)
+
+    def Totals(self):
+        messages = self.removed_messages + sum(client.sent_messages for client in self.clients.values())
+        sent = self.removed_bytes + sum(client.sent_bytes for client in self.clients.values())
+        return messages, sent
+
+
+async def RunSimulatedClient(host, port, vehicle_name, var_count, read_delay, stats):
+    """A client which subscribes to var_count vars and counts what it receives.
+    With a read_delay it only reads once every read_delay seconds like a slow client."""
+    reader, writer = await asyncio.open_connection(host, port, limit=1 << 20)
+    writer.write(EncodeClientMessage("init", {
+        "VehicleName": vehicle_name,
+        "Vars": [{"Name": f"LOAD VAR {i}", "Unit": "number", "Debug": None} for i in range(var_count)],
+        "Events": []
+    }))
+    await writer.drain()
+
+    try:
+        while True:
+            if read_delay:
+                await asyncio.sleep(read_delay)
+            line = await reader.readline()
+            if not line:
+                break
+            stats["messages"] += 1
+            stats["bytes"] += len(line)
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+def PrintReport(server, elapsed, interval, previous, received):
+    messages, sent = server.Totals()
+    interval_messages = messages - previous[0]
+    interval_bytes = sent - previous[1]
+    backlogs = sorted(((client.backlog(), client.name) for client in server.clients.values()), reverse=True)
+    worst = ", ".join(f"{name} {format_bytes(backlog)}" for backlog, name in backlogs[:3] if backlog) or "none"
+
+    print(f"[{elapsed:6.1f}s] clients {len(server.clients)} | sent {interval_messages / interval:,.0f} msg/s "
+          f"{format_bytes(interval_bytes / interval)}/s | received {received['messages']:,} | "
+          f"late ticks {server.late_ticks} | dropped {len(server.dropped)} | worst backlog: {worst}")
+
+    return messages, sent
+
+
+def PrintSummary(server, elapsed, received):
+    messages, sent = server.Totals()
+    print(f"Sent {messages:,} messages ({format_bytes(sent)}) in {elapsed:.1f}s: "
+          f"{messages / elapsed:,.0f} msg/s, {format_bytes(sent / elapsed)}/s")
+    print(f"Ticks {server.ticks} ({server.late_ticks} late), dropped connections {len(server.dropped)}, "
+          f"disconnected {server.disconnected}")
+    if received["messages"]:
+        print(f"Simulated clients received {received['messages']:,} messages ({format_bytes(received['bytes'])})")
+
+    if server.clients:
+        print(f"{'client':<24}{'vars':>6}{'messages':>12}{'sent':>12}{'backlog':>12}{'max backlog':>14}")
+        for client in server.clients.values():
+            print(f"{client.name:<24}{len(client.vars):>6}{client.sent_messages:>12,}{format_bytes(client.sent_bytes):>12}"
+                  f"{format_bytes(client.backlog()):>12}{format_bytes(client.max_backlog):>14}")
+
+    for name in server.dropped:
+        print(f"Dropped: {name}")
+
+
+async def Main(args):
+    server = LoadServer(args.vehicle, args.rate, args.max_backlog * 1024, args.timestamps)
+
+    listener = await asyncio.start_server(server.HandleClient, args.ip, args.port)
+    print(f"Listening on {args.ip}:{args.port}, sending at {args.rate:g}Hz")
+
+    received = {"messages": 0, "bytes": 0}
+    host = "127.0.0.1" if args.ip in ("0.0.0.0", "") else args.ip
+    simulated = [
+        asyncio.create_task(RunSimulatedClient(host, args.port, args.vehicle, args.vars,
+                                               args.slow_read_delay if i < args.slow_clients else 0, received))
+        for i in range(args.clients)
+    ]
+
+    started = time.perf_counter()
+    run = asyncio.create_task(server.Run(args.duration))
+    previous = (0, 0)
+
+    try:
+        while not run.done():
+            await asyncio.wait([run], timeout=args.report_interval)
+            if not run.done():
+                previous = PrintReport(server, time.perf_counter() - started, args.report_interval, previous, received)
+    finally:
+        elapsed = time.perf_counter() - started
+        run.cancel()
+        PrintSummary(server, elapsed, received)
+
+        for task in simulated:
+            task.cancel()
+        await asyncio.gather(*simulated, return_exceptions=True)
+
+        listener.close()
+        for client in list(server.clients.values()):
+            client.writer.transport.abort()
+        # let the client handlers see the connections close
+        await asyncio.sleep(0.1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in server which sends generated var values to clients.")
+    parser.add_argument("--ip", default="0.0.0.0", help="address to listen on (default: 0.0.0.0)")
+    parser.add_argument("--port", type=int, default=1234, help="port to listen on (default: 1234)")
+    parser.add_argument("--vehicle", default="Cessna Skyhawk",
+                        help="vehicle name, clients with another vehicle are told to re-init (default: Cessna Skyhawk)")
+    parser.add_argument("--rate", type=float, default=60, help="how many times a second every var is sent (default: 60)")
+    parser.add_argument("--clients", type=int, default=0, help="number of simulated clients to start (default: 0)")
+    parser.add_argument("--vars", type=int, default=50, help="number of vars each simulated client subscribes to (default: 50)")
+    parser.add_argument("--slow-clients", type=int, default=0, help="how many of the simulated clients read slowly")
+    parser.add_argument("--slow-read-delay", type=float, default=0.05,
+                        help="seconds a slow client waits before reading each message (default: 0.05)")
+    parser.add_argument("--max-backlog", type=int, default=1024,
+                        help="drop clients with more than this many KiB waiting to be sent, 0 to never drop (default: 1024)")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    parser.add_argument("--timestamps", action="store_true",
+                        help="add the unix time each var was sent as Timestamp so clients can measure latency")
+    parser.add_argument("--report-interval", type=float, default=1, help="seconds between reports (default: 1)")
+    args = parser.parse_args()
+
+    if args.rate <= 0:
+        print("Error: --rate must be above 0")
+        sys.exit(1)
+
+    try:
+        asyncio.run(Main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
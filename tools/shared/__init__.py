@@ -0,0 +1,2 @@
+"""Code shared by the Python tools. A tool puts the tools directory on sys.path and
+imports what it needs from here, eg. `from shared.protocol import EncodeMessage`."""
@@ -0,0 +1,126 @@
+"""
+Reads the client's config and gauge JSON files, which may have comments and trailing
+commas like the client allows, and resolves their values the way the client does.
+"""
+import json
+import os
+import re
+
+
+def strip_json_comments(text):
+    # the client reads its JSON with comments and trailing commas allowed
+    out = []
+    i = 0
+    in_string = False
+
+    while i < len(text):
+        c = text[i]
+        if in_string:
+            out.append(c)
+            if c == "\\":
+                out.append(text[i + 1:i + 2])
+                i += 1
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+            out.append(c)
+        elif text.startswith("//", i):
+            end = text.find("\n", i)
+            i = len(text) if end == -1 else end
+            continue
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = len(text) if end == -1 else end + 2
+            continue
+        else:
+            out.append(c)
+        i += 1
+
+    return re.sub(r",(\s*[}\]])", r"\1", "".join(out))
+
+
+def LoadJsonWithComments(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.loads(strip_json_comments(f.read()))
+
+
+def get_key(obj, name, default=None):
+    # the client reads its JSON case-insensitively
+    for key, value in obj.items():
+        if key.lower() == name.lower():
+            return value
+    return default
+
+
+def resolve_value(value, total):
+    # FlexibleVector2/FlexibleDimension: pixels or a percent, negative counts from the far edge
+    if isinstance(value, str):
+        value = value.strip()
+        if value.endswith("%"):
+            try:
+                percent = float(value[:-1]) / 100
+            except ValueError:
+                return 0
+            return percent * total if percent >= 0 else total + percent * total
+        try:
+            value = float(value)
+        except ValueError:
+            return 0
+    if isinstance(value, (int, float)):
+        return value if value >= 0 else total + value
+    return 0
+
+
+def resolve_vector(value, width, height, default=("50%", "50%")):
+    x, y = value if isinstance(value, list) and len(value) == 2 else default
+    return resolve_value(x, width), resolve_value(y, height)
+
+
+def resolve_gauge_path(gauge_path, config_dir):
+    # gauge paths are relative to the client's directory, usually the one with the config
+    for base in (config_dir, os.getcwd()):
+        candidate = os.path.join(base, gauge_path)
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+
+def parse_var_spec(spec, default_unit="number"):
+    """Reads a var given on the command line as NAME or NAME:unit into (name, unit).
+    Names can have colons themselves (indexed vars such as GENERAL ENG RPM:1) so the
+    unit is what follows the last one, unless that is an index."""
+    name, _, unit = spec.rpartition(":")
+    if not name or unit.isdigit():
+        return spec, default_unit
+    return name, unit
+
+
+def FindVars(path):
+    """Every var ([name, unit]) used by the config or gauge JSON files at path."""
+    if os.path.isdir(path):
+        paths = [os.path.join(root, name) for root, _, names in os.walk(path) for name in sorted(names) if name.endswith(".json")]
+    else:
+        paths = [path]
+
+    found = []
+
+    def visit(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key.lower() == "var" and isinstance(value, list) and len(value) >= 2 and all(isinstance(v, str) for v in value[:2]):
+                    found.append((value[0], value[1]))
+                else:
+                    visit(value)
+        elif isinstance(node, list):
+            for item in node:
+                visit(item)
+
+    for file_path in sorted(paths):
+        try:
+            visit(LoadJsonWithComments(file_path))
+        except ValueError as e:
+            print(f"Skipping {file_path}: {e}")
+
+    return list(dict.fromkeys(found))
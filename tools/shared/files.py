@@ -0,0 +1,33 @@
+"""
+Writing output files so that a running client never reads one half-written.
+"""
+import contextlib
+import os
+
+
+@contextlib.contextmanager
+def open_atomic(path, mode="w"):
+    """Like open(path, mode) but writes to a temporary file which replaces the target
+    once complete. The temporary file is removed if writing fails."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, mode, encoding=None if "b" in mode else "utf-8") as f:
+            yield f
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_if_changed(path, content):
+    """Writes content (bytes or str, which is written as UTF-8) unless the file has it
+    already, so its modification time (and anything built from it) stays put. Returns
+    True if the file was written."""
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    with open_atomic(path, "wb") as f:
+        f.write(data)
+    return True
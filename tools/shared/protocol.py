@@ -0,0 +1,42 @@
+"""
+The newline delimited JSON protocol of the server (see server/src/server/Server.cs and
+Messages.cs), shared by the tools which stand in for it or talk to it.
+"""
+import json
+
+# MessageType in Messages.cs, the server sends them as numbers
+INIT = 0
+REINIT = 1
+VAR = 2
+EVENT = 3
+UNKNOWN = 4
+
+MESSAGE_TYPES = {"init": INIT, "reinit": REINIT, "var": VAR, "event": EVENT, "unknown": UNKNOWN}
+
+
+def EncodeMessage(type, payload):
+    # same output as JsonSerializer.Serialize(ServerMessage) (PascalCase, compact)
+    return (json.dumps({"Type": type, "Payload": payload}, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def EncodeClientMessage(type, payload):
+    # what the client sends (ClientMessage with a camelCase type)
+    return (json.dumps({"Type": type, "Payload": payload}) + "\n").encode("utf-8")
+
+
+def DecodeMessage(line):
+    """Returns (type, payload). Clients send the type as a camelCase string which the
+    server reads case-insensitively, the server sends numbers."""
+    msg = json.loads(line)
+    msg_type = msg.get("Type")
+    if isinstance(msg_type, str):
+        msg_type = MESSAGE_TYPES.get(msg_type.lower(), UNKNOWN)
+    return msg_type, msg.get("Payload")
+
+
+def format_bytes(count):
+    for unit in ("B", "KiB", "MiB"):
+        if count < 1024:
+            return f"{count:.1f}{unit}"
+        count /= 1024
+    return f"{count:.1f}GiB"
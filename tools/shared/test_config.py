@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""Tests of reading configs and var specs, run with `python3 -m unittest` in tools."""
+import unittest
+
+from shared.config import parse_var_spec
+
+
+class ParseVarSpecTest(unittest.TestCase):
+    def test_name_and_unit(self):
+        self.assertEqual(parse_var_spec("PLANE ALTITUDE:feet"), ("PLANE ALTITUDE", "feet"))
+
+    def test_indexed_var_keeps_its_index(self):
+        self.assertEqual(parse_var_spec("GENERAL ENG RPM:1:rpm"), ("GENERAL ENG RPM:1", "rpm"))
+
+    def test_default_unit(self):
+        self.assertEqual(parse_var_spec("PLANE ALTITUDE"), ("PLANE ALTITUDE", "number"))
+        self.assertEqual(parse_var_spec("GENERAL ENG RPM:1"), ("GENERAL ENG RPM:1", "number"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""Tests of the atomic file writing, run with `python3 -m unittest` in tools."""
+import os
+import tempfile
+import unittest
+
+from shared.files import open_atomic, write_if_changed
+
+
+class WriteIfChangedTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "out.txt")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_writes_only_changed_content(self):
+        self.assertTrue(write_if_changed(self.path, "a"))
+        self.assertFalse(write_if_changed(self.path, b"a"))
+        self.assertTrue(write_if_changed(self.path, "b"))
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "b")
+
+    def test_failed_write_keeps_target_and_removes_temporary_file(self):
+        write_if_changed(self.path, "old")
+        with self.assertRaises(RuntimeError):
+            with open_atomic(self.path) as f:
+                f.write("new")
+                raise RuntimeError("disk full")
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "old")
+        self.assertEqual(os.listdir(self.dir.name), ["out.txt"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Connects lots of headless clients to a server (or tools/load-server or
+tools/var-recorder replay) and measures what they receive: end-to-end latency,
+inter-arrival time and jitter of every var, and throughput. Runs once per subscriber
+count and writes percentile histograms as JSON.
+
+    python3 tools/soak-client/main.py --subscribers 1,10,50 --vars 50 --output soak.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.config import FindVars, parse_var_spec  # noqa: E402
+from shared.protocol import REINIT, VAR, EncodeClientMessage  # noqa: E402
+
+PERCENTILES = [50, 75, 90, 95, 99, 99.9, 99.99, 100]
+
+
+class Histogram:
+    """An HDR style histogram of integer values (microseconds here): values that share
+    their top `significant_bits` bits share a bucket so the relative error is bounded
+    no matter how big the value is, and histograms from different processes can be
+    added together."""
+
+    def __init__(self, significant_digits=3):
+        self.significant_digits = significant_digits
+        # enough bits to tell apart 10^digits values
+        self.significant_bits = math.ceil(math.log2(2 * 10 ** significant_digits))
+        self.counts = {}
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self.sum = 0
+        self.sum_squares = 0
+
+    def _bucket(self, value):
+        shift = max(0, value.bit_length() - self.significant_bits)
+        return (value >> shift) << shift, shift
+
+    def Record(self, value):
+        value = max(0, int(value))
+        low, _ = self._bucket(value)
+        self.counts[low] = self.counts.get(low, 0) + 1
+        self.total += 1
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+        self.sum += value
+        self.sum_squares += value * value
+
+    def Merge(self, other):
+        for low, count in other.counts.items():
+            self.counts[low] = self.counts.get(low, 0) + count
+        if other.total:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self.total += other.total
+        self.sum += other.sum
+        self.sum_squares += other.sum_squares
+
+    def highest_equivalent(self, low):
+        _, shift = self._bucket(low)
+        return min(low + (1 << shift) - 1, self.max)
+
+    def Percentiles(self, percentiles=PERCENTILES):
+        result = {}
+        if not self.total:
+            return result
+
+        lows = sorted(self.counts)
+        cumulative = 0
+        i = 0
+        for percentile in percentiles:
+            target = max(1, math.ceil(percentile / 100 * self.total))
+            while cumulative < target:
+                cumulative += self.counts[lows[i]]
+                i += 1
+            result[f"{percentile:g}"] = self.highest_equivalent(lows[i - 1])
+        return result
+
+    def ToDict(self, unit="us"):
+        mean = self.sum / self.total if self.total else 0
+        variance = self.sum_squares / self.total - mean * mean if self.total else 0
+        return {
+            "unit": unit,
+            "significantDigits": self.significant_digits,
+            "count": self.total,
+            "min": self.min or 0,
+            "max": self.max,
+            "mean": round(mean, 1),
+            "stddev": round(math.sqrt(max(0, variance)), 1),
+            "percentiles": self.Percentiles(),
+            # [lowest value in the bucket, count]
+            "buckets": sorted([low, count] for low, count in self.counts.items())
+        }
+
+    def State(self):
+        return self.counts, self.min, self.max, self.sum, self.sum_squares, self.total
+
+    @classmethod
+    def FromState(cls, significant_digits, state):
+        histogram = cls(significant_digits)
+        histogram.counts, histogram.min, histogram.max, histogram.sum, histogram.sum_squares, histogram.total = state
+        return histogram
+
+
+def EncodeInit(vehicle_name, variables):
+    # what ClientHandler.SendInitMessage sends
+    return EncodeClientMessage("init", {
+        "VehicleName": vehicle_name,
+        "Vars": [{"Name": name, "Unit": unit, "Debug": None} for name, unit in variables],
+        "Events": []
+    })
+
+
+async def RunSubscriber(host, port, vehicle_name, variables, measure_from, stop_at, stats):
+    try:
+        reader, writer = await asyncio.open_connection(host, port, limit=1 << 20)
+    except OSError:
+        stats["connectFailures"] += 1
+        return
+
+    writer.write(EncodeInit(vehicle_name, variables))
+    last_arrival = {}
+    last_interval = {}
+    latency, inter_arrival, jitter = stats["latency"], stats["interArrival"], stats["jitter"]
+
+    try:
+        while True:
+            timeout = stop_at - time.time()
+            if timeout <= 0:
+                break
+            try:
+                line = await asyncio.wait_for(reader.readline(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if not line:
+                stats["disconnects"] += 1
+                break
+
+            received = time.time()
+            msg = json.loads(line)
+            msg_type = msg.get("Type")
+
+            if msg_type == REINIT:
+                # like the client, start again with the vehicle the server told us
+                writer.write(EncodeInit(msg["Payload"].get("VehicleName"), variables))
+                continue
+            if msg_type != VAR:
+                continue
+
+            payload = msg["Payload"]
+            key = payload["Name"], payload["Unit"]
+            previous = last_arrival.get(key)
+            last_arrival[key] = received
+
+            if received < measure_from:
+                continue
+
+            stats["messages"] += 1
+            stats["bytes"] += len(line)
+
+            sent_at = payload.get("Timestamp")
+            if sent_at is not None:
+                latency.Record((received - sent_at) * 1_000_000)
+
+            if previous is not None:
+                interval = (received - previous) * 1_000_000
+                inter_arrival.Record(interval)
+                # how much the gap changed since the last one (like RFC 3550 jitter)
+                if key in last_interval:
+                    jitter.Record(abs(interval - last_interval[key]))
+                last_interval[key] = interval
+    except ConnectionError:
+        stats["disconnects"] += 1
+    finally:
+        writer.close()
+
+
+def RunWorker(host, port, vehicle_name, variables, subscribers, measure_from, stop_at, significant_digits):
+    """Runs `subscribers` clients in this process. Returns their stats with the
+    histograms as plain state so they can be sent back to the parent process."""
+    stats = {
+        "messages": 0,
+        "bytes": 0,
+        "connectFailures": 0,
+        "disconnects": 0,
+        "latency": Histogram(significant_digits),
+        "interArrival": Histogram(significant_digits),
+        "jitter": Histogram(significant_digits)
+    }
+
+    async def run():
+        await asyncio.gather(*[
+            RunSubscriber(host, port, vehicle_name, variables, measure_from, stop_at, stats)
+            for _ in range(subscribers)
+        ])
+
+    asyncio.run(run())
+
+    for key in ("latency", "interArrival", "jitter"):
+        stats[key] = stats[key].State()
+    return stats
+
+
+def RunStep(args, variables, subscribers):
+    workers = max(1, min(args.workers, subscribers))
+    shares = [subscribers // workers + (1 if i < subscribers % workers else 0) for i in range(workers)]
+
+    # every worker measures the same window so the totals add up
+    started = time.time()
+    measure_from = started + args.warmup
+    stop_at = measure_from + args.duration
+
+    result = {
+        "subscribers": subscribers,
+        "duration": args.duration,
+        "messages": 0,
+        "bytes": 0,
+        "connectFailures": 0,
+        "disconnects": 0
+    }
+    histograms = {key: Histogram(args.significant_digits) for key in ("latency", "interArrival", "jitter")}
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(RunWorker, args.host, args.port, args.vehicle, variables, share,
+                            measure_from, stop_at, args.significant_digits)
+            for share in shares
+        ]
+        for future in futures:
+            stats = future.result()
+            for key in ("messages", "bytes", "connectFailures", "disconnects"):
+                result[key] += stats[key]
+            for key, histogram in histograms.items():
+                histogram.Merge(Histogram.FromState(args.significant_digits, stats[key]))
+
+    result["messagesPerSecond"] = round(result["messages"] / args.duration, 1)
+    result["bytesPerSecond"] = round(result["bytes"] / args.duration, 1)
+    result["messagesPerSecondPerSubscriber"] = round(result["messages"] / args.duration / subscribers, 1)
+    for key, histogram in histograms.items():
+        result[key] = histogram.ToDict()
+
+    return result
+
+
+def format_us(value):
+    if value is None:
+        return "-"
+    return f"{value / 1000:.2f}ms" if value >= 1000 else f"{value}us"
+
+
+def PrintStep(result):
+    latency = result["latency"]["percentiles"]
+    jitter = result["jitter"]["percentiles"]
+    print(f"{result['subscribers']:>11}{result['messagesPerSecond']:>12,.0f}{result['bytesPerSecond'] / 1024:>10,.0f}"
+          f"{format_us(latency.get('50')):>10}{format_us(latency.get('99')):>10}{format_us(latency.get('100')):>10}"
+          f"{format_us(jitter.get('50')):>10}{format_us(jitter.get('99')):>10}"
+          f"{result['connectFailures'] + result['disconnects']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures latency, jitter and throughput of the var stream with many clients.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--vehicle", default="Cessna Skyhawk",
+                        help="vehicle name to init with, the server tells us the right one if it is wrong")
+    parser.add_argument("--vars", type=int, default=50, help="subscribe to this many generated vars (LOAD VAR 0...) (default: 50)")
+    parser.add_argument("--var", action="append", default=[], help="subscribe to this var (NAME:unit, eg. GENERAL ENG RPM:1:rpm) instead, can be repeated")
+    parser.add_argument("--vars-from", action="append", default=[],
+                        help="subscribe to every var used by the JSON config/gauge files in this file or directory instead")
+    parser.add_argument("--subscribers", default="1,5,10,25,50",
+                        help="comma separated numbers of clients to measure with, one run each (default: 1,5,10,25,50)")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to measure each run (default: 10)")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds to connect and settle before measuring (default: 2)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processes to spread the clients over (default: number of CPUs)")
+    parser.add_argument("--significant-digits", type=int, default=3, help="histogram precision (default: 3)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    variables = [parse_var_spec(var) for var in args.var]
+    for path in args.vars_from:
+        variables += FindVars(path)
+    if not variables:
+        variables = [(f"LOAD VAR {i}", "number") for i in range(args.vars)]
+    variables = list(dict.fromkeys(variables))
+
+    try:
+        steps = [int(count) for count in args.subscribers.split(",")]
+    except ValueError:
+        steps = None
+    if not steps or min(steps) < 1:
+        print(f"Error: Invalid --subscribers: {args.subscribers}, expected comma separated numbers of at least 1")
+        sys.exit(1)
+
+    print(f"Soaking {args.host}:{args.port} with {len(variables)} vars, {args.duration:g}s per run")
+    print(f"{'subscribers':>11}{'msg/s':>12}{'KiB/s':>10}{'lat p50':>10}{'lat p99':>10}{'lat max':>10}"
+          f"{'jit p50':>10}{'jit p99':>10}{'errors':>8}")
+
+    results = []
+    for subscribers in steps:
+        result = RunStep(args, variables, subscribers)
+        results.append(result)
+        PrintStep(result)
+
+    if results and not results[0]["latency"]["count"]:
+        print("No latency measured: the server does not send timestamps (see tools/load-server --timestamps)")
+
+    if args.output:
+        report = {
+            "host": f"{args.host}:{args.port}",
+            "vars": len(variables),
+            "warmup": args.warmup,
+            "startedAt": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "steps": results
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
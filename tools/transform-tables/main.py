@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+"""
+Precomputes lookup tables from var values to the transforms of animated gauge layers
+so a client can replace MapSimVarValueToOffset and GetPathPosition with a table read.
+
+    python3 tools/transform-tables/main.py gauges/PA-44/rpm/gauge.json
+    python3 tools/transform-tables/main.py client/src/default-client.json --steps 4096
+
+For every gauge <name>.tables.bin (the tables) and <name>.tables.json (the index) are
+written next to it, or with -o into one directory named after the gauge's "name". A layer whose transforms all use the same var gets one table of
+final layer matrices. Other layers get a table per transform (an angle, an offset or
+a path position) that is combined with the layer's static values like GaugeRenderer
+does.
+
+Layout of the tables file (little endian):
+
+    header  8s   magic "OSGTBL1\\0"
+            u32  version (1)
+            u32  table count
+    tables  float32 values, each table starting at a multiple of 16 bytes
+"""
+import argparse
+import importlib.util
+import json
+import math
+import os
+import re
+import struct
+import sys
+from xml.etree.ElementTree import ParseError, parse
+
+SVG_GAUGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "create-svg-gauge")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, SVG_GAUGE_DIR)
+from shared.config import LoadJsonWithComments, get_key, resolve_gauge_path, resolve_value, resolve_vector  # noqa: E402
+from shared.files import write_if_changed  # noqa: E402
+import paths  # noqa: E402
+
+# create-svg-gauge's main.py has the same module name as this script
+_spec = importlib.util.spec_from_file_location("create_svg_gauge", os.path.join(SVG_GAUGE_DIR, "main.py"))
+gauge_svg = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(gauge_svg)
+
+MAGIC = b"OSGTBL1\0"
+VERSION = 1
+HEADER = struct.Struct("<8sII")
+ALIGNMENT = 16
+TRANSFORMS = ("rotate", "translateX", "translateY", "path")
+MAX_STEPS = 65536
+
+# GaugeHelper.MapSimVarValueToOffset
+UNIT_DEFAULTS = {
+    "feet": (0, 10000),
+    "knots": (0, 200),
+    "rpm": (0, 3000),
+    "fpm": (-2000, 2000),
+    "position": (-127, 127),
+    "radians": (-math.pi, math.pi),
+}
+
+
+def get_var(config):
+    # SimVarConfig: [name, unit]
+    var = get_key(config, "var")
+    if isinstance(var, dict):
+        return [get_key(var, "name"), get_key(var, "unit")]
+    return list(var)
+
+
+def MapValue(config, value, wrap=False):
+    """Port of GaugeHelper.MapSimVarValueToOffset."""
+    multiply = get_key(config, "multiply")
+    minimum = get_key(config, "min")
+    maximum = get_key(config, "max")
+    start = get_key(config, "from")
+    end = get_key(config, "to")
+    unit = get_var(config)[1]
+
+    if multiply is not None:
+        value *= multiply
+
+    if get_key(config, "invert") is True and maximum is not None and minimum is not None:
+        value = maximum - (value - minimum)
+
+    calibration = get_key(config, "calibration") or []
+    if calibration:
+        points = [(get_key(point, "value"), get_key(point, "degrees")) for point in calibration]
+        if value <= points[0][0]:
+            return points[0][1]
+        if value >= points[-1][0]:
+            return points[-1][1]
+        for (a_value, a_degrees), (b_value, b_degrees) in zip(points, points[1:]):
+            if a_value <= value <= b_value:
+                return a_degrees + (value - a_value) / (b_value - a_value) * (b_degrees - a_degrees)
+
+    if minimum is None and maximum is None and start is None and end is None:
+        return value
+
+    if unit == "radians" and value > math.pi:
+        value -= 2 * math.pi
+
+    default_min, default_max = UNIT_DEFAULTS.get(unit, (0, 1))
+    input_min = minimum if minimum is not None else default_min
+    input_max = maximum if maximum is not None else default_max
+    output_from = start if start is not None else 0
+    output_to = end if end is not None else 1
+
+    value_range = input_max - input_min
+    if value_range <= 0:
+        return output_from
+
+    if wrap:
+        if value == input_max:
+            normalized = 1
+        else:
+            revolutions = (value - input_min) / value_range
+            normalized = revolutions - math.floor(revolutions)
+    else:
+        normalized = min(max((value - input_min) / value_range, 0), 1)
+
+    return output_from + (output_to - output_from) * normalized
+
+
+def VarDomain(config, wrap=False):
+    """Returns (low, high, period, radians) of the raw var values that give different
+    results (values outside give the same result as the nearest end) or None if the
+    value is used as is. `period` is set when values repeat every (high - low) and
+    `radians` when values above π have to have 2π subtracted first (like the client)."""
+    multiply = get_key(config, "multiply")
+    minimum = get_key(config, "min")
+    maximum = get_key(config, "max")
+    unit = get_var(config)[1]
+    scale = multiply if multiply is not None else 1
+    inverted = get_key(config, "invert") is True and maximum is not None and minimum is not None
+    calibration = get_key(config, "calibration") or []
+
+    if not calibration and all(get_key(config, key) is None for key in ("min", "max", "from", "to")):
+        return None
+
+    if calibration:
+        low, high = get_key(calibration[0], "value"), get_key(calibration[-1], "value")
+    else:
+        default_min, default_max = UNIT_DEFAULTS.get(unit, (0, 1))
+        low = minimum if minimum is not None else default_min
+        high = maximum if maximum is not None else default_max
+
+    def to_raw(value):
+        if inverted:
+            value = maximum + minimum - value
+        return value / scale if scale else 0
+
+    radians = False
+    if unit == "radians" and not calibration:
+        if scale == 1 and not inverted:
+            radians = True
+        else:
+            # the wrap around happens after scaling so the table has to cover it
+            high = max(high, 2 * math.pi)
+
+    low, high = sorted((to_raw(low), to_raw(high)))
+    period = high - low if wrap and not calibration and high > low else None
+    return low, high, period, radians
+
+
+def layer_geometry(layer, gauge_width, gauge_height):
+    width = resolve_value(get_key(layer, "width"), gauge_width) if get_key(layer, "width") is not None else gauge_width
+    height = resolve_value(get_key(layer, "height"), gauge_height) if get_key(layer, "height") is not None else gauge_height
+    return {
+        "width": width,
+        "height": height,
+        "origin": list(resolve_vector(get_key(layer, "origin"), width, height)),
+        "position": list(resolve_vector(get_key(layer, "position"), gauge_width, gauge_height)),
+        "rotate": get_key(layer, "rotate", 0) or 0,
+        "translateX": get_key(layer, "translateX", 0) or 0,
+        "translateY": get_key(layer, "translateY", 0) or 0,
+    }
+
+
+def parse_svg_length(value):
+    if value is None or not value.strip():
+        return None
+    try:
+        return float(value.strip().lower().replace("px", ""))
+    except ValueError:
+        return None
+
+
+def LoadPathMeasure(svg_path, config_width, config_height):
+    """Measures the first <path> of an SVG scaled like SvgUtils.ParseSvgPathData."""
+    root = parse(svg_path).getroot()
+    element = next((e for e in root.iter() if e.tag.rsplit("}", 1)[-1] == "path"), None)
+    if element is None or element.get("d") is None:
+        raise ValueError(f"SVG '{svg_path}' does not contain a <path> element with a 'd'")
+
+    view_box = (root.get("viewBox") or "").split(" ")
+    view_box_width = view_box_height = 0.0
+    if len(view_box) == 4:
+        view_box_width, view_box_height = float(view_box[2]), float(view_box[3])
+    if view_box_width <= 0 or view_box_height <= 0:
+        raise ValueError(f"SVG '{svg_path}' has no valid viewBox")
+
+    # the client casts the configured size to an int
+    target_width = int(config_width) if config_width is not None else parse_svg_length(root.get("width"))
+    target_height = int(config_height) if config_height is not None else parse_svg_length(root.get("height"))
+    target_width = target_width if target_width is not None else view_box_width
+    target_height = target_height if target_height is not None else view_box_height
+
+    scale_x = target_width / view_box_width if target_width != 0 and target_width != view_box_width else 1
+    scale_y = target_height / view_box_height if target_height != 0 and target_height != view_box_height else 1
+
+    return paths.PathMeasure(gauge_svg.parse_path(element.get("d")), 0.25, (scale_x, scale_y))
+
+
+def path_position(measure, config, geometry, value):
+    # SvgUtils.GetPathPosition (the raw value is used, not MapSimVarValueToOffset)
+    value = min(max(value, -1.0), 1.0)
+    x, y, _, _ = measure.PositionAndTangent((value + 1) / 2 * measure.length)
+    offset_x, offset_y = resolve_vector(get_key(config, "position"), geometry["width"], geometry["height"])
+    return x + offset_x - geometry["width"] / 2, y + offset_y - geometry["height"] / 2
+
+
+def layer_matrix(geometry, angle=0, offset_x=0, offset_y=0, path=(0, 0)):
+    """The layer transform of GaugeRenderer as [m11, m12, m21, m22, m31, m32]:
+    translate(-origin) * rotate(angle) * translate(position + offset) * translate(path)."""
+    radians = math.pi * (angle + geometry["rotate"]) / 180
+    cos, sin = math.cos(radians), math.sin(radians)
+    origin_x, origin_y = geometry["origin"]
+    x = geometry["position"][0] + offset_x + geometry["translateX"] + path[0]
+    y = geometry["position"][1] + offset_y + geometry["translateY"] + path[1]
+    return [cos, sin, -sin, cos, -origin_x * cos + origin_y * sin + x, -origin_x * sin - origin_y * cos + y]
+
+
+def corner_distance(a, b, width, height):
+    # how far apart the corners of the layer end up with two matrices
+    distance = 0
+    for x, y in ((0, 0), (width, 0), (0, height), (width, height)):
+        dx = x * (a[0] - b[0]) + y * (a[2] - b[2]) + a[4] - b[4]
+        dy = x * (a[1] - b[1]) + y * (a[3] - b[3]) + a[5] - b[5]
+        distance = max(distance, math.hypot(dx, dy))
+    return distance
+
+
+def sample(function, low, high, steps):
+    if high <= low:
+        return [function(low)]
+    return [function(low + (high - low) * i / (steps - 1)) for i in range(steps)]
+
+
+def MeasureError(function, samples, low, high, distance):
+    """Returns the largest (nearest, linear) lookup error at the midpoints between
+    samples, measured with `distance(a, b)`."""
+    nearest = linear = 0.0
+    if len(samples) < 2:
+        return nearest, linear
+
+    steps = len(samples)
+    for i in range(steps - 1):
+        exact = function(low + (high - low) * (i + 0.5) / (steps - 1))
+        a, b = samples[i], samples[i + 1]
+        nearest = max(nearest, min(distance(exact, a), distance(exact, b)))
+        linear = max(linear, distance(exact, [(u + v) / 2 for u, v in zip(a, b)]))
+    return nearest, linear
+
+
+def BuildTable(function, low, high, steps, distance, max_error=None):
+    """Samples `function` (returning a list of floats) over [low, high]. With
+    `max_error` the step count is doubled until the nearest lookup error is below it."""
+    while True:
+        samples = sample(function, low, high, steps)
+        nearest, linear = MeasureError(function, samples, low, high, distance)
+        if max_error is None or nearest <= max_error or steps >= MAX_STEPS:
+            return samples, nearest, linear
+        steps = min(steps * 2, MAX_STEPS)
+
+
+def layer_transforms(layer):
+    transform = get_key(layer, "transform") or {}
+    active = {}
+    for name in TRANSFORMS:
+        config = get_key(transform, name)
+        if config and get_key(config, "var") is not None and get_key(config, "skip") is not True:
+            active[name] = config
+    return active
+
+
+class TableWriter:
+    def __init__(self):
+        self.data = bytearray(HEADER.size)
+        self.count = 0
+
+    def Add(self, samples):
+        self.data += b"\0" * (-len(self.data) % ALIGNMENT)
+        offset = len(self.data)
+        values = [value for sample in samples for value in sample]
+        self.data += struct.pack(f"<{len(values)}f", *values)
+        self.count += 1
+        return offset
+
+    def Bytes(self):
+        HEADER.pack_into(self.data, 0, MAGIC, VERSION, self.count)
+        return bytes(self.data)
+
+
+def BuildGaugeTables(gauge, base_dir, args):
+    """Returns (index, table bytes, worst errors) for a gauge or None if no layer is
+    animated."""
+    gauge_width = get_key(gauge, "width")
+    gauge_height = get_key(gauge, "height")
+    writer = TableWriter()
+    layers = []
+    worst = {"nearest": 0.0, "linear": 0.0}
+
+    for index, layer in enumerate(get_key(gauge, "layers") or []):
+        if get_key(layer, "skip") is True:
+            continue
+        active = layer_transforms(layer)
+        if not active:
+            continue
+
+        geometry = layer_geometry(layer, gauge_width, gauge_height)
+        functions = {}
+        domains = {}
+
+        for name, config in active.items():
+            if name == "path":
+                image = get_key(config, "image")
+                if image is None:
+                    raise ValueError(f"Layer {index}: path transform must have an image")
+                measure = LoadPathMeasure(os.path.join(base_dir, image), get_key(config, "width"), get_key(config, "height"))
+                functions[name] = lambda v, c=config, m=measure: list(path_position(m, c, geometry, v))
+                domains[name] = (-1.0, 1.0, None, False)
+            else:
+                wrap = name == "rotate" and get_key(config, "wrap") is True
+                functions[name] = lambda v, c=config, w=wrap: [MapValue(c, v, w)]
+                domains[name] = VarDomain(config, wrap)
+
+        def components(values):
+            return layer_matrix(
+                geometry,
+                values.get("rotate", [0])[0],
+                values.get("translateX", [0])[0],
+                values.get("translateY", [0])[0],
+                values.get("path", (0, 0)))
+
+        tables = []
+        var_keys = {tuple(get_var(config)) for config in active.values()}
+        merged_domain = None
+        if len(var_keys) == 1 and all(domain is not None for domain in domains.values()):
+            lookups = {domain[2:] for domain in domains.values()}
+            lows, highs = zip(*((domain[0], domain[1]) for domain in domains.values()))
+            # transforms can only share a table if they all look values up the same way
+            if len(lookups) == 1:
+                merged_domain = (min(lows), max(highs), *lookups.pop())
+
+        if merged_domain is not None:
+            low, high, period, radians = merged_domain
+
+            def matrix(value):
+                return components({name: function(value) for name, function in functions.items()})
+
+            samples, nearest, linear = BuildTable(
+                matrix, low, high, args.steps,
+                lambda a, b: corner_distance(a, b, geometry["width"], geometry["height"]),
+                args.max_error)
+            tables.append({
+                "kind": "matrix",
+                "transforms": list(active),
+                "var": list(var_keys.pop()),
+                "domain": [low, high],
+                "wrap": period is not None,
+                "radians": radians,
+                "steps": len(samples),
+                "components": 6,
+                "offset": writer.Add(samples),
+                "error": {"nearest": nearest, "linear": linear},
+            })
+        else:
+            for name, config in active.items():
+                domain = domains[name]
+                entry = {"kind": "path" if name == "path" else ("angle" if name == "rotate" else "offset"),
+                         "transforms": [name], "var": get_var(config)}
+                if domain is None:
+                    multiply = get_key(config, "multiply")
+                    entry.update({"kind": "linear", "scale": multiply if multiply is not None else 1})
+                    tables.append(entry)
+                    continue
+
+                low, high, period, radians = domain
+                samples, nearest, linear = BuildTable(
+                    functions[name], low, high, args.steps,
+                    lambda a, b: math.hypot(*(u - v for u, v in zip(a, b))),
+                    args.max_error)
+                entry.update({
+                    "domain": [low, high],
+                    "wrap": period is not None,
+                    "radians": radians,
+                    "steps": len(samples),
+                    "components": len(samples[0]),
+                    "offset": writer.Add(samples),
+                    "error": {"nearest": nearest, "linear": linear},
+                })
+                tables.append(entry)
+
+        for table in tables:
+            if "error" in table:
+                worst["nearest"] = max(worst["nearest"], table["error"]["nearest"])
+                worst["linear"] = max(worst["linear"], table["error"]["linear"])
+            if args.verbose:
+                error = table.get("error")
+                details = f"nearest {error['nearest']:.4f} linear {error['linear']:.4f}" if error else "not tabled"
+                print(f"  layer {index} {table['kind']} {'+'.join(table['transforms'])} {table['var'][0]}: "
+                      f"{table.get('steps', 0)} steps, {details}")
+
+        layers.append({
+            "index": index,
+            "name": get_key(layer, "name") or get_key(layer, "image"),
+            **geometry,
+            "tables": tables,
+        })
+
+    if not layers:
+        return None
+
+    index = {
+        "version": VERSION,
+        "name": get_key(gauge, "name"),
+        "width": gauge_width,
+        "height": gauge_height,
+        "layers": layers,
+    }
+    return index, writer.Bytes(), worst
+
+
+def output_stem(gauge, fallback):
+    """The gauge's name made safe for a file name, or the fallback if it has none."""
+    name = get_key(gauge, "name")
+    return re.sub(r"[^\w.-]+", "_", name) if name else fallback
+
+
+def write_tables(output_dir, stem, gauge, base_dir, args, stats, outputs):
+    result = BuildGaugeTables(gauge, base_dir, args)
+    label = get_key(gauge, "name") or stem
+    if result is None:
+        print(f"{label}: no animated layers")
+        return
+
+    index, data, worst = result
+    os.makedirs(output_dir, exist_ok=True)
+    data_path = os.path.join(output_dir, f"{stem}.tables.bin")
+    if os.path.abspath(data_path) in outputs:
+        raise ValueError(f"{label}: another gauge already wrote {data_path}, give the gauges different names")
+    outputs.add(os.path.abspath(data_path))
+    index["data"] = os.path.basename(data_path)
+    write_if_changed(data_path, data)
+    write_if_changed(os.path.join(output_dir, f"{stem}.tables.json"),
+                           (json.dumps(index, indent=2) + "\n").encode("utf-8"))
+
+    table_count = sum(len(layer["tables"]) for layer in index["layers"])
+    stats["tables"] += table_count
+    stats["bytes"] += len(data)
+    print(f"{label}: {table_count} tables for {len(index['layers'])} layers, {len(data)} bytes, "
+          f"max error {worst['nearest']:.4f}px nearest, {worst['linear']:.4f}px linear => {data_path}")
+
+
+def ProcessFile(path, args, stats, done, outputs):
+    if os.path.abspath(path) in done:
+        return
+    done.add(os.path.abspath(path))
+    data = LoadJsonWithComments(path)
+    file_dir = os.path.dirname(os.path.abspath(path))
+
+    if get_key(data, "panels") is None:
+        # next to the gauge its file name is unique, in a shared output directory use
+        # the gauge's name instead (the PA-44 gauges are all called gauge.json)
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if args.output:
+            write_tables(args.output, output_stem(data, stem), data, file_dir, args, stats, outputs)
+        else:
+            write_tables(file_dir, stem, data, file_dir, args, stats, outputs)
+        return
+
+    gauge_paths = [get_key(gauge_ref, "path") for panel in get_key(data, "panels") or []
+                   for gauge_ref in get_key(panel, "gauges") or []]
+    for gauge_path in filter(None, gauge_paths):
+        full_path = resolve_gauge_path(gauge_path, file_dir)
+        if full_path is None:
+            print(f"Gauge not found: {gauge_path}")
+            continue
+        ProcessFile(full_path, args, stats, done, outputs)
+
+    # gauges defined in the config itself use paths relative to the config
+    for gauge in get_key(data, "gauges") or []:
+        if get_key(gauge, "path"):
+            continue
+        write_tables(args.output or file_dir, output_stem(gauge, "gauge"), gauge, file_dir, args, stats, outputs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precomputes var to transform lookup tables for animated gauge layers.")
+    parser.add_argument("inputs", nargs="+", help="gauge JSON files or client configs (with panels)")
+    parser.add_argument("--steps", type=int, default=1024, help="values per table, including both ends (default: 1024)")
+    parser.add_argument("--max-error", type=float,
+                        help="double the steps of a table until a nearest lookup is off by less than this many pixels (or degrees)")
+    parser.add_argument("-o", "--output", help="directory to write the tables to (default: next to each gauge)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every table")
+    args = parser.parse_args()
+
+    if args.steps < 2 or args.steps > MAX_STEPS:
+        print(f"Error: --steps must be between 2 and {MAX_STEPS}")
+        sys.exit(1)
+
+    stats = {"tables": 0, "bytes": 0}
+    done = set()
+    outputs = set()
+
+    for path in args.inputs:
+        if not os.path.exists(path):
+            print(f"Error: File not found: {path}")
+            sys.exit(1)
+        try:
+            ProcessFile(path, args, stats, done, outputs)
+        except (ValueError, OSError, ParseError) as e:
+            print(f"Error: {path}: {e}")
+            sys.exit(1)
+
+    print(f"Wrote {stats['tables']} tables, {stats['bytes']} bytes")
+
+
+if __name__ == "__main__":
+    main()
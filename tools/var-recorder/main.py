@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""
+Records the var stream of a running server into a compact binary file and replays it
+to clients as a stand-in server.
+
+    python3 tools/var-recorder/main.py record flight.osgrec --vars-from gauges
+    python3 tools/var-recorder/main.py replay flight.osgrec --speed 10
+    python3 tools/var-recorder/main.py info flight.osgrec
+
+File format (little endian):
+
+    header  "OSGREC1\\0", float64 unix time the recording started
+    chunk   "CH", uint32 record count, uint32 byte length, float64 start (seconds since
+            the recording started), then the records
+    record  uint8 kind, uint32 microseconds since the chunk start, then per kind:
+            DEFINE  uint16 var id, uint16 length + name, uint16 length + unit
+            NUMBER  uint16 var id, float64 value
+            VALUE   uint16 var id, uint32 length + value as JSON (null, bool, string...)
+            MESSAGE uint32 length + the message as received (Init, ReInit, Event...)
+    footer  uint32 length + JSON index {"vars": [[name, unit]...], "chunks": [[offset,
+            start, end, records]...], "duration": seconds}, uint64 offset of the
+            footer, "OSGRIDX\\0"
+
+Var names and units are only written once (DEFINE) and referred to by id after that.
+Chunks are written about once a second so a recording can be read one chunk at a time
+and the footer index lets a replay seek without reading what comes before. A recording
+that was not closed properly has no footer and is read from the start instead.
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.config import FindVars, parse_var_spec  # noqa: E402
+from shared.protocol import INIT, REINIT, VAR, DecodeMessage, EncodeClientMessage, EncodeMessage, format_bytes  # noqa: E402
+
+FILE_MAGIC = b"OSGREC1\0"
+INDEX_MAGIC = b"OSGRIDX\0"
+CHUNK_MAGIC = b"CH"
+
+HEADER = struct.Struct("<8sd")
+CHUNK_HEADER = struct.Struct("<2sIId")
+RECORD_HEADER = struct.Struct("<BI")
+NUMBER = struct.Struct("<Hd")
+U16 = struct.Struct("<H")
+U32 = struct.Struct("<I")
+FOOTER_TAIL = struct.Struct("<Q8s")
+
+DEFINE = 0
+NUMBER_VALUE = 1
+JSON_VALUE = 2
+MESSAGE = 3
+
+CHUNK_SECONDS = 1.0
+
+
+def encode_string(value, length=U16):
+    data = value.encode("utf-8")
+    return length.pack(len(data)) + data
+
+
+class RecordingWriter:
+    def __init__(self, path, started=None):
+        self.f = open(path, "wb")
+        self.started = time.time() if started is None else started
+        self.f.write(HEADER.pack(FILE_MAGIC, self.started))
+        self.var_ids = {}
+        self.chunks = []
+        self.chunk = bytearray()
+        self.chunk_start = None
+        self.chunk_records = 0
+        self.last_time = 0
+
+    def _record(self, t, kind, body):
+        if self.chunk_start is None:
+            self.chunk_start = t
+        elif t - self.chunk_start >= CHUNK_SECONDS:
+            self.Flush()
+            self.chunk_start = t
+
+        micros = max(0, round((t - self.chunk_start) * 1_000_000))
+        self.chunk += RECORD_HEADER.pack(kind, micros)
+        self.chunk += body
+        self.chunk_records += 1
+        self.last_time = t
+
+    def get_var_id(self, t, name, unit):
+        key = (name, unit)
+        var_id = self.var_ids.get(key)
+        if var_id is None:
+            var_id = self.var_ids[key] = len(self.var_ids)
+            self._record(t, DEFINE, U16.pack(var_id) + encode_string(name) + encode_string(unit))
+        return var_id
+
+    def WriteVar(self, t, name, unit, value):
+        var_id = self.get_var_id(t, name, unit)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            self._record(t, NUMBER_VALUE, NUMBER.pack(var_id, value))
+        else:
+            self._record(t, JSON_VALUE, U16.pack(var_id) + encode_string(json.dumps(value), U32))
+
+    def WriteMessage(self, t, line):
+        self._record(t, MESSAGE, U32.pack(len(line)) + line)
+
+    def Flush(self):
+        if not self.chunk_records:
+            return
+        offset = self.f.tell()
+        self.f.write(CHUNK_HEADER.pack(CHUNK_MAGIC, self.chunk_records, len(self.chunk), self.chunk_start))
+        self.f.write(self.chunk)
+        self.f.flush()
+        self.chunks.append([offset, self.chunk_start, self.last_time, self.chunk_records])
+        self.chunk = bytearray()
+        self.chunk_records = 0
+
+    def Close(self):
+        self.Flush()
+        index = {
+            "vars": [list(key) for key in sorted(self.var_ids, key=self.var_ids.get)],
+            "chunks": self.chunks,
+            "duration": self.last_time
+        }
+        offset = self.f.tell()
+        self.f.write(encode_string(json.dumps(index, separators=(",", ":")), U32))
+        self.f.write(FOOTER_TAIL.pack(offset, INDEX_MAGIC))
+        self.f.close()
+
+
+class RecordingReader:
+    """Reads a recording one chunk at a time. Yields (time, kind, value) where value is
+    (name, unit, var value) for vars and the raw line for messages."""
+
+    def __init__(self, path):
+        self.f = open(path, "rb")
+        magic, self.started = HEADER.unpack(self.f.read(HEADER.size))
+        if magic != FILE_MAGIC:
+            raise ValueError(f"{path} is not a recording")
+        self.index = self._read_index()
+        self.vars = [tuple(var) for var in self.index["vars"]] if self.index else []
+
+    def _read_index(self):
+        self.f.seek(0, os.SEEK_END)
+        size = self.f.tell()
+        if size < HEADER.size + FOOTER_TAIL.size:
+            return None
+        self.f.seek(size - FOOTER_TAIL.size)
+        offset, magic = FOOTER_TAIL.unpack(self.f.read(FOOTER_TAIL.size))
+        if magic != INDEX_MAGIC:
+            return None
+        self.f.seek(offset)
+        (length,) = U32.unpack(self.f.read(U32.size))
+        return json.loads(self.f.read(length))
+
+    def Close(self):
+        self.f.close()
+
+    def _chunk_offsets(self, start):
+        if self.index is None:
+            # not closed properly, no index so go through every chunk
+            self.f.seek(HEADER.size)
+            while True:
+                offset = self.f.tell()
+                header = self.f.read(CHUNK_HEADER.size)
+                if len(header) < CHUNK_HEADER.size or header[:2] != CHUNK_MAGIC:
+                    return
+                _, _, length, _ = CHUNK_HEADER.unpack(header)
+                yield offset
+                self.f.seek(offset + CHUNK_HEADER.size + length)
+            return
+
+        chunks = self.index["chunks"]
+        # the first chunk which ends at or after start
+        first = max(0, bisect.bisect_left([chunk[2] for chunk in chunks], start))
+        for chunk in chunks[first:]:
+            yield chunk[0]
+
+    def Records(self, start=0, chunks=None):
+        # chunks: read at most this many chunks
+        for number, offset in enumerate(self._chunk_offsets(start)):
+            if chunks is not None and number >= chunks:
+                return
+            self.f.seek(offset)
+            _, count, length, chunk_start = CHUNK_HEADER.unpack(self.f.read(CHUNK_HEADER.size))
+            data = self.f.read(length)
+            if len(data) < length:
+                return  # cut off while recording
+            position = self.f.tell()
+
+            pos = 0
+            for _ in range(count):
+                kind, micros = RECORD_HEADER.unpack_from(data, pos)
+                pos += RECORD_HEADER.size
+                t = chunk_start + micros / 1_000_000
+
+                if kind == DEFINE:
+                    (var_id,) = U16.unpack_from(data, pos)
+                    pos += U16.size
+                    names = []
+                    for _ in range(2):
+                        (size,) = U16.unpack_from(data, pos)
+                        pos += U16.size
+                        names.append(data[pos:pos + size].decode("utf-8"))
+                        pos += size
+                    while len(self.vars) <= var_id:
+                        self.vars.append(None)
+                    self.vars[var_id] = tuple(names)
+                    continue
+
+                if kind == NUMBER_VALUE:
+                    var_id, value = NUMBER.unpack_from(data, pos)
+                    pos += NUMBER.size
+                    if value.is_integer() and abs(value) < 2 ** 53:
+                        value = int(value)
+                    record = (VAR, (*self.vars[var_id], value))
+                elif kind == JSON_VALUE:
+                    (var_id,) = U16.unpack_from(data, pos)
+                    (size,) = U32.unpack_from(data, pos + U16.size)
+                    pos += U16.size + U32.size
+                    record = (VAR, (*self.vars[var_id], json.loads(data[pos:pos + size])))
+                    pos += size
+                elif kind == MESSAGE:
+                    (size,) = U32.unpack_from(data, pos)
+                    pos += U32.size
+                    record = (MESSAGE, bytes(data[pos:pos + size]))
+                    pos += size
+                else:
+                    raise ValueError(f"Unknown record kind {kind} at {offset}")
+
+                if t >= start:
+                    yield (t, *record)
+
+            self.f.seek(position)
+
+
+async def Record(args):
+    variables = [parse_var_spec(var) for var in args.var]
+    for path in args.vars_from:
+        variables += FindVars(path)
+    variables = list(dict.fromkeys(variables))
+
+    if not variables:
+        print("Error: No vars to record, use --var or --vars-from")
+        sys.exit(1)
+
+    reader, writer = await asyncio.open_connection(args.host, args.port, limit=1 << 20)
+    print(f"Connected to {args.host}:{args.port}, recording {len(variables)} vars into {args.output}")
+
+    def send_init(vehicle_name):
+        writer.write(EncodeClientMessage("init", {
+            "VehicleName": vehicle_name,
+            "Vars": [{"Name": name, "Unit": unit, "Debug": None} for name, unit in variables],
+            "Events": []
+        }))
+
+    send_init(args.vehicle)
+
+    recording = RecordingWriter(args.output)
+    received = 0
+    raw_bytes = 0
+    started = time.perf_counter()
+    last_report = 0
+
+    try:
+        while args.duration is None or time.perf_counter() - started < args.duration:
+            timeout = None if args.duration is None else max(0, args.duration - (time.perf_counter() - started))
+            try:
+                line = await asyncio.wait_for(reader.readline(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if not line:
+                print("Server closed the connection")
+                break
+
+            t = time.perf_counter() - started
+            received += 1
+            raw_bytes += len(line)
+            msg_type, payload = DecodeMessage(line)
+
+            if msg_type == VAR:
+                recording.WriteVar(t, payload["Name"], payload["Unit"], payload["Value"])
+            else:
+                recording.WriteMessage(t, line.rstrip(b"\n"))
+                if msg_type == REINIT:
+                    # like the client, start again with the vehicle the server told us
+                    print(f"Vehicle is now '{payload.get('VehicleName')}'")
+                    send_init(payload.get("VehicleName"))
+
+            if t - last_report >= 5:
+                last_report = t
+                print(f"[{t:6.1f}s] {received:,} messages, {format_bytes(raw_bytes)} of JSON")
+    finally:
+        recording.Close()
+        writer.close()
+        size = os.path.getsize(args.output)
+        print(f"Recorded {received:,} messages in {recording.last_time:.1f}s: {format_bytes(size)} "
+              f"({format_bytes(raw_bytes)} as JSON)")
+
+
+class ReplayClient:
+    def __init__(self, writer, name):
+        self.writer = writer
+        self.name = name
+        self.vars = None  # None until it inits
+        self.sent = 0
+
+
+async def Replay(args):
+    clients = {}
+    recording = RecordingReader(args.input)
+    vehicle = {"name": args.vehicle}
+
+    # the vehicle the recording starts with, later Init/ReInit messages are replayed as is.
+    # The server answers the recorder's Init straight away so it is in the first chunk.
+    for _, kind, value in recording.Records(chunks=1):
+        if kind == MESSAGE:
+            msg_type, payload = DecodeMessage(value)
+            if msg_type in (INIT, REINIT) and vehicle["name"] is None:
+                vehicle["name"] = payload.get("VehicleName")
+            break
+
+    async def handle_client(reader, writer):
+        peer = writer.get_extra_info("peername")
+        client = ReplayClient(writer, f"{peer[0]}:{peer[1]}" if peer else "client")
+        clients[client.name] = client
+        print(f"Client {client.name} connected")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                msg_type, payload = DecodeMessage(line)
+                if msg_type != INIT:
+                    continue
+                payload = payload or {}
+                if vehicle["name"] is not None and payload.get("VehicleName") != vehicle["name"]:
+                    writer.write(EncodeMessage(REINIT, {"VehicleName": vehicle["name"], "Vars": [], "Events": []}))
+                    continue
+                writer.write(EncodeMessage(INIT, {"VehicleName": vehicle["name"], "Vars": [], "Events": []}))
+                client.vars = {(var["Name"], var["Unit"]) for var in payload.get("Vars") or []}
+                print(f"Client {client.name} subscribed to {len(client.vars)} vars")
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            clients.pop(client.name, None)
+            print(f"Client {client.name} disconnected")
+            writer.close()
+
+    listener = await asyncio.start_server(handle_client, args.ip, args.port)
+    speed = None if args.speed == "max" else float(args.speed)
+    print(f"Replaying {args.input} on {args.ip}:{args.port} at {'max' if speed is None else f'{speed:g}x'} speed")
+
+    while args.wait_for_clients and len([c for c in clients.values() if c.vars is not None]) < args.wait_for_clients:
+        await asyncio.sleep(0.1)
+
+    loop = asyncio.get_running_loop()
+    sent = 0
+    started = time.perf_counter()
+
+    try:
+        while True:
+            replay_start = loop.time()
+            for t, kind, value in recording.Records(args.start):
+                if speed is not None:
+                    delay = replay_start + (t - args.start) / speed - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+
+                if kind == VAR:
+                    name, unit, var_value = value
+                    data = None
+                    for client in list(clients.values()):
+                        if client.vars is None or (not args.all and (name, unit) not in client.vars):
+                            continue
+                        if data is None:
+                            data = EncodeMessage(VAR, {"Name": name, "Unit": unit, "Value": var_value})
+                        client.writer.write(data)
+                        client.sent += 1
+                        sent += 1
+                else:
+                    msg_type, payload = DecodeMessage(value)
+                    if msg_type in (INIT, REINIT):
+                        # Init and ReInit for the same vehicle were replies to our own init,
+                        # the clients already got theirs. A new vehicle was a broadcast.
+                        new_vehicle = (payload or {}).get("VehicleName")
+                        if msg_type == INIT or new_vehicle == vehicle["name"]:
+                            continue
+                        vehicle["name"] = new_vehicle
+                    for client in list(clients.values()):
+                        client.writer.write(value + b"\n")
+
+                if speed is None:
+                    # as fast as the clients can take it
+                    for client in list(clients.values()):
+                        try:
+                            await client.writer.drain()
+                        except ConnectionError:
+                            pass
+
+            if not args.loop:
+                break
+    finally:
+        elapsed = time.perf_counter() - started
+        print(f"Sent {sent:,} var messages in {elapsed:.1f}s ({sent / max(elapsed, 1e-9):,.0f} msg/s)")
+        listener.close()
+        for client in list(clients.values()):
+            client.writer.transport.abort()
+        # let the client handlers see the connections close
+        await asyncio.sleep(0.1)
+        recording.Close()
+
+
+def Info(args):
+    recording = RecordingReader(args.input)
+    size = os.path.getsize(args.input)
+    counts = {}
+    messages = 0
+    last = 0
+
+    for t, kind, value in recording.Records():
+        last = t
+        if kind == VAR:
+            counts[value[:2]] = counts.get(value[:2], 0) + 1
+        else:
+            messages += 1
+
+    total = sum(counts.values())
+    print(f"{args.input}: {format_bytes(size)}, recorded {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(recording.started))}")
+    print(f"Duration {last:.1f}s, {total:,} var values ({total / max(last, 1e-9):,.0f}/s), {messages} other messages, "
+          f"{len(recording.index['chunks']) if recording.index else 'unknown (no index)'} chunks")
+    print(f"{'var':<48}{'unit':<16}{'values':>10}")
+    for (name, unit), count in sorted(counts.items()):
+        print(f"{name:<48}{unit:<16}{count:>10,}")
+    recording.Close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Records and replays the var stream of a server.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record = commands.add_parser("record", help="connect to a server and record what it sends")
+    record.add_argument("output")
+    record.add_argument("--host", default="127.0.0.1")
+    record.add_argument("--port", type=int, default=1234)
+    record.add_argument("--vehicle", help="vehicle name to init with, the server tells us the right one if it is wrong")
+    record.add_argument("--var", action="append", default=[], help="a var to subscribe to as NAME:unit (eg. GENERAL ENG RPM:1:rpm), can be repeated")
+    record.add_argument("--vars-from", action="append", default=[],
+                        help="subscribe to every var used by the JSON config/gauge files in this file or directory")
+    record.add_argument("--duration", type=float, help="stop after this many seconds")
+
+    replay = commands.add_parser("replay", help="act as a server and send a recording to clients")
+    replay.add_argument("input")
+    replay.add_argument("--ip", default="0.0.0.0")
+    replay.add_argument("--port", type=int, default=1234)
+    replay.add_argument("--speed", default="1", help="1 for real time, 10 for 10 times faster or max (default: 1)")
+    replay.add_argument("--start", type=float, default=0, help="seconds into the recording to start at")
+    replay.add_argument("--loop", action="store_true", help="start again at the end")
+    replay.add_argument("--all", action="store_true", help="send every var, not only the ones a client subscribed to")
+    replay.add_argument("--vehicle", help="vehicle name until the recording says otherwise")
+    replay.add_argument("--wait-for-clients", type=int, default=1,
+                        help="wait for this many clients to init before starting (default: 1)")
+
+    info = commands.add_parser("info", help="print what is in a recording")
+    info.add_argument("input")
+
+    args = parser.parse_args()
+
+    if args.command == "replay" and args.speed != "max":
+        try:
+            if float(args.speed) <= 0:
+                raise ValueError()
+        except ValueError:
+            print("Error: --speed must be above 0 or max")
+            sys.exit(1)
+
+    try:
+        if args.command == "record":
+            asyncio.run(Record(args))
+        elif args.command == "replay":
+            asyncio.run(Replay(args))
+        elif args.command == "info":
+            Info(args)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
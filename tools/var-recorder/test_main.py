@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Tests of the recording format, run with `python3 -m unittest` in this directory."""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import main as recorder  # noqa: E402
+
+# (seconds since the recording started, name, unit, value), over several chunks
+VALUES = [
+    (0.0, "PLANE ALTITUDE", "feet", 1000),
+    (0.5, "GENERAL ENG RPM:1", "rpm", 2400.5),
+    (1.2, "PLANE ALTITUDE", "feet", 1010),
+    (1.3, "ATC ID", "string", "N123"),
+    (2.4, "GENERAL ENG RPM:1", "rpm", 2410.25),
+    (3.6, "GEAR HANDLE POSITION", "bool", True),
+    (3.7, "PLANE ALTITUDE", "feet", None),
+]
+MESSAGE = b'{"Type":"Event","Payload":{}}\n'
+
+
+class RecordingTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "flight.osgrec")
+
+    def record(self, close=True):
+        writer = recorder.RecordingWriter(self.path, started=1000.0)
+        for t, name, unit, value in VALUES:
+            writer.WriteVar(t, name, unit, value)
+        writer.WriteMessage(3.8, MESSAGE)
+        if close:
+            writer.Close()
+        else:
+            # what is on disk when the recorder is killed
+            writer.Flush()
+            writer.f.close()
+
+    def read(self, start=0):
+        reader = recorder.RecordingReader(self.path)
+        self.addCleanup(reader.Close)
+        return reader, list(reader.Records(start))
+
+    def expected(self, start=0):
+        records = [(t, recorder.VAR, (name, unit, value)) for t, name, unit, value in VALUES]
+        records.append((3.8, recorder.MESSAGE, MESSAGE))
+        return [record for record in records if record[0] >= start]
+
+    def assertRecords(self, records, expected):
+        self.assertEqual([record[1:] for record in records], [record[1:] for record in expected])
+        for record, expected_record in zip(records, expected):
+            self.assertAlmostEqual(record[0], expected_record[0], places=5)
+
+    def test_round_trip(self):
+        self.record()
+        reader, records = self.read()
+        self.assertEqual(reader.started, 1000.0)
+        self.assertRecords(records, self.expected())
+        # PLANE ALTITUDE is defined once and referred to by id after that
+        self.assertEqual(reader.index["vars"], [["PLANE ALTITUDE", "feet"], ["GENERAL ENG RPM:1", "rpm"],
+                                                ["ATC ID", "string"], ["GEAR HANDLE POSITION", "bool"]])
+        self.assertEqual(reader.index["duration"], 3.8)
+
+    def test_index_has_a_chunk_per_second(self):
+        self.record()
+        reader, _ = self.read()
+        chunks = reader.index["chunks"]
+        self.assertEqual([chunk[1] for chunk in chunks], [0.0, 1.2, 2.4, 3.6])
+        self.assertEqual(sum(chunk[3] for chunk in chunks), len(VALUES) + 4 + 1)
+
+    def test_seek_skips_earlier_chunks(self):
+        self.record()
+        _, records = self.read(start=2.4)
+        self.assertRecords(records, self.expected(start=2.4))
+
+    def test_seek_into_a_chunk_defined_earlier_vars(self):
+        # GENERAL ENG RPM:1 was defined in the first chunk, the index has its name
+        self.record()
+        _, records = self.read(start=2.0)
+        self.assertEqual(records[0][2], ("GENERAL ENG RPM:1", "rpm", 2410.25))
+
+    def test_recording_without_footer_is_read_from_the_start(self):
+        self.record(close=False)
+        reader, records = self.read()
+        self.assertIsNone(reader.index)
+        self.assertRecords(records, self.expected())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,540 @@
+#!/usr/bin/env python3
+"""
+Sits between the server and many clients: one upstream connection subscribes to every
+var any client wants and each client gets the latest value of its vars at most
+--max-rate times a second. Values a slow client had no time for are replaced by newer
+ones instead of piling up in its socket, and values which moved less than their
+deadband since the client last got them are not sent at all.
+
+    python3 tools/var-relay/main.py --upstream 192.168.1.10:1234 --max-rate 20
+
+Clients connect to --port and speak the same newline delimited JSON as with the
+server (see server/src/server/Server.cs and Messages.cs). Clients on --binary-port
+send the same JSON but receive frames instead (little endian):
+
+    frame   uint8 kind, then per kind:
+            MESSAGE uint32 length + a server message as JSON (Init, ReInit...)
+            DEFINE  uint16 var id, uint16 length + name, uint16 length + unit
+            NUMBERS uint16 count, then count times uint16 var id + float64 value
+            VALUE   uint16 var id, uint32 length + value as JSON (null, bool, string...)
+
+Var names and units are sent once per connection (DEFINE) and referred to by id after
+that. Only vars whose value changed are in a NUMBERS frame. A client that gets more
+than 65536 vars is sent the ones without an id as Var messages in MESSAGE frames.
+"""
+import argparse
+import asyncio
+import json
+import os
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.protocol import INIT, REINIT, VAR, DecodeMessage, EncodeClientMessage, EncodeMessage, format_bytes  # noqa: E402
+
+# binary frame kinds
+MESSAGE = 0
+DEFINE = 1
+NUMBERS = 2
+JSON_VALUE = 3
+
+U8 = struct.Struct("<B")
+U16 = struct.Struct("<H")
+U32 = struct.Struct("<I")
+NUMBER = struct.Struct("<Hd")
+NUMBERS_HEADER = struct.Struct("<BH")
+MAX_BATCH = 0xFFFF
+# var ids are uint16, vars a client gets after that many are sent as MESSAGE frames
+MAX_VAR_IDS = 0x10000
+
+UPSTREAM_RETRY_SECONDS = 1.0
+# how often a client whose socket is full is checked when it has no max rate
+STALL_SECONDS = 0.01
+
+# what a client has of a var it was never sent
+NOT_SENT = object()
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def pack_string(text, length=U16):
+    data = text.encode("utf-8")
+    return length.pack(len(data)) + data
+
+
+class Client:
+    def __init__(self, writer, name, period, binary=False):
+        self.writer = writer
+        self.name = name
+        self.period = period
+        self.binary = binary
+        self.vehicle_name = None
+        self.vars = set()
+        self.initialized = False
+        # inited before the server said which vehicle it is
+        self.waiting = False
+        # latest value of every var waiting to be sent, newest wins
+        self.pending = {}
+        self.last_sent = {}
+        self.var_ids = {}
+        self.wake = asyncio.Event()
+
+        self.sent_messages = 0
+        self.sent_bytes = 0
+        self.coalesced = 0
+        self.deadbanded = 0
+        self.stalled = 0
+        self.max_backlog = 0
+
+    def backlog(self):
+        return self.writer.transport.get_write_buffer_size()
+
+    def send(self, data, messages=1):
+        self.writer.write(data)
+        self.sent_messages += messages
+        self.sent_bytes += len(data)
+
+    def SendMessage(self, type, payload):
+        data = EncodeMessage(type, payload)
+        if self.binary:
+            data = U8.pack(MESSAGE) + U32.pack(len(data)) + data
+        self.send(data)
+
+    def Queue(self, key, value):
+        if key in self.pending:
+            self.coalesced += 1
+        self.pending[key] = value
+        self.wake.set()
+
+
+class Relay:
+    def __init__(self, upstream, max_rate, client_rates, deadbands, default_deadband, max_backlog, vehicle_name=None):
+        self.upstream = upstream
+        self.max_rate = max_rate
+        self.client_rates = client_rates
+        self.deadbands = deadbands
+        self.default_deadband = default_deadband
+        self.max_backlog = max_backlog
+        self.clients = {}
+        self.connection_count = 0
+
+        # what the upstream server said the vehicle is, None until it answers an init
+        self.vehicle_name = None
+        self.requested_vehicle = vehicle_name
+        self.upstream_writer = None
+        self.subscribed = []
+        self.values = {}
+        # the Timestamp the server sent with the latest value (load-server --timestamps)
+        self.timestamps = {}
+        # the JSON of the latest value of every var, shared by all JSON clients
+        self.encoded = {}
+
+        self.received_messages = 0
+        self.received_bytes = 0
+        self.upstream_connects = 0
+        # what was sent to clients that are gone
+        self.removed_messages = 0
+        self.removed_bytes = 0
+        self.removed_coalesced = 0
+        self.removed_deadbanded = 0
+
+    def Deadband(self, name):
+        return self.deadbands.get(name.lower(), self.default_deadband)
+
+    # downstream
+
+    async def HandleClient(self, reader, writer, binary=False):
+        self.connection_count += 1
+        peer = writer.get_extra_info("peername")
+        host = peer[0] if peer else None
+        rate = self.client_rates.get(host, self.max_rate)
+        name = f"{peer[0]}:{peer[1]}" if peer else f"client-{self.connection_count}"
+        client = Client(writer, name, 1 / rate if rate > 0 else 0, binary)
+        self.clients[client.name] = client
+        print(f"Client {client.name} connected{' (binary)' if binary else ''}, {f'max {rate:g}Hz' if rate > 0 else 'no max rate'}")
+
+        flush = asyncio.create_task(self.RunFlush(client))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    msg_type, payload = DecodeMessage(line)
+                except ValueError as e:
+                    print(f"Client {client.name} sent invalid JSON: {e}")
+                    continue
+                if msg_type == INIT:
+                    self.InitClient(client, payload or {})
+                elif self.upstream_writer is not None:
+                    # nothing else is handled by the relay, let the server decide
+                    self.upstream_writer.write(line)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            flush.cancel()
+            self.Remove(client)
+            print(f"Client {client.name} disconnected")
+            writer.close()
+            self.UpdateSubscriptions()
+
+    def InitClient(self, client, payload):
+        client.vehicle_name = payload.get("VehicleName")
+        client.vars = {(var["Name"], var["Unit"]) for var in payload.get("Vars") or []}
+        client.initialized = False
+
+        if self.vehicle_name is None:
+            # answered once the server says which vehicle it is
+            client.waiting = True
+            if self.requested_vehicle is None:
+                self.requested_vehicle = client.vehicle_name
+            self.UpdateSubscriptions()
+            return
+
+        self.AnswerInit(client)
+
+    def AnswerInit(self, client):
+        client.waiting = False
+        # same as ServerApp: a client with the wrong vehicle has to start again
+        if client.vehicle_name != self.vehicle_name:
+            print(f"Client {client.name} has vehicle '{client.vehicle_name}' but it is '{self.vehicle_name}' - telling them to re-init")
+            self.RejectClient(client, {"VehicleName": self.vehicle_name, "Vars": [], "Events": []})
+            self.UpdateSubscriptions()
+            return
+
+        client.SendMessage(INIT, {"VehicleName": self.vehicle_name, "Vars": [], "Events": []})
+        client.initialized = True
+        client.pending.clear()
+        client.last_sent.clear()
+        print(f"Client {client.name} subscribed to {len(client.vars)} vars")
+
+        # start them off with what is known already
+        for key in client.vars:
+            if key in self.values:
+                client.Queue(key, self.values[key])
+        self.UpdateSubscriptions()
+
+    def RejectClient(self, client, payload):
+        # the client has to init again, until then it wants nothing from upstream
+        client.initialized = False
+        client.vars = set()
+        client.pending.clear()
+        client.SendMessage(REINIT, payload)
+
+    def Remove(self, client):
+        if self.clients.pop(client.name, None) is None:
+            return
+        self.removed_messages += client.sent_messages
+        self.removed_bytes += client.sent_bytes
+        self.removed_coalesced += client.coalesced
+        self.removed_deadbanded += client.deadbanded
+
+    async def RunFlush(self, client):
+        while True:
+            await client.wake.wait()
+            client.wake.clear()
+
+            backlog = client.backlog()
+            client.max_backlog = max(client.max_backlog, backlog)
+            if self.max_backlog and backlog > self.max_backlog:
+                # the client is behind, keep coalescing until its socket drains
+                client.stalled += 1
+                client.wake.set()
+                await asyncio.sleep(client.period or STALL_SECONDS)
+                continue
+
+            if client.pending:
+                self.Flush(client)
+            await asyncio.sleep(client.period)
+
+    def EncodeVar(self, key, value):
+        """The JSON Var message of a value, shared by all clients that get it."""
+        timestamp = self.timestamps.get(key)
+        cached = self.encoded.get(key)
+        if cached is None or cached[0] != value or type(cached[0]) is not type(value) or cached[1] != timestamp:
+            message = {"Name": key[0], "Unit": key[1], "Value": value}
+            if timestamp is not None:
+                message["Timestamp"] = timestamp
+            cached = self.encoded[key] = (value, timestamp, EncodeMessage(VAR, message))
+        return cached[2]
+
+    def Flush(self, client):
+        numbers = []
+        messages = []
+
+        for key, value in client.pending.items():
+            last = client.last_sent.get(key, NOT_SENT)
+            if last is not NOT_SENT:
+                if is_number(value) and is_number(last):
+                    if abs(value - last) < self.Deadband(key[0]) or value == last:
+                        client.deadbanded += 1
+                        continue
+                elif value == last:
+                    client.deadbanded += 1
+                    continue
+            client.last_sent[key] = value
+
+            if not client.binary:
+                messages.append(self.EncodeVar(key, value))
+                continue
+
+            var_id = client.var_ids.get(key)
+            if var_id is None:
+                if len(client.var_ids) >= MAX_VAR_IDS:
+                    data = self.EncodeVar(key, value)
+                    messages.append(U8.pack(MESSAGE) + U32.pack(len(data)) + data)
+                    continue
+                var_id = client.var_ids[key] = len(client.var_ids)
+                messages.append(U8.pack(DEFINE) + U16.pack(var_id) + pack_string(key[0]) + pack_string(key[1]))
+            if is_number(value):
+                numbers.append(NUMBER.pack(var_id, value))
+            else:
+                messages.append(U8.pack(JSON_VALUE) + U16.pack(var_id) + pack_string(json.dumps(value), U32))
+
+        client.pending.clear()
+
+        for i in range(0, len(numbers), MAX_BATCH):
+            batch = numbers[i:i + MAX_BATCH]
+            messages.append(NUMBERS_HEADER.pack(NUMBERS, len(batch)) + b"".join(batch))
+
+        if messages:
+            client.send(b"".join(messages), len(messages))
+
+    # upstream
+
+    def UpdateSubscriptions(self):
+        """Sends the server a new init if the vars the clients want changed. The server
+        replaces what a connection subscribed to with every init."""
+        wanted = sorted({key for client in self.clients.values() for key in client.vars})
+        if wanted == self.subscribed or self.upstream_writer is None:
+            return
+        self.subscribed = wanted
+        self.SendUpstreamInit()
+
+    def SendUpstreamInit(self):
+        self.upstream_writer.write(EncodeClientMessage("init", {
+            "VehicleName": self.vehicle_name or self.requested_vehicle,
+            "Vars": [{"Name": name, "Unit": unit, "Debug": None} for name, unit in self.subscribed],
+            "Events": []
+        }))
+
+    async def RunUpstream(self):
+        host, port = self.upstream
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(host, port, limit=1 << 20)
+            except OSError as e:
+                print(f"Cannot connect to {host}:{port} ({e}), retrying")
+                await asyncio.sleep(UPSTREAM_RETRY_SECONDS)
+                continue
+
+            self.upstream_connects += 1
+            print(f"Connected to {host}:{port}")
+            self.upstream_writer = writer
+            self.subscribed = sorted({key for client in self.clients.values() for key in client.vars})
+            self.SendUpstreamInit()
+
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    self.received_messages += 1
+                    self.received_bytes += len(line)
+                    try:
+                        msg_type, payload = DecodeMessage(line)
+                    except ValueError as e:
+                        print(f"Server sent invalid JSON: {e}")
+                        continue
+                    self.OnUpstreamMessage(msg_type, payload or {}, line)
+            except ConnectionError:
+                pass
+            finally:
+                self.upstream_writer = None
+                writer.close()
+
+            print(f"Lost the connection to {host}:{port}, reconnecting")
+            await asyncio.sleep(UPSTREAM_RETRY_SECONDS)
+
+    def OnUpstreamMessage(self, msg_type, payload, line):
+        if msg_type == VAR:
+            key = (payload.get("Name"), payload.get("Unit"))
+            value = payload.get("Value")
+            self.values[key] = value
+            self.timestamps[key] = payload.get("Timestamp")
+            for client in self.clients.values():
+                if client.initialized and key in client.vars:
+                    client.Queue(key, value)
+            return
+
+        if msg_type in (INIT, REINIT):
+            vehicle_name = payload.get("VehicleName")
+            changed = vehicle_name != self.vehicle_name
+            self.vehicle_name = vehicle_name
+
+            if msg_type == REINIT:
+                # like the client, start again with the vehicle the server told us
+                print(f"Vehicle is now '{vehicle_name}'")
+                self.values.clear()
+                self.timestamps.clear()
+                self.encoded.clear()
+                self.subscribed = None
+
+            for client in list(self.clients.values()):
+                if client.waiting:
+                    self.AnswerInit(client)
+                elif changed and client.vehicle_name != vehicle_name:
+                    self.RejectClient(client, payload)
+            self.UpdateSubscriptions()
+            return
+
+        # events and anything newer go to every client as is
+        for client in self.clients.values():
+            if client.binary:
+                client.send(U8.pack(MESSAGE) + U32.pack(len(line)) + line)
+            else:
+                client.send(line)
+
+    def Totals(self):
+        clients = self.clients.values()
+        return (self.removed_messages + sum(client.sent_messages for client in clients),
+                self.removed_bytes + sum(client.sent_bytes for client in clients),
+                self.removed_coalesced + sum(client.coalesced for client in clients),
+                self.removed_deadbanded + sum(client.deadbanded for client in clients))
+
+
+def PrintReport(relay, elapsed, interval, previous):
+    received = relay.received_messages, relay.received_bytes
+    print(f"[{elapsed:6.1f}s] upstream {(received[0] - previous['upstream'][0]) / interval:,.0f} msg/s "
+          f"{format_bytes((received[1] - previous['upstream'][1]) / interval)}/s | clients {len(relay.clients)}")
+
+    for client in relay.clients.values():
+        sent, coalesced, deadbanded = previous["clients"].get(client.name, (0, 0, 0))
+        print(f"  {client.name:<24} {format_bytes((client.sent_bytes - sent) / interval):>10}/s | "
+              f"coalesced {client.coalesced - coalesced:,} | deadband {client.deadbanded - deadbanded:,} | "
+              f"backlog {format_bytes(client.backlog())}")
+
+    return {
+        "upstream": received,
+        "clients": {client.name: (client.sent_bytes, client.coalesced, client.deadbanded) for client in relay.clients.values()}
+    }
+
+
+def PrintSummary(relay, elapsed):
+    messages, sent, coalesced, deadbanded = relay.Totals()
+    print(f"Received {relay.received_messages:,} messages ({format_bytes(relay.received_bytes)}) from upstream in {elapsed:.1f}s, "
+          f"{relay.upstream_connects} connections")
+    print(f"Sent {messages:,} messages ({format_bytes(sent)}): {format_bytes(sent / elapsed)}/s, "
+          f"coalesced {coalesced:,}, below deadband {deadbanded:,}")
+
+    if relay.clients:
+        print(f"{'client':<24}{'vars':>6}{'messages':>12}{'sent':>12}{'per second':>12}{'coalesced':>11}{'deadband':>10}{'stalled':>9}{'max backlog':>13}")
+        for client in relay.clients.values():
+            print(f"{client.name:<24}{len(client.vars):>6}{client.sent_messages:>12,}{format_bytes(client.sent_bytes):>12}"
+                  f"{format_bytes(client.sent_bytes / elapsed):>12}{client.coalesced:>11,}{client.deadbanded:>10,}"
+                  f"{client.stalled:>9,}{format_bytes(client.max_backlog):>13}")
+
+
+def parse_address(value, default_port):
+    host, _, port = value.rpartition(":")
+    if not host:
+        return value, default_port
+    return host, int(port)
+
+
+def parse_assignments(values, what):
+    # "name=value" where the name can contain anything but the last "="
+    result = {}
+    for value in values:
+        name, sep, number = value.rpartition("=")
+        if not sep:
+            print(f"Error: {what} must be name=value, got '{value}'")
+            sys.exit(1)
+        result[name.strip()] = float(number)
+    return result
+
+
+async def Main(args):
+    deadbands = {}
+    if args.deadband_file:
+        with open(args.deadband_file, "r") as f:
+            deadbands.update(json.load(f))
+    deadbands.update(parse_assignments(args.deadband, "--deadband"))
+    # vars are matched case-insensitively like the server does
+    deadbands = {name.lower(): float(value) for name, value in deadbands.items()}
+
+    relay = Relay(parse_address(args.upstream, 1234), args.max_rate,
+                  parse_assignments(args.client_rate, "--client-rate"),
+                  deadbands, args.default_deadband, args.max_backlog * 1024, args.vehicle)
+
+    listeners = [await asyncio.start_server(relay.HandleClient, args.ip, args.port)]
+    print(f"Listening on {args.ip}:{args.port}, relaying {args.upstream}"
+          + (f" at up to {args.max_rate:g}Hz per client" if args.max_rate > 0 else ""))
+    if args.binary_port:
+        listeners.append(await asyncio.start_server(
+            lambda reader, writer: relay.HandleClient(reader, writer, binary=True), args.ip, args.binary_port))
+        print(f"Binary frames on {args.ip}:{args.binary_port}")
+
+    started = time.perf_counter()
+    upstream = asyncio.create_task(relay.RunUpstream())
+    previous = {"upstream": (0, 0), "clients": {}}
+
+    try:
+        while True:
+            remaining = None if args.duration is None else args.duration - (time.perf_counter() - started)
+            if remaining is not None and remaining <= 0:
+                break
+            report = args.report_interval > 0 and (remaining is None or remaining >= args.report_interval)
+            await asyncio.sleep(args.report_interval if report else remaining or 3600)
+            if report:
+                previous = PrintReport(relay, time.perf_counter() - started, args.report_interval, previous)
+    finally:
+        PrintSummary(relay, time.perf_counter() - started)
+        upstream.cancel()
+        for listener in listeners:
+            listener.close()
+        for client in list(relay.clients.values()):
+            client.writer.transport.abort()
+        await asyncio.gather(upstream, return_exceptions=True)
+        # let the client handlers see the connections close
+        await asyncio.sleep(0.1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relays the var stream of a server to many clients, coalescing what slow clients cannot keep up with.")
+    parser.add_argument("--upstream", default="127.0.0.1:1234", help="host:port of the server (default: 127.0.0.1:1234)")
+    parser.add_argument("--ip", default="0.0.0.0", help="address to listen on (default: 0.0.0.0)")
+    parser.add_argument("--port", type=int, default=1235, help="port for JSON clients (default: 1235)")
+    parser.add_argument("--binary-port", type=int, default=None, help="also accept clients which want binary frames on this port")
+    parser.add_argument("--vehicle", default=None,
+                        help="vehicle name to init the server with before a client connects (default: the first client's)")
+    parser.add_argument("--max-rate", type=float, default=30,
+                        help="most times a second a client is sent values, 0 for as they come (default: 30)")
+    parser.add_argument("--client-rate", action="append", default=[], metavar="HOST=HZ",
+                        help="max rate for the clients from one address, can be repeated")
+    parser.add_argument("--deadband", action="append", default=[], metavar="VAR=DELTA",
+                        help="do not send a var to a client until it moved this much from what the client has, can be repeated")
+    parser.add_argument("--deadband-file", help="JSON object of var name to deadband")
+    parser.add_argument("--default-deadband", type=float, default=0,
+                        help="deadband of vars without one (default: 0, any change is sent)")
+    parser.add_argument("--max-backlog", type=int, default=64,
+                        help="stop sending to a client with more than this many KiB waiting until it catches up, 0 to never stop (default: 64)")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    parser.add_argument("--report-interval", type=float, default=5, help="seconds between reports, 0 for none (default: 5)")
+    args = parser.parse_args()
+
+    if args.max_rate < 0:
+        print("Error: --max-rate must be 0 or above")
+        sys.exit(1)
+
+    try:
+        asyncio.run(Main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Tests of the relay's binary frames, run with `python3 -m unittest` in this directory."""
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import main as relay  # noqa: E402
+
+
+class FakeWriter:
+    def __init__(self):
+        self.data = b""
+
+    def write(self, data):
+        self.data += data
+
+
+def read_frames(data):
+    """Splits what a binary client got into (kind, fields) tuples."""
+    frames = []
+    offset = 0
+    while offset < len(data):
+        kind = data[offset]
+        offset += 1
+        if kind == relay.MESSAGE:
+            (length,) = relay.U32.unpack_from(data, offset)
+            offset += relay.U32.size
+            frames.append((kind, json.loads(data[offset:offset + length])))
+            offset += length
+        elif kind == relay.DEFINE:
+            (var_id,) = relay.U16.unpack_from(data, offset)
+            offset += relay.U16.size
+            strings = []
+            for _ in range(2):
+                (length,) = relay.U16.unpack_from(data, offset)
+                offset += relay.U16.size
+                strings.append(data[offset:offset + length].decode("utf-8"))
+                offset += length
+            frames.append((kind, (var_id, *strings)))
+        elif kind == relay.NUMBERS:
+            (count,) = relay.U16.unpack_from(data, offset)
+            offset += relay.U16.size
+            values = [relay.NUMBER.unpack_from(data, offset + i * relay.NUMBER.size) for i in range(count)]
+            offset += count * relay.NUMBER.size
+            frames.append((kind, values))
+        else:
+            raise ValueError(f"unexpected frame kind {kind}")
+    return frames
+
+
+class FlushTest(unittest.TestCase):
+    def setUp(self):
+        self.relay = relay.Relay(None, 0, {}, {}, 0, 0)
+        self.client = relay.Client(FakeWriter(), "test", 0, binary=True)
+
+    def flush(self, values):
+        self.client.writer.data = b""
+        for key, value in values.items():
+            self.client.Queue(key, value)
+        self.relay.Flush(self.client)
+        return read_frames(self.client.writer.data)
+
+    def test_var_is_defined_once(self):
+        key = ("PLANE ALTITUDE", "feet")
+        self.assertEqual(self.flush({key: 100.0}), [
+            (relay.DEFINE, (0, "PLANE ALTITUDE", "feet")),
+            (relay.NUMBERS, [(0, 100.0)]),
+        ])
+        self.assertEqual(self.flush({key: 200.0}), [(relay.NUMBERS, [(0, 200.0)])])
+
+    def test_vars_past_the_last_id_are_sent_as_messages(self):
+        # every id a uint16 can hold is taken
+        self.client.var_ids = {(f"VAR {i}", "number"): i for i in range(relay.MAX_VAR_IDS)}
+        frames = self.flush({("ONE MORE", "number"): 1.5, ("VAR 65535", "number"): 2.0})
+        self.assertEqual(frames[0], (relay.MESSAGE, {"Type": relay.VAR, "Payload": {"Name": "ONE MORE", "Unit": "number", "Value": 1.5}}))
+        self.assertEqual(frames[1], (relay.NUMBERS, [(0xFFFF, 2.0)]))
+        self.assertEqual(len(self.client.var_ids), relay.MAX_VAR_IDS)
+
+
+if __name__ == "__main__":
+    unittest.main()